@@ -0,0 +1,42 @@
+#include "CCoreLock.h"
+
+thread_local CCoreLock::SThreadBuffers CCoreLock::buffers;
+
+CCoreLock::CCoreLock(std::mutex& mutex, int width, int height) : guard(mutex)
+{
+    prepare(width, height);
+}
+
+CCoreLock::~CCoreLock() {}
+
+// the first cleaner of the thread owns its buffers, they are freed when the thread ends
+CCoreLock::SThreadBuffers::~SThreadBuffers()
+{
+    for (auto& cleaner: cleaners) delete cleaner.second;
+}
+
+// The first CCircleDetect of the thread allocates the buffers of the thread and frees them in its destructor.
+// So the first one is always created here and it is deleted only with the thread.
+void CCoreLock::prepare(int width, int height)
+{
+    if (width <= 0 || height <= 0) return;
+    if (width == buffers.last_width && height == buffers.last_height) return;
+
+    whycon::CCircleDetect*& cleaner = buffers.cleaners[std::make_pair(width, height)];
+    if (cleaner == NULL) {
+        cleaner = new whycon::CCircleDetect(width, height, false, 1, 1, false, NULL, NULL);
+        if (buffers.capacity == 0) buffers.capacity = width * height;
+    }
+    if (width * height > buffers.capacity) {
+        // reallocates the buffers and cleans them for this size
+        cleaner->adjustDimensions(width, height);
+        buffers.capacity = width * height;
+    } else {
+        // clears the buffer and marks the borders of this image size
+        whycon::SSegment invalid;
+        invalid.valid = false;
+        cleaner->bufferCleanup(invalid);
+    }
+    buffers.last_width = width;
+    buffers.last_height = height;
+}
@@ -0,0 +1,44 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CCORELOCK_H__
+#define __CCORELOCK_H__
+
+#include <mutex>
+#include <map>
+#include <utility>
+#include "CCircleDetect.h"
+
+// The whycon core is built with whycon_core.patch: CCircleDetect keeps its segmentation buffer and queue
+// per thread (not per process) and so do the matrices of CTransformation. Detectors on different threads
+// run in parallel, but one detector (CWhyconWrapper with its core and helpers) is not reentrant,
+// so every its call holds the lock of the detector.
+// The lock also prepares the buffers of the calling thread for the image size of the caller, so detectors working
+// with different image sizes (more cameras, windows, tiles ...) can be used on one thread.
+class CCoreLock
+{
+public:
+    CCoreLock(std::mutex& mutex, int width = 0, int height = 0);   // size of the image processed under the lock (0 = no image)
+    ~CCoreLock();
+    // Prepares the buffers of the calling thread for an image of other size processed under the same lock
+    // (windows, tiles ...). The threads of a pool which process parts of the frame call it too.
+    static void prepare(int width, int height);
+
+private:
+    std::lock_guard<std::mutex> guard;
+
+    // buffers of the core of one thread
+    struct SThreadBuffers {
+        std::map<std::pair<int, int>, whycon::CCircleDetect*> cleaners;  // one per image size
+        int capacity = 0;       // size of the buffers [pixels]
+        int last_width = 0;     // image size which the buffers are prepared for
+        int last_height = 0;
+        ~SThreadBuffers();
+    };
+    static thread_local SThreadBuffers buffers;
+};
+
+
+#endif
+/* end of CCoreLock.h */
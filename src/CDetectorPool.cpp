@@ -0,0 +1,54 @@
+#include <stdexcept>
+#include "CDetectorPool.h"
+
+CDetectorPool::CDetectorPool(int num_threads) : threads(num_threads) {}
+
+CDetectorPool::~CDetectorPool() {}
+
+int CDetectorPool::add_stream(
+    std::string clib_camera_path,
+    std::string clib_space_transform_path,
+    float circle_diam,
+    int num_markers,
+    whycon::ETransformType trans_type,
+    int id_bits,
+    int id_samples,
+    int hamming_dist,
+    bool identify,
+    bool draw_coords,
+    bool draw_segments,
+    bool debug,
+    int pyramid_levels
+) {
+    streams.push_back(std::unique_ptr<CWhyconWrapper>(new CWhyconWrapper(
+        clib_camera_path, clib_space_transform_path, circle_diam, num_markers, trans_type,
+        id_bits, id_samples, hamming_dist, identify, draw_coords, draw_segments, debug, pyramid_levels
+    )));
+    return streams.size() - 1;
+}
+
+int CDetectorPool::num_streams() const
+{
+    return streams.size();
+}
+
+int CDetectorPool::num_threads() const
+{
+    return threads.size();
+}
+
+std::vector<std::vector<whycon::SMarker> > CDetectorPool::detects(const std::vector<SFrame>& frames, const SMarkerQuery& query)
+{
+    if (frames.size() != streams.size()) {
+        throw std::runtime_error(
+            "Expected one frame per stream (" + std::to_string(streams.size()) + "), got " + std::to_string(frames.size()) + "."
+        );
+    }
+    std::vector<std::vector<whycon::SMarker> > results(frames.size());
+    threads.run(frames.size(), [&](int i) {
+        const SFrame& frame = frames[i];
+        if (frame.data == NULL) return;
+        results[i] = streams[i]->detects(frame.data, frame.width, frame.height, frame.bpp, query);
+    });
+    return results;
+}
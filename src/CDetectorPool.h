@@ -0,0 +1,53 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CDETECTORPOOL_H__
+#define __CDETECTORPOOL_H__
+
+#include <memory>
+#include <string>
+#include <vector>
+#include "CWhyconWrapper.h"
+#include "CThreadPool.h"
+
+// Owns one detector per stream (camera) and dispatches frames of all streams to a pool of native threads.
+class CDetectorPool
+{
+public:
+    CDetectorPool(int num_threads = 0);     // 0 = num of CPU cores
+    ~CDetectorPool();
+
+    // adds the detector for a new stream, returns index of the stream (same params as CWhyconWrapper)
+    int add_stream(
+        std::string clib_camera_path,
+        std::string clib_space_transform_path,
+        float circle_diam,
+        int num_markers=3,
+        whycon::ETransformType trans_type=whycon::TRANSFORM_NONE,
+        int id_bits = 3,
+        int id_samples = 360,
+        int hamming_dist = 1,
+        bool identify = true,
+        bool draw_coords = true,
+        bool draw_segments = true,
+        bool debug = false,
+        int pyramid_levels = 0
+    );
+    int num_streams() const;
+    int num_threads() const;
+
+    // frames[i] belongs to the stream i (frames without data are skipped), returns found markers per stream
+    // (the query is the same for all streams)
+    std::vector<std::vector<whycon::SMarker> > detects(
+        const std::vector<SFrame>& frames, const SMarkerQuery& query = SMarkerQuery()
+    );
+
+private:
+    std::vector<std::unique_ptr<CWhyconWrapper> > streams;
+    CThreadPool threads;
+};
+
+
+#endif
+/* end of CDetectorPool.h */
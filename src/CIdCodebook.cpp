@@ -0,0 +1,161 @@
+#include <cerrno>
+#include <cstdint>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
+#include <map>
+#include <mutex>
+#include <utility>
+#include <sys/stat.h>
+#include <unistd.h>
+#include "CIdCodebook.h"
+
+static const char CACHE_MAGIC[8] = {'W', 'H', 'Y', 'C', 'O', 'D', 'E', '1'};
+
+CIdCodebook::CIdCodebook(int id_bits, int hamming_dist) :
+    id_bits(id_bits), hamming_dist(hamming_dist)
+{
+    // the same table as the core uses, the necklace is only the builder of it
+    whycon::CNecklace necklace(id_bits, 1, hamming_dist, false);
+    table.resize(1 << id_bits);
+    for (int code = 0; code < (int)table.size(); code++) {
+        table[code] = necklace.get(code);
+        table[code].hamming = 0;    // not used, the core leaves it uninitialized for some codes
+    }
+    unknown.id = -1;
+    unknown.rotation = -1;
+    unknown.hamming = 0;
+}
+
+CIdCodebook::CIdCodebook(int id_bits, int hamming_dist, std::vector<whycon::SNecklace>&& table) :
+    id_bits(id_bits), hamming_dist(hamming_dist), table(std::move(table))
+{
+    unknown.id = -1;
+    unknown.rotation = -1;
+    unknown.hamming = 0;
+}
+
+const whycon::SNecklace& CIdCodebook::lookup(int code) const
+{
+    if (code <= 0 || code >= (int)table.size()) return unknown;
+    return table[code];
+}
+
+std::vector<int> CIdCodebook::codes() const
+{
+    std::vector<int> result;
+    for (int code = 1; code < (int)table.size(); code++) {
+        const whycon::SNecklace& item = table[code];
+        if (item.id < 0 || item.rotation != 0) continue;
+        if (item.id >= (int)result.size()) result.resize(item.id + 1, -1);
+        result[item.id] = code;
+    }
+    return result;
+}
+
+std::string CIdCodebook::default_cache_dir()
+{
+    const char* dir = getenv("WHYCON_CACHE_DIR");
+    if (dir && *dir) return dir;
+    dir = getenv("XDG_CACHE_HOME");
+    if (dir && *dir) return std::string(dir) + "/whycon";
+    dir = getenv("HOME");
+    if (dir && *dir) return std::string(dir) + "/.cache/whycon";
+    return "";
+}
+
+std::string CIdCodebook::cache_path(int id_bits, int hamming_dist, const std::string& cache_dir)
+{
+    std::string dir = cache_dir.empty() ? default_cache_dir() : cache_dir;
+    if (dir.empty()) return "";
+    return dir + "/whycode_ids_" + std::to_string(id_bits) + "_" + std::to_string(hamming_dist) + ".bin";
+}
+
+// creates the dir with its parents
+static bool make_dirs(const std::string& dir)
+{
+    for (size_t pos = 1; pos <= dir.size(); pos++) {
+        if (pos < dir.size() && dir[pos] != '/') continue;
+        std::string part = dir.substr(0, pos);
+        if (mkdir(part.c_str(), 0755) != 0 && errno != EEXIST) return false;
+    }
+    return true;
+}
+
+// The file is: magic, id_bits, hamming_dist and (id, rotation) for each code, all as int32 of this machine
+// (the cache is local).
+std::unique_ptr<CIdCodebook> CIdCodebook::load(const std::string& path, int id_bits, int hamming_dist)
+{
+    std::ifstream file(path, std::ios::binary);
+    if (!file) return nullptr;
+    char magic[sizeof(CACHE_MAGIC)];
+    int32_t header[2];
+    file.read(magic, sizeof(magic));
+    file.read(reinterpret_cast<char*>(header), sizeof(header));
+    if (!file || memcmp(magic, CACHE_MAGIC, sizeof(magic)) != 0 || header[0] != id_bits || header[1] != hamming_dist) {
+        return nullptr;
+    }
+    std::vector<int32_t> items(2 << id_bits);
+    file.read(reinterpret_cast<char*>(items.data()), items.size() * sizeof(int32_t));
+    if (!file || file.peek() != EOF) return nullptr;
+
+    std::vector<whycon::SNecklace> table(1 << id_bits);
+    for (size_t code = 0; code < table.size(); code++) {
+        table[code].id = items[2 * code];
+        table[code].rotation = items[2 * code + 1];
+        table[code].hamming = 0;
+    }
+    return std::unique_ptr<CIdCodebook>(new CIdCodebook(id_bits, hamming_dist, std::move(table)));
+}
+
+bool CIdCodebook::save(const std::string& path) const
+{
+    size_t slash = path.rfind('/');
+    if (slash != std::string::npos && !make_dirs(path.substr(0, slash))) return false;
+
+    std::vector<int32_t> items;
+    items.reserve(2 * table.size());
+    for (auto const& item: table) {
+        items.push_back(item.id);
+        items.push_back(item.rotation);
+    }
+    int32_t header[2] = {id_bits, hamming_dist};
+    // written aside and renamed, so other processes never read a half of the file
+    std::string tmp_path = path + "." + std::to_string(getpid()) + ".tmp";
+    {
+        std::ofstream file(tmp_path, std::ios::binary | std::ios::trunc);
+        file.write(CACHE_MAGIC, sizeof(CACHE_MAGIC));
+        file.write(reinterpret_cast<const char*>(header), sizeof(header));
+        file.write(reinterpret_cast<const char*>(items.data()), items.size() * sizeof(int32_t));
+        if (!file) {
+            std::remove(tmp_path.c_str());
+            return false;
+        }
+    }
+    if (std::rename(tmp_path.c_str(), path.c_str()) != 0) {
+        std::remove(tmp_path.c_str());
+        return false;
+    }
+    return true;
+}
+
+std::shared_ptr<const CIdCodebook> CIdCodebook::get(int id_bits, int hamming_dist, const std::string& cache_dir)
+{
+    static std::mutex mutex;
+    static std::map<std::pair<int, int>, std::shared_ptr<const CIdCodebook> > codebooks;
+
+    std::lock_guard<std::mutex> guard(mutex);
+    std::shared_ptr<const CIdCodebook>& codebook = codebooks[std::make_pair(id_bits, hamming_dist)];
+    if (codebook) return codebook;
+
+    std::string path = cache_path(id_bits, hamming_dist, cache_dir);
+    std::unique_ptr<CIdCodebook> loaded;
+    if (!path.empty()) loaded = load(path, id_bits, hamming_dist);
+    if (!loaded) {
+        loaded.reset(new CIdCodebook(id_bits, hamming_dist));
+        if (!path.empty()) loaded->save(path);
+    }
+    codebook = std::move(loaded);
+    return codebook;
+}
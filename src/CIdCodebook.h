@@ -0,0 +1,50 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CIDCODEBOOK_H__
+#define __CIDCODEBOOK_H__
+
+#include <memory>
+#include <string>
+#include <vector>
+#include "CNecklace.h"
+
+// Direct lookup table of the WhyCode IDs: raw code of id_bits bits -> (id, rotation).
+// The table is the same as the one of whycon::CNecklace (it is built by it), but it is built only once:
+// it is shared by all detectors of the process and cached on the disk, keyed by (id_bits, hamming_dist).
+class CIdCodebook
+{
+public:
+
+    // builds the table (it takes O(4^id_bits) time)
+    CIdCodebook(int id_bits, int hamming_dist);
+
+    // Shared codebook. It is loaded from the cache dir ("" = default_cache_dir()) or built and saved there
+    // when it is not in the cache yet (the cache is optional, errors of the disk are ignored).
+    static std::shared_ptr<const CIdCodebook> get(int id_bits, int hamming_dist, const std::string& cache_dir = "");
+
+    // $WHYCON_CACHE_DIR, $XDG_CACHE_HOME/whycon or ~/.cache/whycon
+    static std::string default_cache_dir();
+    static std::string cache_path(int id_bits, int hamming_dist, const std::string& cache_dir = "");
+
+    // id = -1 for an unknown (or symmetrical or too close) code, as whycon::CNecklace::get
+    const whycon::SNecklace& lookup(int code) const;
+    // code (with rotation 0) of each ID, index = ID (for printing or rendering of the markers)
+    std::vector<int> codes() const;
+
+    const int id_bits;
+    const int hamming_dist;
+
+private:
+    std::vector<whycon::SNecklace> table;   // 2^id_bits items
+    whycon::SNecklace unknown;
+
+    CIdCodebook(int id_bits, int hamming_dist, std::vector<whycon::SNecklace>&& table);
+    static std::unique_ptr<CIdCodebook> load(const std::string& path, int id_bits, int hamming_dist);
+    bool save(const std::string& path) const;
+};
+
+
+#endif
+/* end of CIdCodebook.h */
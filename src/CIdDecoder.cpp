@@ -0,0 +1,246 @@
+#include <algorithm>
+#include <cmath>
+#include "CIdDecoder.h"
+
+static const int ADAPTIVE_STEP = 4;                 // every 4th point of the ring is read first
+static const float ADAPTIVE_MAX_VARIANCE = 0.1;     // of the edges found by the sparse reading
+static const float CLOSE_SOLUTIONS = 1.0;           // [px] both solutions read the same ring
+
+CIdDecoder::CIdDecoder(
+    std::shared_ptr<const CIdCodebook> codebook,
+    int id_samples,
+    const cv::Mat& intrinsic_mat,
+    const cv::Mat& distortion_coeffs,
+    std::string clib_space_transform_path,
+    float circle_diam,
+    whycon::ETransformType trans_type,
+    bool adaptive,
+    bool debug,
+    CStats* stats
+) :
+    adaptive(adaptive),
+    codebook(codebook),
+    id_bits(codebook->id_bits),
+    id_samples(id_samples),
+    segment_width(id_samples / codebook->id_bits / 2),
+    trans(circle_diam, debug),
+    solver(circle_diam, intrinsic_mat, distortion_coeffs),
+    intrinsic_mat(intrinsic_mat.clone()),
+    distortion_coeffs(distortion_coeffs.clone()),
+    ring_cos(id_samples), ring_sin(id_samples),
+    signal(id_samples), smooth(id_samples),
+    stats(stats)
+{
+    trans.updateCameraParams(this->intrinsic_mat, this->distortion_coeffs);
+    trans.setTransformType(trans_type);
+    if (trans_type != whycon::TRANSFORM_NONE) {
+        try {
+            trans.loadCalibration(clib_space_transform_path);
+        } catch (const std::exception& e) {
+            // the main detector of the wrapper has already warned about it
+        }
+    }
+    // the same angles as the core computes for each sample
+    for (int a = 0; a < id_samples; a++) {
+        ring_cos[a] = cos((float)a / id_samples * 2 * M_PI);
+        ring_sin[a] = sin((float)a / id_samples * 2 * M_PI);
+    }
+}
+
+CIdDecoder::~CIdDecoder() {}
+
+void CIdDecoder::load_calibration(std::string clib_space_transform_path)
+{
+    try {
+        trans.loadCalibration(clib_space_transform_path);
+    } catch (const std::exception& e) {
+        // the main detector of the wrapper has already warned about it
+    }
+}
+
+bool CIdDecoder::can_read_sparsely() const
+{
+    return id_samples % ADAPTIVE_STEP == 0 && segment_width >= 4 * ADAPTIVE_STEP;
+}
+
+// Bilinear interpolation of the sum of the first three bytes of the pixel (as the core does, so the IDs are the same).
+// Luminance and YUYV frames have only the first byte of the pixel to sum (the second one of YUYV is a chroma).
+float CIdDecoder::sample(const whycon::CRawImage* image, float x, float y) const
+{
+    int step = image->bpp_;
+    int channels = step < 3 ? 1 : 3;
+    // the ring cut by the border is clamped to the image (as in the patched core)
+    int px = std::max(0, std::min(image->width_ - 2, (int)x));
+    int py = std::max(0, std::min(image->height_ - 2, (int)y));
+    float gx = x - px;
+    float gy = y - py;
+    int pos = px + py * image->width_;
+    const unsigned char* ptr = image->data_;
+    float value = 0;
+    for (int c = 0; c < channels; c++) {
+        value += ptr[pos * step + c] * (1 - gx) * (1 - gy) + ptr[(pos + 1) * step + c] * gx * (1 - gy) +
+                 ptr[(pos + image->width_) * step + c] * (1 - gx) * gy + ptr[(pos + image->width_ + 1) * step + c] * gx * gy;
+    }
+    return value;
+}
+
+// reads every step-th sample of the ring around (x, y), binarizes it and finds the phase of its edges
+CIdDecoder::SRing CIdDecoder::read_ring(const whycon::CRawImage* image, float x, float y, const whycon::SSegment& seg, int step)
+{
+    float m0 = 0.33 / 0.70 * seg.m0;
+    float m1 = 0.33 / 0.70 * seg.m1;
+    int n = id_samples / step;
+    float avg = 0;
+    for (int k = 0; k < n; k++) {
+        int a = k * step;
+        float sx = x + (m0 * ring_cos[a] * seg.v0 + m1 * ring_sin[a] * seg.v1) * 2.0;
+        float sy = y + (m0 * ring_cos[a] * seg.v1 - m1 * ring_sin[a] * seg.v0) * 2.0;
+        signal[k] = sample(image, sx, sy);
+        avg += signal[k];
+    }
+    avg = avg / n;
+    for (int k = 0; k < n; k++) smooth[k] = signal[k] > avg ? 1 : 0;
+    if (stats && stats->enabled) stats->ring_samples += n;
+
+    // an edge between the samples k - 1 and k is in the middle of them
+    float offset = (step - 1) / 2.0;
+    SRing ring;
+    float sx = 0, sy = 0;
+    ring.num_edges = 0;
+    if (smooth[n - 1] != smooth[0]) {
+        sx += cos(2 * M_PI * -offset / segment_width);
+        sy += sin(2 * M_PI * -offset / segment_width);
+        ring.num_edges++;
+    }
+    for (int k = 1; k < n; k++) {
+        if (smooth[k] != smooth[k - 1]) {
+            sx += cos(2 * M_PI * (k * step - offset) / segment_width);
+            sy += sin(2 * M_PI * (k * step - offset) / segment_width);
+            ring.num_edges++;
+        }
+    }
+    ring.max_index = std::atan2(sy, sx) / 2 / M_PI * segment_width + segment_width / 2;
+
+    float mean_x = sx / ring.num_edges;
+    float mean_y = sy / ring.num_edges;
+    float sum = 0;
+    // the edge between the last and the first sample is not in the sum (neither in the core)
+    for (int k = 1; k < n; k++) {
+        if (smooth[k] != smooth[k - 1]) {
+            float err_x = (float)cos(2 * M_PI * (k * step - offset) / segment_width) - mean_x;
+            float err_y = (float)sin(2 * M_PI * (k * step - offset) / segment_width) - mean_y;
+            sum += err_x * err_x + err_y * err_y;
+        }
+    }
+    ring.variance = sum / ring.num_edges;
+
+    ring.raw_code = 0;
+    for (int b = 0; b < id_bits * 2; b++) {
+        int a = (ring.max_index + b * segment_width) % id_samples;
+        if (smooth[((a + step / 2) / step) % n]) ring.raw_code |= 1 << b;
+    }
+    return ring;
+}
+
+// CNecklace::decode with the raw code as bits
+void CIdDecoder::decode_code(int raw_code, int max_index, const whycon::SSegment& seg, int& id, float& angle) const
+{
+    int length = id_bits;
+    int edge_index = 0;
+    // the last pair of zeros
+    for (int a = 0; a < length * 2; a++) {
+        int p = (a + 1) % (length * 2);
+        if (!(raw_code >> a & 1) && !(raw_code >> p & 1)) edge_index = a;
+    }
+    edge_index = 1 - (edge_index % 2);
+
+    int code = 0;
+    for (int a = 0; a < length; a++) code = code * 2 + (raw_code >> (edge_index + 2 * a) & 1);
+    const whycon::SNecklace& result = codebook->lookup(code);
+
+    angle = 2 * M_PI * (-(float)max_index / id_samples - (float)edge_index / length / 2.0 + (float)result.rotation / length) +
+            atan2(seg.v1, seg.v0);
+    while (angle > +M_PI) angle -= 2 * M_PI;
+    while (angle < -M_PI) angle += 2 * M_PI;
+    id = result.id;
+}
+
+void CIdDecoder::decode(
+    const whycon::CRawImage* image, whycon::SMarker& marker, const whycon::SEllipseCenters& centers,
+    int num_solutions, const SMarkerQuery& query
+)
+{
+    if (num_solutions <= 0) {
+        marker.valid = false;   // no pose of the ellipse
+        return;
+    }
+    int step = (adaptive || sparse) && can_read_sparsely() ? ADAPTIVE_STEP : 1;
+    SRing rings[2];
+    int idx, id;
+    float angle;
+    for (;;) {
+        for (int i = 0; i < num_solutions; i++) rings[i] = read_ring(image, centers.u[i], centers.v[i], marker.seg, step);
+        idx = num_solutions == 2 && rings[1].variance <= rings[0].variance ? 1 : 0;
+        decode_code(rings[idx].raw_code, rings[idx].max_index, marker.seg, id, angle);
+        if (step == 1 || sparse) break;
+        if (num_solutions == 1) {
+            if (id >= 0 && rings[0].variance < ADAPTIVE_MAX_VARIANCE) break;
+            step = 1;
+            continue;
+        }
+        // the sparse reading is enough for sharp edges, a known code and a clear winner of the solutions
+        float du = centers.u[0] - centers.u[1];
+        float dv = centers.v[0] - centers.v[1];
+        bool close = du * du + dv * dv < CLOSE_SOLUTIONS * CLOSE_SOLUTIONS;
+        if (
+            id >= 0 && rings[idx].variance < ADAPTIVE_MAX_VARIANCE &&
+            (close || rings[1 - idx].variance > 2 * rings[idx].variance)
+        ) break;
+        step = 1;
+    }
+    marker.seg.ID = id + 1;
+    if (!query.wants(marker.seg.ID)) {
+        marker.valid = false;   // the pose is not needed
+        return;
+    }
+
+    whycon::STrackedObject& obj = marker.obj;
+    obj.u = centers.u[idx];
+    obj.v = centers.v[idx];
+    obj.x = centers.t[idx][0];
+    obj.y = centers.t[idx][1];
+    obj.z = centers.t[idx][2];
+    obj.n0 = centers.n[idx][0];
+    obj.n1 = centers.n[idx][1];
+    obj.n2 = centers.n[idx][2];
+    obj.angle = angle;
+    trans.calcOrientation(obj);
+    trans.transformCoordinates(obj);
+}
+
+void CIdDecoder::decode(const whycon::CRawImage* image, whycon::SMarker& marker, const SMarkerQuery& query)
+{
+    if (!marker.valid) return;
+    CStageTimer timer(stats, CStats::STAGE_DECODE);
+    whycon::SEllipseCenters centers;
+    int num_solutions = solver.solve(marker, centers);
+    decode(image, marker, centers, num_solutions, query);
+}
+
+void CIdDecoder::decode(const whycon::CRawImage* image, std::vector<whycon::SMarker>& markers, const SMarkerQuery& query)
+{
+    if (markers.empty()) return;
+    CStageTimer timer(stats, CStats::STAGE_DECODE);
+    solver.solve(markers, solutions);
+    int limit = query.limit();
+    int wanted = 0;
+    for (size_t i = 0; i < markers.size(); i++) {
+        if (!markers[i].valid) continue;
+        if (limit > 0 && wanted >= limit) {
+            markers[i].valid = false;   // all wanted markers are found
+            continue;
+        }
+        decode(image, markers[i], solutions[i], solver.num_solutions_of(i), query);
+        if (markers[i].valid) wanted++;
+    }
+}
@@ -0,0 +1,97 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CIDDECODER_H__
+#define __CIDDECODER_H__
+
+#include <memory>
+#include <string>
+#include <vector>
+#include <opencv2/opencv.hpp>
+#include "CRawImage.h"
+#include "SStructDefs.h"
+#include "CTransformation.h"
+#include "CIdCodebook.h"
+#include "CPoseSolver.h"
+#include "CStats.h"
+#include "SMarkerQuery.h"
+
+// Identification of the markers found by the core without the identification (identify = false).
+// It is the algorithm of the core (CCircleDetect::ambiguityAndObtainCode and CNecklace::decode): the code ring
+// is sampled around both solutions of the marker center, the solution with sharper edges wins and its code is
+// looked up in the shared codebook. The differences are:
+//  - the codebook is built once per process (or read from the disk cache), not by each detector,
+//  - the cos/sin of the ring are computed once,
+//  - nothing is written into the image,
+//  - the pose solutions of all markers of the frame are computed together (CPoseSolver),
+//  - adaptive sampling: every ADAPTIVE_STEP-th point of the ring is read first and all id_samples points
+//    only when this is not unambiguous (blurred edges, close solutions or an unknown code).
+// The markers have to be in the coords of the frame of the camera (as the detectors of the wrapper return them).
+class CIdDecoder
+{
+public:
+
+    CIdDecoder(
+        std::shared_ptr<const CIdCodebook> codebook,
+        int id_samples,
+        const cv::Mat& intrinsic_mat,               // camera of the frame
+        const cv::Mat& distortion_coeffs,
+        std::string clib_space_transform_path,
+        float circle_diam,
+        whycon::ETransformType trans_type,
+        bool adaptive = false,
+        bool debug = false,
+        CStats* stats = NULL
+    );
+    ~CIdDecoder();
+
+    // sets ID (ID + 1, 0 = unknown, as the core), angle and pose of the markers (call it under CCoreLock)
+    // The markers not wanted by the query are invalidated without the pose, the ones after query.limit()
+    // wanted markers are invalidated without decoding.
+    void decode(const whycon::CRawImage* image, std::vector<whycon::SMarker>& markers, const SMarkerQuery& query = SMarkerQuery());
+    void decode(const whycon::CRawImage* image, whycon::SMarker& marker, const SMarkerQuery& query = SMarkerQuery());
+
+    // replaces the space calibration
+    void load_calibration(std::string clib_space_transform_path);
+    // the rings can be read sparsely (id_samples and the segments are big enough)
+    bool can_read_sparsely() const;
+
+    const bool adaptive;
+    bool sparse = false;    // only the sparse reading, the rings are never read fully (latency budget)
+
+private:
+    // samples of the ring around one solution of the marker center
+    struct SRing {
+        int max_index;      // phase of the code bits
+        float variance;     // of the edge positions (0 = sharp edges)
+        int num_edges;
+        int raw_code;       // code of 2 * id_bits samples
+    };
+
+    std::shared_ptr<const CIdCodebook> codebook;
+    int id_bits;
+    int id_samples;
+    int segment_width;      // samples per half of the bit
+    whycon::CTransformation trans;      // orientation and the space transformation
+    CPoseSolver solver;
+    std::vector<whycon::SEllipseCenters> solutions;
+    cv::Mat intrinsic_mat;
+    cv::Mat distortion_coeffs;
+    std::vector<double> ring_cos, ring_sin;
+    std::vector<float> signal;
+    std::vector<unsigned char> smooth;
+    CStats* stats;
+
+    SRing read_ring(const whycon::CRawImage* image, float x, float y, const whycon::SSegment& seg, int step);
+    float sample(const whycon::CRawImage* image, float x, float y) const;
+    void decode_code(int raw_code, int max_index, const whycon::SSegment& seg, int& id, float& angle) const;
+    void decode(
+        const whycon::CRawImage* image, whycon::SMarker& marker, const whycon::SEllipseCenters& centers,
+        int num_solutions, const SMarkerQuery& query
+    );
+};
+
+
+#endif
+/* end of CIdDecoder.h */
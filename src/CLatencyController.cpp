@@ -0,0 +1,70 @@
+#include <algorithm>
+#include "CLatencyController.h"
+
+static const float AVERAGE_WEIGHT = 0.2;        // of the last frame in the moving average
+static const float RESTORE_FRACTION = 0.6;      // of the budget, the quality is restored under it
+static const int ORDER[NUM_DEGRADATIONS] = {DEGRADE_STABLE_IDS, DEGRADE_ID_SAMPLING, DEGRADE_RESCANS};
+
+void CLatencyController::set_budget(float max_latency, int restore_frames)
+{
+    this->max_latency = std::max(0.0f, max_latency);
+    this->restore_frames = std::max(1, restore_frames);
+    level = 0;
+    frames_under = 0;
+}
+
+int CLatencyController::flags(int level)
+{
+    int result = DEGRADE_NONE;
+    for (int i = 0; i < level; i++) result |= ORDER[i];
+    return result;
+}
+
+int CLatencyController::start(int available)
+{
+    this->available = available;
+    active = max_latency > 0 ? flags(level) & available : DEGRADE_NONE;
+    return active;
+}
+
+void CLatencyController::update(float latency)
+{
+    frames++;
+    if (active) degraded_frames++;
+    last_latency = latency;
+    average_latency = frames == 1 ? latency : average_latency + AVERAGE_WEIGHT * (latency - average_latency);
+    if (max_latency <= 0) return;
+    if (latency > max_latency) {
+        // the next degradation which changes something
+        frames_under = 0;
+        while (level < NUM_DEGRADATIONS) {
+            if (ORDER[level++] & available) break;
+        }
+    } else if (level > 0 && average_latency < RESTORE_FRACTION * max_latency) {
+        if (++frames_under < restore_frames) return;
+        frames_under = 0;
+        while (level > 0) {
+            if (ORDER[--level] & available) break;
+        }
+    } else {
+        frames_under = 0;
+    }
+}
+
+void CLatencyController::reset_counters()
+{
+    frames = 0;
+    degraded_frames = 0;
+    reused_ids = 0;
+    postponed_scans = 0;
+}
+
+const char* CLatencyController::degradation_name(int flag)
+{
+    switch (flag) {
+        case DEGRADE_STABLE_IDS: return "stable_ids";
+        case DEGRADE_ID_SAMPLING: return "id_sampling";
+        case DEGRADE_RESCANS: return "rescans";
+        default: return "none";
+    }
+}
@@ -0,0 +1,50 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CLATENCYCONTROLLER_H__
+#define __CLATENCYCONTROLLER_H__
+
+// Degradations of the detection quality (bit flags), in the order they are switched on.
+enum EDegradation {
+    DEGRADE_NONE = 0,
+    DEGRADE_STABLE_IDS = 1,     // tracked markers with a stable ID are not decoded again (set_id_table, set_tracking)
+    DEGRADE_ID_SAMPLING = 2,    // ID rings are read sparsely only (set_id_table)
+    DEGRADE_RESCANS = 4         // periodic full scans are postponed (set_tracking with rescan_interval)
+};
+static const int NUM_DEGRADATIONS = 3;
+
+// Keeps the latency of the frames under the budget by degrading the detection quality step by step.
+// Level n switches on the first n degradations (the ones not possible with the settings of the detector are skipped).
+// A frame over the budget raises the level, the level is lowered when the average latency has been under
+// RESTORE_FRACTION of the budget for restore_frames frames.
+class CLatencyController
+{
+public:
+    float max_latency = 0;          // [s] budget of one frame (0 = off)
+    int restore_frames = 30;
+    int level = 0;
+    int active = DEGRADE_NONE;      // degradations of the last frame
+    float last_latency = 0;         // [s] of the last frame
+    float average_latency = 0;      // [s] exponential moving average
+    long frames = 0;
+    long degraded_frames = 0;       // frames with any degradation
+    long reused_ids = 0;            // IDs taken from the tracks (DEGRADE_STABLE_IDS)
+    long postponed_scans = 0;       // frames without the periodic full scan (DEGRADE_RESCANS)
+
+    void set_budget(float max_latency, int restore_frames = 30);
+    // degradations for the next frame (available = the ones possible with the settings of the detector)
+    int start(int available);
+    void update(float latency);     // [s] after the frame
+    void reset_counters();
+    static const char* degradation_name(int flag);
+
+private:
+    int available = DEGRADE_NONE;
+    int frames_under = 0;           // consecutive frames with the average under the restore limit
+    static int flags(int level);
+};
+
+
+#endif
+/* end of CLatencyController.h */
@@ -0,0 +1,55 @@
+#include <cmath>
+#include <cstdio>
+#include "CMarkerRenderer.h"
+
+static const float INNER_RATIO = 33.0 / 70.0;   // inner vs. outer circle diameter
+
+CMarkerRenderer::CMarkerRenderer(bool draw_segments, bool draw_ids, bool draw_coords, bool trans_2D) :
+    draw_segments(draw_segments), draw_ids(draw_ids), draw_coords(draw_coords), trans_2D(trans_2D)
+{}
+
+void CMarkerRenderer::render(whycon::CRawImage* image, const std::vector<whycon::SMarker>& markers) const
+{
+    cv::Mat img(image->height_, image->width_, CV_8UC(image->bpp_), (void*)image->data_);
+    // colour images are BGR, for luminance (and YUV) white is used
+    cv::Scalar color = image->bpp_ >= 3 ? cv::Scalar(0, 255, 0) : cv::Scalar(255, 255);
+
+    for (auto const& marker: markers) {
+        if (!marker.valid) continue;
+        const whycon::SSegment& seg = marker.seg;
+
+        if (draw_segments) {
+            cv::Point center(std::lround(seg.x), std::lround(seg.y));
+            float a0, a1, angle;
+            if (seg.m0 > 0) {
+                // m0, m1 are the standard deviations along the axes, the semi-axes of the ellipse are twice longer
+                a0 = 2 * seg.m0;
+                a1 = 2 * seg.m1;
+                angle = std::atan2(seg.v1, seg.v0) * 180 / M_PI;
+            } else {
+                // without moments (results from the structured array) the bounding box is used
+                a0 = (seg.maxx - seg.minx + 1) / 2.0;
+                a1 = (seg.maxy - seg.miny + 1) / 2.0;
+                angle = 0;
+            }
+            cv::ellipse(img, center, cv::Size(std::lround(a0), std::lround(a1)), angle, 0, 360, color, 1, cv::LINE_AA);
+            cv::ellipse(
+                img, center, cv::Size(std::lround(a0 * INNER_RATIO), std::lround(a1 * INNER_RATIO)), angle, 0, 360,
+                color, 1, cv::LINE_AA
+            );
+            cv::drawMarker(img, center, color, cv::MARKER_CROSS, 6);
+        }
+
+        if (draw_coords) {
+            // the same texts as the core draws (coords and ID with the orientation)
+            whycon::SMarker stats_marker = marker;
+            image->drawStats(stats_marker, trans_2D);
+        } else if (draw_ids && seg.ID >= 0) {
+            char text[16];
+            std::snprintf(text, sizeof(text), "%i", seg.ID);
+            cv::putText(
+                img, text, cv::Point(seg.maxx + 2, seg.miny), cv::FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv::LINE_AA
+            );
+        }
+    }
+}
@@ -0,0 +1,35 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CMARKERRENDERER_H__
+#define __CMARKERRENDERER_H__
+
+#include <vector>
+#include <opencv2/opencv.hpp>
+#include "CRawImage.h"
+#include "SStructDefs.h"
+
+// Draws found markers into an image. It is independent of the detection, so it can run on demand,
+// at a lower rate or on another thread (with its own copy of the results).
+class CMarkerRenderer
+{
+public:
+    CMarkerRenderer(
+        bool draw_segments = true,      // outer and inner ellipse and the center
+        bool draw_ids = true,           // ID of the marker
+        bool draw_coords = true,        // position and orientation (as the whycon core draws them)
+        bool trans_2D = false           // the coords are in the 2D transformed space
+    );
+
+    void render(whycon::CRawImage* image, const std::vector<whycon::SMarker>& markers) const;
+
+    bool draw_segments;
+    bool draw_ids;
+    bool draw_coords;
+    bool trans_2D;
+};
+
+
+#endif
+/* end of CMarkerRenderer.h */
@@ -0,0 +1,213 @@
+#include <cmath>
+#include <algorithm>
+#include <stdexcept>
+#include "CMarkerTracker.h"
+
+static const float INITIAL_VELOCITY_VARIANCE = 64;   // [px^2/frame^2], velocity of a new marker is not known
+static const int WINDOW_ALIGN = 32;                  // window sides are rounded up, the window detectors are reused
+static const int TRACK_STATE_SIZE = 13;              // num of numbers of one track in the state
+static const int STABLE_ID_FRAMES = 5;               // the ID is stable after so many frames with the same ID
+static const int MAX_REUSED_IDS = 10;                // the stable ID is decoded again at least every n frames
+static const int RESCAN_POSTPONE = 4;                // the postponed periodic scan comes after n * rescan_interval
+
+void CAxisFilter::reset(float z, float measurement_noise)
+{
+    position = z;
+    velocity = 0;
+    p00 = measurement_noise;
+    p01 = 0;
+    p11 = INITIAL_VELOCITY_VARIANCE;
+}
+
+void CAxisFilter::predict(float process_noise)
+{
+    position += velocity;
+    p00 += 2 * p01 + p11 + process_noise / 4;
+    p01 += p11 + process_noise / 2;
+    p11 += process_noise;
+}
+
+void CAxisFilter::update(float z, float measurement_noise)
+{
+    float s = p00 + measurement_noise;
+    float k0 = p00 / s;
+    float k1 = p01 / s;
+    float innovation = z - position;
+    position += k0 * innovation;
+    velocity += k1 * innovation;
+    p11 -= k1 * p01;
+    p00 *= 1 - k0;
+    p01 *= 1 - k0;
+}
+
+CMarkerTracker::CMarkerTracker()
+{
+    reset_counters();
+}
+
+void CMarkerTracker::reset_counters()
+{
+    counters.frames = 0;
+    counters.full_scans = 0;
+    counters.window_searches = 0;
+    counters.window_hits = 0;
+    counters.last_full_scan = false;
+}
+
+void CMarkerTracker::predict()
+{
+    for (auto& track: tracks) {
+        track.fx.predict(process_noise);
+        track.fy.predict(process_noise);
+    }
+    frames_since_scan++;
+}
+
+bool CMarkerTracker::needs_full_scan(bool postpone_rescan) const
+{
+    if (tracks.empty()) return true;
+    if (rescan_interval > 0 && frames_since_scan >= (postpone_rescan ? RESCAN_POSTPONE : 1) * rescan_interval) return true;
+    for (auto const& track: tracks) {
+        if (track.misses >= max_misses) return true;
+    }
+    return false;
+}
+
+float CMarkerTracker::search_radius(const STrack& track) const
+{
+    return 3 * std::sqrt(std::max(track.fx.p00, track.fy.p00) + measurement_noise) + 2;
+}
+
+int CMarkerTracker::window_side(const STrack& track) const
+{
+    int side = 2 * (1.2 * track.radius + search_radius(track));
+    return (side + WINDOW_ALIGN - 1) / WINDOW_ALIGN * WINDOW_ALIGN;
+}
+
+bool CMarkerTracker::accepts(const STrack& track, const whycon::SMarker& marker) const
+{
+    if (!marker.valid) return false;
+    if (track.id >= 0 && marker.seg.ID >= 0 && track.id != marker.seg.ID) return false;
+    float dx = marker.seg.x - track.fx.position;
+    float dy = marker.seg.y - track.fy.position;
+    float r = search_radius(track);
+    return dx * dx + dy * dy <= r * r;
+}
+
+void CMarkerTracker::correct(STrack& track, const whycon::SMarker& marker, bool decoded)
+{
+    track.fx.update(marker.seg.x, measurement_noise);
+    track.fy.update(marker.seg.y, measurement_noise);
+    track.radius = std::max(marker.seg.maxx - marker.seg.minx, marker.seg.maxy - marker.seg.miny) / 2.0 + 1;
+    track.misses = 0;
+    if (!decoded) {
+        track.reused++;
+        return;
+    }
+    track.stable = marker.seg.ID > 0 && marker.seg.ID == track.id ? track.stable + 1 : 0;
+    track.reused = 0;
+    track.angle = marker.obj.angle;
+    if (marker.seg.ID >= 0) track.id = marker.seg.ID;
+}
+
+bool CMarkerTracker::has_stable_id(const STrack& track) const
+{
+    return track.id > 0 && track.stable >= STABLE_ID_FRAMES && track.reused < MAX_REUSED_IDS;
+}
+
+// the pose of the marker stays as the core found it (without the identification), only the angle is the last decoded
+void CMarkerTracker::reuse_id(const STrack& track, whycon::SMarker& marker) const
+{
+    marker.seg.ID = track.id;
+    marker.obj.angle = track.angle;
+}
+
+STrack CMarkerTracker::new_track(const whycon::SMarker& marker) const
+{
+    STrack track;
+    track.id = marker.seg.ID;
+    track.fx.reset(marker.seg.x, measurement_noise);
+    track.fy.reset(marker.seg.y, measurement_noise);
+    track.radius = std::max(marker.seg.maxx - marker.seg.minx, marker.seg.maxy - marker.seg.miny) / 2.0 + 1;
+    track.misses = 0;
+    track.stable = 0;
+    track.reused = 0;
+    track.angle = marker.obj.angle;
+    return track;
+}
+
+// The whole image was searched, so the tracks not found there are dropped.
+// Markers are paired with the tracks by ID (if they are identified) or by the nearest predicted center.
+void CMarkerTracker::update_from_scan(const std::vector<whycon::SMarker>& markers)
+{
+    std::vector<STrack> found;
+    std::vector<bool> used(tracks.size(), false);
+    for (auto const& marker: markers) {
+        if (!marker.valid) continue;
+        int best = -1;
+        float best_dist = 0;
+        for (size_t i = 0; i < tracks.size(); i++) {
+            if (used[i] || !accepts(tracks[i], marker)) continue;
+            float dx = marker.seg.x - tracks[i].fx.position;
+            float dy = marker.seg.y - tracks[i].fy.position;
+            float dist = dx * dx + dy * dy;
+            if (marker.seg.ID >= 0 && tracks[i].id == marker.seg.ID) dist = -1;  // the same ID wins
+            if (best < 0 || dist < best_dist) {
+                best = i;
+                best_dist = dist;
+            }
+        }
+        if (best < 0) {
+            found.push_back(new_track(marker));
+        } else {
+            used[best] = true;
+            correct(tracks[best], marker);
+            found.push_back(std::move(tracks[best]));
+        }
+    }
+    tracks = std::move(found);
+    frames_since_scan = 0;
+}
+
+// frames_since_scan followed by id, fx, fy (position, velocity, covariance), radius and misses of each track
+std::vector<float> CMarkerTracker::get_state() const
+{
+    std::vector<float> state;
+    state.reserve(1 + TRACK_STATE_SIZE * tracks.size());
+    state.push_back(frames_since_scan);
+    for (auto const& track: tracks) {
+        state.push_back(track.id);
+        for (const CAxisFilter* f: {&track.fx, &track.fy}) {
+            state.insert(state.end(), {f->position, f->velocity, f->p00, f->p01, f->p11});
+        }
+        state.push_back(track.radius);
+        state.push_back(track.misses);
+    }
+    return state;
+}
+
+void CMarkerTracker::set_state(const std::vector<float>& state)
+{
+    if (state.empty() || (state.size() - 1) % TRACK_STATE_SIZE != 0) {
+        throw std::runtime_error("Tracking state should have 1 + 13 * num_tracks numbers.");
+    }
+    tracks.clear();
+    frames_since_scan = state[0];
+    for (size_t k = 1; k < state.size(); ) {
+        STrack track;
+        track.id = state[k++];
+        for (CAxisFilter* f: {&track.fx, &track.fy}) {
+            f->position = state[k++];
+            f->velocity = state[k++];
+            f->p00 = state[k++];
+            f->p01 = state[k++];
+            f->p11 = state[k++];
+        }
+        track.radius = state[k++];
+        track.misses = state[k++];
+        track.stable = 0;
+        track.reused = 0;
+        track.angle = 0;
+        tracks.push_back(std::move(track));
+    }
+}
@@ -0,0 +1,85 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CMARKERTRACKER_H__
+#define __CMARKERTRACKER_H__
+
+#include <memory>
+#include <vector>
+#include "SStructDefs.h"
+#include "CWindowDetector.h"
+
+// Constant velocity Kalman filter of one image axis. State is position [px] and velocity [px/frame].
+class CAxisFilter
+{
+public:
+    float position = 0;
+    float velocity = 0;
+    float p00 = 0, p01 = 0, p11 = 0;   // covariance
+
+    void reset(float z, float measurement_noise);
+    void predict(float process_noise);
+    void update(float z, float measurement_noise);
+};
+
+// marker followed from frame to frame
+struct STrack
+{
+    int id;                 // ID of the marker (-1 = not identified)
+    CAxisFilter fx, fy;     // predicted center in the image
+    float radius;           // half of the bounding box of the last seen marker [px]
+    int misses;             // num of consecutive frames without the marker
+    int stable;             // num of consecutive frames with the same decoded ID
+    int reused;             // num of consecutive frames with the ID taken from the track (not decoded)
+    float angle;            // of the last decoded marker
+    std::unique_ptr<CWindowDetector> window;    // detector of the search window
+};
+
+typedef struct
+{
+    long frames;            // num of processed frames
+    long full_scans;        // num of frames searched by the whycon core in the whole image
+    long window_searches;   // num of searched windows
+    long window_hits;       // num of markers found in their windows
+    bool last_full_scan;    // was the last frame searched in the whole image?
+} STrackingCounters;
+
+// Motion model of the found markers. It predicts where (and how far) to search each marker in the next frame.
+class CMarkerTracker
+{
+public:
+    bool enabled = false;
+    int max_misses = 3;             // full scan after so many consecutive frames without a tracked marker
+    int rescan_interval = 0;        // full scan at least every n frames, it finds new markers (0 = only when missed)
+    float process_noise = 16;       // variance of the acceleration [px^2/frame^4]
+    float measurement_noise = 0.25; // variance of the found center [px^2]
+
+    std::vector<STrack> tracks;
+    STrackingCounters counters;
+
+    CMarkerTracker();
+
+    void predict();                 // moves all tracks one frame ahead
+    bool needs_full_scan(bool postpone_rescan = false) const;  // the periodic scan can be postponed (latency budget)
+    float search_radius(const STrack& track) const;    // [px] around the predicted center
+    int window_side(const STrack& track) const;         // [px] side of the square search window
+    bool accepts(const STrack& track, const whycon::SMarker& marker) const;
+    void correct(STrack& track, const whycon::SMarker& marker, bool decoded = true);  // decoded = ID was read
+    // the ID of the track can be used instead of decoding the marker again (it was the same in the last frames)
+    bool has_stable_id(const STrack& track) const;
+    void reuse_id(const STrack& track, whycon::SMarker& marker) const;
+    void update_from_scan(const std::vector<whycon::SMarker>& markers);    // (re)creates the tracks
+    void reset_counters();
+    // tracks as flat numbers (without their window detectors), for copies of the detector in other processes
+    std::vector<float> get_state() const;
+    void set_state(const std::vector<float>& state);
+
+private:
+    int frames_since_scan = 0;
+    STrack new_track(const whycon::SMarker& marker) const;
+};
+
+
+#endif
+/* end of CMarkerTracker.h */
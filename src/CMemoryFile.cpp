@@ -0,0 +1,53 @@
+#include <cerrno>
+#include <cstring>
+#include <stdexcept>
+#include <sys/stat.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+#include <linux/memfd.h>
+#include "CMemoryFile.h"
+
+CMemoryFile::CMemoryFile(const std::string& name, const std::string& content)
+{
+    // the syscall, memfd_create() is in glibc only since 2.27 (the file is not inherited by exec'd programs)
+    fd = syscall(SYS_memfd_create, name.c_str(), MFD_CLOEXEC);
+    if (fd < 0) throw std::runtime_error("Can not create memory file " + name + ": " + strerror(errno));
+    size_t written = 0;
+    while (written < content.size()) {
+        ssize_t n = write(fd, content.data() + written, content.size() - written);
+        if (n < 0) {
+            if (errno == EINTR) continue;
+            int error = errno;
+            close(fd);
+            throw std::runtime_error("Can not write memory file " + name + ": " + strerror(error));
+        }
+        written += n;
+    }
+    file_path = "/proc/self/fd/" + std::to_string(fd);
+}
+
+CMemoryFile::~CMemoryFile()
+{
+    close(fd);
+}
+
+const std::string& CMemoryFile::path() const
+{
+    return file_path;
+}
+
+std::string CMemoryFile::read() const
+{
+    struct stat info;
+    if (fstat(fd, &info) != 0) throw std::runtime_error("Can not read memory file " + file_path + ": " + strerror(errno));
+    std::string content(info.st_size, '\0');
+    size_t done = 0;
+    while (done < content.size()) {
+        ssize_t n = pread(fd, &content[done], content.size() - done, done);
+        if (n < 0 && errno == EINTR) continue;
+        if (n <= 0) break;
+        done += n;
+    }
+    content.resize(done);
+    return content;
+}
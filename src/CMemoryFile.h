@@ -0,0 +1,30 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CMEMORYFILE_H__
+#define __CMEMORYFILE_H__
+
+#include <string>
+
+// Anonymous file in memory (Linux memfd). The whycon core reads its space calibration only from a path,
+// path() gives one (/proc/self/fd/N) without touching the filesystem. The file lives with the object.
+class CMemoryFile
+{
+public:
+    CMemoryFile(const std::string& name, const std::string& content);
+    ~CMemoryFile();
+    CMemoryFile(const CMemoryFile&) = delete;
+    CMemoryFile& operator=(const CMemoryFile&) = delete;
+
+    const std::string& path() const;
+    std::string read() const;       // the whole content (also what others wrote through the path)
+
+private:
+    int fd;
+    std::string file_path;
+};
+
+
+#endif
+/* end of CMemoryFile.h */
@@ -0,0 +1,133 @@
+#include <algorithm>
+#include <cmath>
+#include "CPoseFusion.h"
+
+static const float MIN_COS = 0.1;       // of the viewing angle, the grazing views keep a small weight
+static const float PRUNE_AGES = 10;     // observations older than PRUNE_AGES * max_age are removed by add
+
+static float dot3(const float* a, const float* b)
+{
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2];
+}
+
+CPoseFusion::CPoseFusion(float max_age, float max_extrapolation) :
+    max_age(max_age), max_extrapolation(max_extrapolation)
+{
+}
+
+void CPoseFusion::set_camera(int camera, const float* position, double time_offset)
+{
+    SCamera& c = cameras[camera];
+    c.has_position = position != NULL;
+    if (position) std::copy(position, position + 3, c.position);
+    c.time_offset = time_offset;
+}
+
+void CPoseFusion::add(int camera, double timestamp, const std::vector<whycon::SMarker>& markers)
+{
+    auto c = cameras.find(camera);
+    if (c != cameras.end()) timestamp += c->second.time_offset;
+    for (auto const& marker: markers) {
+        if (!marker.valid || marker.seg.ID <= 0) continue;
+        SSeries& s = series[marker.seg.ID][camera];
+        if (s.count > 0 && timestamp <= s.last[1].timestamp) {
+            dropped++;
+            continue;
+        }
+        const whycon::STrackedObject& obj = marker.obj;
+        SObservation o = {timestamp, {obj.x, obj.y, obj.z}, obj.cos_view, obj.d};
+        s.last[0] = s.last[1];
+        s.last[1] = o;
+        s.count = std::min(s.count + 1, 2);
+        observations++;
+    }
+    // the markers which are not seen any more
+    for (auto id = series.begin(); id != series.end(); ) {
+        for (auto s = id->second.begin(); s != id->second.end(); ) {
+            if (timestamp - s->second.last[1].timestamp > PRUNE_AGES * max_age) s = id->second.erase(s);
+            else ++s;
+        }
+        if (id->second.empty()) id = series.erase(id);
+        else ++id;
+    }
+}
+
+// the observation interpolated (extrapolated) to the timestamp, false if the observations are too old
+bool CPoseFusion::sample(const SSeries& s, double timestamp, SObservation& result) const
+{
+    const SObservation& a = s.last[0];
+    const SObservation& b = s.last[1];
+    if (timestamp - b.timestamp > max_age) return false;
+    double dt = b.timestamp - a.timestamp;
+    if (s.count < 2 || dt > max_age) {
+        // one observation only (or the marker was not seen between them)
+        if (s.count == 2 && timestamp < b.timestamp - max_age) {
+            result = a;
+            return std::fabs(timestamp - a.timestamp) <= max_age;
+        }
+        result = b;
+        return b.timestamp - timestamp <= max_age;
+    }
+    if (timestamp < a.timestamp) {
+        result = a;
+        return a.timestamp - timestamp <= max_age;
+    }
+    float f = std::min((timestamp - a.timestamp) / dt, 1 + max_extrapolation / dt);
+    result.timestamp = timestamp;
+    for (int i = 0; i < 3; i++) result.p[i] = a.p[i] + f * (b.p[i] - a.p[i]);
+    result.cos_view = std::min(std::max(a.cos_view + f * (b.cos_view - a.cos_view), 0.0f), 1.0f);
+    result.d = a.d + f * (b.d - a.d);
+    return true;
+}
+
+float CPoseFusion::weight(int camera, const SObservation& o) const
+{
+    float d = o.d;
+    auto c = cameras.find(camera);
+    if (d <= 0 && c != cameras.end() && c->second.has_position) {
+        float view[3];
+        for (int i = 0; i < 3; i++) view[i] = c->second.position[i] - o.p[i];
+        d = std::sqrt(dot3(view, view));
+    }
+    if (d <= 0) d = 1;
+    return std::max(o.cos_view, MIN_COS) / (d * d);
+}
+
+void CPoseFusion::fuse(double timestamp, std::vector<SFusedPose>& poses)
+{
+    poses.clear();
+    std::vector<std::pair<SObservation, float> > samples;
+    for (auto const& id: series) {
+        samples.clear();
+        for (auto const& s: id.second) {
+            SObservation o;
+            if (sample(s.second, timestamp, o)) samples.push_back(std::make_pair(o, weight(s.first, o)));
+        }
+        if (samples.empty()) continue;
+        SFusedPose pose = SFusedPose();
+        pose.ID = id.first;
+        float p[3] = {0, 0, 0};
+        for (auto const& item: samples) {
+            for (int i = 0; i < 3; i++) p[i] += item.second * item.first.p[i];
+            pose.weight += item.second;
+        }
+        for (int i = 0; i < 3; i++) p[i] /= pose.weight;
+        float spread = 0;
+        for (auto const& item: samples) {
+            float e[3] = {item.first.p[0] - p[0], item.first.p[1] - p[1], item.first.p[2] - p[2]};
+            spread += item.second * dot3(e, e);
+        }
+        pose.x = p[0];
+        pose.y = p[1];
+        pose.z = p[2];
+        pose.spread = std::sqrt(spread / pose.weight);
+        pose.num_cameras = samples.size();
+        pose.valid = true;
+        poses.push_back(pose);
+    }
+}
+
+void CPoseFusion::clear()
+{
+    series.clear();
+}
@@ -0,0 +1,76 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CPOSEFUSION_H__
+#define __CPOSEFUSION_H__
+
+#include <stdint.h>
+#include <map>
+#include <vector>
+#include "SStructDefs.h"
+
+// Fused pose of one marker. It is the item of the numpy structured array (whycon.fused_dtype).
+typedef struct
+{
+    int32_t ID;                 // pattern ID
+    float x, y, z;              // position in the world coords (weighted mean of the cameras)
+    float weight;               // sum of the weights of the cameras
+    float spread;               // weighted RMS distance of the positions of the cameras from the fused one
+    int32_t num_cameras;        // num of cameras which have seen the marker
+    bool valid;
+} SFusedPose;
+
+// Fusion of the markers found by several cameras (each with its own detector) in one world frame
+// (the detectors are created with T_2D, T_3D or T_4D and the space calibrations of one world).
+// The markers are associated by ID (0 = unknown is not fused). The last two observations of each marker
+// by each camera are kept, so its position can be interpolated (or extrapolated up to max_extrapolation [s])
+// to any timestamp, the observations older than max_age [s] are dropped. The cameras are weighted by
+// cos(viewing angle) / d^2, both are given by the detectors in the camera coords (cos_view and d of the marker).
+// The orientation is not fused, the quaternions of the detectors are in the coords of their cameras.
+class CPoseFusion
+{
+public:
+    CPoseFusion(float max_age = 0.1, float max_extrapolation = 0.05);
+
+    // position of the camera in the world coords (NULL = unknown, it is the distance of the markers without d)
+    // and the offset of its clock [s] (added to its timestamps, so all cameras have one time)
+    void set_camera(int camera, const float* position, double time_offset = 0);
+    // results of the camera at the timestamp [s]
+    void add(int camera, double timestamp, const std::vector<whycon::SMarker>& markers);
+    // one pose per ID seen by any camera at the timestamp (sorted by ID)
+    void fuse(double timestamp, std::vector<SFusedPose>& poses);
+    void clear();               // forgets the observations
+
+    float max_age;
+    float max_extrapolation;
+    long observations = 0;      // num of added markers
+    long dropped = 0;           // num of markers older than the last observation of their camera
+
+private:
+    struct SObservation {
+        double timestamp;
+        float p[3];             // position
+        float cos_view;         // of the viewing angle
+        float d;                // distance from the camera
+    };
+    struct SSeries {
+        SObservation last[2];   // last[1] is the newest
+        int count = 0;
+    };
+    struct SCamera {
+        bool has_position = false;
+        float position[3];
+        double time_offset = 0;
+    };
+
+    std::map<int, std::map<int, SSeries> > series;  // ID -> camera -> observations
+    std::map<int, SCamera> cameras;
+
+    bool sample(const SSeries& s, double timestamp, SObservation& result) const;
+    float weight(int camera, const SObservation& o) const;
+};
+
+
+#endif
+/* end of CPoseFusion.h */
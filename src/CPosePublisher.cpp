@@ -0,0 +1,43 @@
+#include <algorithm>
+#include <chrono>
+#include <cstring>
+#include <netinet/in.h>
+#include "CPosePublisher.h"
+
+CPosePublisher::CPosePublisher(const std::string& address) : CPoseSocket(address)
+{
+    if (multicast) {
+        unsigned char ttl = 1;      // the local network only
+        unsigned char loop = 1;     // the subscribers on this host get it too
+        setsockopt(fd, IPPROTO_IP, IP_MULTICAST_TTL, &ttl, sizeof(ttl));
+        setsockopt(fd, IPPROTO_IP, IP_MULTICAST_LOOP, &loop, sizeof(loop));
+    }
+}
+
+void CPosePublisher::publish(const std::vector<whycon::SMarker>& markers)
+{
+    size_t num_markers = std::min<size_t>(markers.size(), 0xFFFF);
+    packet.resize(sizeof(SPoseHeader) + num_markers * sizeof(SPoseRecord));
+    SPoseHeader* header = reinterpret_cast<SPoseHeader*>(packet.data());
+    header->magic = POSE_PACKET_MAGIC;
+    header->version = POSE_PACKET_VERSION;
+    header->num_markers = num_markers;
+    header->frame = frame++;
+    header->timestamp = std::chrono::duration<double>(std::chrono::steady_clock::now().time_since_epoch()).count();
+    SPoseRecord* record = reinterpret_cast<SPoseRecord*>(packet.data() + sizeof(SPoseHeader));
+    for (size_t i = 0; i < num_markers; i++, record++) {
+        const whycon::SMarker& marker = markers[i];
+        record->ID = marker.seg.ID;
+        record->x = marker.obj.x;
+        record->y = marker.obj.y;
+        record->z = marker.obj.z;
+        record->qx = marker.obj.qx;
+        record->qy = marker.obj.qy;
+        record->qz = marker.obj.qz;
+        record->qw = marker.obj.qw;
+        record->valid = marker.valid;
+    }
+    ssize_t n = sendto(fd, packet.data(), packet.size(), MSG_DONTWAIT, reinterpret_cast<sockaddr*>(&addr), addr_len);
+    if (n == (ssize_t)packet.size()) sent++;
+    else errors++;
+}
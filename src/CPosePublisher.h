@@ -0,0 +1,32 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CPOSEPUBLISHER_H__
+#define __CPOSEPUBLISHER_H__
+
+#include <vector>
+#include "SStructDefs.h"
+#include "SPosePacket.h"
+#include "CPoseSocket.h"
+
+// Sends one datagram (SPosePacket.h) with the poses of the markers of each frame. The socket never blocks,
+// a packet which can not be sent (nobody listens on the UNIX socket, full buffer) is dropped and counted.
+class CPosePublisher : public CPoseSocket
+{
+public:
+    CPosePublisher(const std::string& address);
+
+    void publish(const std::vector<whycon::SMarker>& markers);
+
+    unsigned long long frame = 0;   // frame id of the next packet
+    unsigned long long sent = 0;
+    unsigned long long errors = 0;  // dropped packets
+
+private:
+    std::vector<char> packet;       // reused buffer
+};
+
+
+#endif
+/* end of CPosePublisher.h */
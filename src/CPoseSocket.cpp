@@ -0,0 +1,50 @@
+#include <cerrno>
+#include <cstdlib>
+#include <cstring>
+#include <stdexcept>
+#include <arpa/inet.h>
+#include <netinet/in.h>
+#include <sys/un.h>
+#include <unistd.h>
+#include "CPoseSocket.h"
+
+static const std::string UDP_SCHEME = "udp://";
+static const std::string UNIX_SCHEME = "unix://";
+
+CPoseSocket::CPoseSocket(const std::string& address) :
+    address(address), fd(-1), addr_len(0), unix_socket(false), multicast(false)
+{
+    memset(&addr, 0, sizeof(addr));
+    if (address.compare(0, UNIX_SCHEME.size(), UNIX_SCHEME) == 0) {
+        unix_socket = true;
+        unix_path = address.substr(UNIX_SCHEME.size());
+        sockaddr_un* un = reinterpret_cast<sockaddr_un*>(&addr);
+        if (unix_path.empty() || unix_path.size() >= sizeof(un->sun_path)) {
+            throw std::runtime_error("Bad path of the UNIX socket in " + address);
+        }
+        un->sun_family = AF_UNIX;
+        strcpy(un->sun_path, unix_path.c_str());
+        addr_len = sizeof(sockaddr_un);
+        fd = socket(AF_UNIX, SOCK_DGRAM | SOCK_CLOEXEC, 0);
+    } else if (address.compare(0, UDP_SCHEME.size(), UDP_SCHEME) == 0) {
+        std::string host_port = address.substr(UDP_SCHEME.size());
+        size_t colon = host_port.rfind(':');
+        sockaddr_in* in = reinterpret_cast<sockaddr_in*>(&addr);
+        in->sin_family = AF_INET;
+        if (colon == std::string::npos || inet_pton(AF_INET, host_port.substr(0, colon).c_str(), &in->sin_addr) != 1) {
+            throw std::runtime_error("Address should be udp://<IPv4>:<port>, not " + address);
+        }
+        in->sin_port = htons(atoi(host_port.c_str() + colon + 1));
+        multicast = IN_MULTICAST(ntohl(in->sin_addr.s_addr));
+        addr_len = sizeof(sockaddr_in);
+        fd = socket(AF_INET, SOCK_DGRAM | SOCK_CLOEXEC, 0);
+    } else {
+        throw std::runtime_error("Address should be udp://host:port or unix:///path, not " + address);
+    }
+    if (fd < 0) throw std::runtime_error("Can not create socket for " + address + ": " + strerror(errno));
+}
+
+CPoseSocket::~CPoseSocket()
+{
+    if (fd >= 0) close(fd);
+}
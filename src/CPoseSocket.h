@@ -0,0 +1,35 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CPOSESOCKET_H__
+#define __CPOSESOCKET_H__
+
+#include <string>
+#include <sys/socket.h>
+
+// Datagram socket for the pose packets. The address is
+//  udp://host:port     unicast or multicast (224.0.0.0/4) UDP over IPv4
+//  unix:///path        UNIX datagram socket (the subscriber binds the path)
+class CPoseSocket
+{
+public:
+    CPoseSocket(const std::string& address);
+    virtual ~CPoseSocket();
+    CPoseSocket(const CPoseSocket&) = delete;
+    CPoseSocket& operator=(const CPoseSocket&) = delete;
+
+    const std::string address;
+
+protected:
+    int fd;
+    sockaddr_storage addr;      // where the packets go
+    socklen_t addr_len;
+    bool unix_socket;
+    bool multicast;
+    std::string unix_path;
+};
+
+
+#endif
+/* end of CPoseSocket.h */
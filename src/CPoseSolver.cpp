@@ -0,0 +1,119 @@
+#include <cmath>
+#include <cstring>
+#include "CPoseSolver.h"
+
+static const int POINTS_PER_MARKER = 5;
+
+CPoseSolver::CPoseSolver(float circle_diam, const cv::Mat& intrinsic_mat, const cv::Mat& distortion_coeffs) :
+    circle_diam(circle_diam),
+    intrinsic_mat(intrinsic_mat.clone()),
+    distortion_coeffs(distortion_coeffs.clone()),
+    rvec(cv::Mat::zeros(3, 1, CV_32FC1)),
+    tvec(cv::Mat::zeros(3, 1, CV_32FC1))
+{
+}
+
+// the ellipse in the canonical camera coords -> its cone -> both solutions (CTransformation::calcSolutions and calcEigen)
+int CPoseSolver::solve_conic(const cv::Point2f* points, whycon::SEllipseCenters& solution)
+{
+    float x = points[0].x;
+    float y = points[0].y;
+    // major axis
+    float x1 = points[1].x, y1 = points[1].y, x2 = points[2].x, y2 = points[2].y;
+    float major = std::sqrt((x1 - x2) * (x1 - x2) + (y1 - y2) * (y1 - y2)) / 2.0;
+    float v0 = (x2 - x1) / major / 2.0;
+    float v1 = (y2 - y1) / major / 2.0;
+    // minor axis
+    x1 = points[3].x, y1 = points[3].y, x2 = points[4].x, y2 = points[4].y;
+    float minor = std::sqrt((x1 - x2) * (x1 - x2) + (y1 - y2) * (y1 - y2)) / 2.0;
+
+    float a = v0 * v0 / (major * major) + v1 * v1 / (minor * minor);
+    float b = v0 * v1 * (1.0 / (major * major) - 1.0 / (minor * minor));
+    float c = v0 * v0 / (minor * minor) + v1 * v1 / (major * major);
+    float d = (-x * a - b * y);
+    float e = (-y * c - b * x);
+    float f = (a * x * x + c * y * y + 2.0 * b * x * y - 1.0);
+    float data[9] = {a, b, d, b, c, e, d, e, f};
+
+    cv::Matx31f val;
+    cv::Matx33f vec;
+    cv::eigen(cv::Matx33f(data), val, vec);
+    float L0 = val(0), L1 = val(1), L2 = val(2);
+    float c0 = std::sqrt((L0 - L1) / (L0 - L2));
+    float c0x = c0 * vec(0, 0), c0y = c0 * vec(0, 1), c0z = c0 * vec(0, 2);
+    float c1 = std::sqrt((L1 - L2) / (L0 - L2));
+    float c1x = c1 * vec(2, 0), c1y = c1 * vec(2, 1), c1z = c1 * vec(2, 2);
+    float c2 = circle_diam / std::sqrt(-L0 * L2) / 2.0;
+
+    static const float s0[8] = {1.0, 1.0, 1.0, 1.0, -1.0, -1.0, -1.0, -1.0};
+    static const float s1[8] = {1.0, 1.0, -1.0, -1.0, 1.0, 1.0, -1.0, -1.0};
+    static const float s2[8] = {1.0, -1.0, 1.0, -1.0, 1.0, -1.0, 1.0, -1.0};
+    int idx = 0;
+    for (int i = 0; i < 8 && idx < 2; i++) {
+        float n2 = s0[i] * c0z + s1[i] * c1z;
+        float t2 = s2[i] * c2 * (s0[i] * L2 * c0z + s1[i] * L0 * c1z);
+        if (n2 > 0 && t2 > 0) {
+            float t0 = s2[i] * c2 * (s0[i] * L2 * c0x + s1[i] * L0 * c1x);
+            float t1 = s2[i] * c2 * (s0[i] * L2 * c0y + s1[i] * L0 * c1y);
+            solution.n[idx][0] = s0[i] * c0x + s1[i] * c1x;
+            solution.n[idx][1] = s0[i] * c0y + s1[i] * c1y;
+            solution.n[idx][2] = n2;
+            // image coords -> camera coords
+            solution.t[idx][0] = t2;
+            solution.t[idx][1] = -t0;
+            solution.t[idx][2] = -t1;
+            centers.push_back(cv::Point3f(t0, t1, t2));     // projected later
+            idx++;
+        }
+    }
+    return idx;
+}
+
+void CPoseSolver::solve(const std::vector<whycon::SMarker>& markers, std::vector<whycon::SEllipseCenters>& solutions)
+{
+    solutions.resize(markers.size());
+    num_solutions.assign(markers.size(), 0);
+    image_points.clear();
+    for (auto const& marker: markers) {
+        if (!marker.valid) continue;
+        const whycon::SSegment& s = marker.seg;
+        image_points.push_back(cv::Point2f(s.x, s.y));
+        image_points.push_back(cv::Point2f(s.x + s.v0 * s.m0 * 2.0, s.y + s.v1 * s.m0 * 2.0));
+        image_points.push_back(cv::Point2f(s.x - s.v0 * s.m0 * 2.0, s.y - s.v1 * s.m0 * 2.0));
+        image_points.push_back(cv::Point2f(s.x + s.v1 * s.m1 * 2.0, s.y - s.v0 * s.m1 * 2.0));
+        image_points.push_back(cv::Point2f(s.x - s.v1 * s.m1 * 2.0, s.y + s.v0 * s.m1 * 2.0));
+    }
+    if (image_points.empty()) {
+        for (auto& solution: solutions) memset(&solution, 0, sizeof(solution));
+        return;
+    }
+    cv::undistortPoints(image_points, canonical_points, intrinsic_mat, distortion_coeffs);
+
+    centers.clear();
+    const cv::Point2f* points = canonical_points.data();
+    for (size_t i = 0; i < markers.size(); i++) {
+        memset(&solutions[i], 0, sizeof(solutions[i]));
+        if (!markers[i].valid) continue;
+        num_solutions[i] = solve_conic(points, solutions[i]);
+        points += POINTS_PER_MARKER;
+    }
+    if (centers.empty()) return;
+    cv::projectPoints(centers, rvec, tvec, intrinsic_mat, distortion_coeffs, projected);
+
+    const cv::Point2f* center = projected.data();
+    for (size_t i = 0; i < markers.size(); i++) {
+        for (int j = 0; j < num_solutions[i]; j++, center++) {
+            solutions[i].u[j] = center->x;
+            solutions[i].v[j] = center->y;
+        }
+    }
+}
+
+int CPoseSolver::solve(const whycon::SMarker& marker, whycon::SEllipseCenters& solution)
+{
+    std::vector<whycon::SMarker> markers(1, marker);
+    std::vector<whycon::SEllipseCenters> solutions;
+    solve(markers, solutions);
+    solution = solutions[0];
+    return num_solutions[0];
+}
@@ -0,0 +1,45 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CPOSESOLVER_H__
+#define __CPOSESOLVER_H__
+
+#include <vector>
+#include <opencv2/opencv.hpp>
+#include "SStructDefs.h"
+
+// Both solutions of the pose of the ellipses (CTransformation::calcSolutions) of all markers of a frame at once.
+// The points of all markers go through one cv::undistortPoints and one cv::projectPoints call (the buffers are
+// reused), as in CWhycon::processImage of the patched core (whycon_core.patch, CTransformation::calcSolutions
+// of a vector of segments). The results are the same as the ones of the core, a single solution is not copied.
+class CPoseSolver
+{
+public:
+    CPoseSolver(float circle_diam, const cv::Mat& intrinsic_mat, const cv::Mat& distortion_coeffs);
+
+    // solutions[i] of markers[i], the invalid markers get zeros
+    void solve(const std::vector<whycon::SMarker>& markers, std::vector<whycon::SEllipseCenters>& solutions);
+    // num of the solutions (0, 1 or 2)
+    int solve(const whycon::SMarker& marker, whycon::SEllipseCenters& solution);
+
+    // num of the solutions of markers[i] of the last solve (0 for the invalid ones), only these are filled
+    int num_solutions_of(size_t i) const { return num_solutions[i]; }
+
+private:
+    float circle_diam;
+    cv::Mat intrinsic_mat;
+    cv::Mat distortion_coeffs;
+    cv::Mat rvec, tvec;                         // zeros, the centers are in the camera coords
+    std::vector<cv::Point2f> image_points;      // center and the vertices of both axes of each ellipse
+    std::vector<cv::Point2f> canonical_points;
+    std::vector<cv::Point3f> centers;           // all solutions in the image oriented camera coords
+    std::vector<cv::Point2f> projected;
+    std::vector<int> num_solutions;            // of each marker
+
+    int solve_conic(const cv::Point2f* points, whycon::SEllipseCenters& solution);
+};
+
+
+#endif
+/* end of CPoseSolver.h */
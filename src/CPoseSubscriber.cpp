@@ -0,0 +1,84 @@
+#include <cerrno>
+#include <chrono>
+#include <cstring>
+#include <stdexcept>
+#include <netinet/in.h>
+#include <poll.h>
+#include <unistd.h>
+#include "CPoseSubscriber.h"
+
+static const size_t MAX_PACKET = 65536;
+
+CPoseSubscriber::CPoseSubscriber(const std::string& address) : CPoseSocket(address), packet(MAX_PACKET)
+{
+    int result;
+    if (unix_socket) {
+        unlink(unix_path.c_str());
+        result = bind(fd, reinterpret_cast<sockaddr*>(&addr), addr_len);
+    } else {
+        sockaddr_in local = *reinterpret_cast<sockaddr_in*>(&addr);
+        if (multicast) {
+            // more subscribers of the group on one host
+            int reuse = 1;
+            setsockopt(fd, SOL_SOCKET, SO_REUSEADDR, &reuse, sizeof(reuse));
+        }
+        result = bind(fd, reinterpret_cast<sockaddr*>(&local), sizeof(local));
+        if (result == 0 && multicast) {
+            ip_mreq group;
+            group.imr_multiaddr = local.sin_addr;
+            group.imr_interface.s_addr = htonl(INADDR_ANY);
+            result = setsockopt(fd, IPPROTO_IP, IP_ADD_MEMBERSHIP, &group, sizeof(group));
+        }
+    }
+    if (result != 0) {
+        int error = errno;
+        close(fd);
+        fd = -1;
+        throw std::runtime_error("Can not listen on " + address + ": " + strerror(error));
+    }
+}
+
+CPoseSubscriber::~CPoseSubscriber()
+{
+    if (unix_socket) unlink(unix_path.c_str());
+}
+
+bool CPoseSubscriber::receive(SPoseFrame& result, double timeout)
+{
+    auto deadline = std::chrono::steady_clock::now() + std::chrono::duration<double>(timeout < 0 ? 0 : timeout);
+    for (;;) {
+        int wait_ms = -1;
+        if (timeout >= 0) {
+            auto left = std::chrono::duration_cast<std::chrono::milliseconds>(deadline - std::chrono::steady_clock::now());
+            wait_ms = left.count() > 0 ? left.count() : 0;
+        }
+        pollfd p;
+        p.fd = fd;
+        p.events = POLLIN;
+        int ready = poll(&p, 1, wait_ms);
+        if (ready < 0 && errno == EINTR) continue;
+        if (ready < 0) throw std::runtime_error("Can not receive from " + address + ": " + strerror(errno));
+        if (ready == 0) return false;
+
+        ssize_t n = recv(fd, packet.data(), packet.size(), 0);
+        if (n < 0) {
+            if (errno == EINTR || errno == EAGAIN) continue;
+            throw std::runtime_error("Can not receive from " + address + ": " + strerror(errno));
+        }
+        SPoseHeader header;
+        if ((size_t)n >= sizeof(header)) memcpy(&header, packet.data(), sizeof(header));
+        if (
+            (size_t)n < sizeof(header) || header.magic != POSE_PACKET_MAGIC || header.version != POSE_PACKET_VERSION ||
+            (size_t)n != sizeof(header) + header.num_markers * sizeof(SPoseRecord)
+        ) {
+            invalid++;
+            continue;
+        }
+        result.frame = header.frame;
+        result.timestamp = header.timestamp;
+        result.markers.resize(header.num_markers);
+        memcpy(result.markers.data(), packet.data() + sizeof(header), header.num_markers * sizeof(SPoseRecord));
+        received++;
+        return true;
+    }
+}
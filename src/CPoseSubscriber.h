@@ -0,0 +1,39 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CPOSESUBSCRIBER_H__
+#define __CPOSESUBSCRIBER_H__
+
+#include <vector>
+#include "SPosePacket.h"
+#include "CPoseSocket.h"
+
+// poses of one frame received from CPosePublisher
+struct SPoseFrame {
+    uint64_t frame;
+    double timestamp;
+    std::vector<SPoseRecord> markers;
+};
+
+// Receives the packets of CPosePublisher. It binds the port (and joins the multicast group)
+// or the path of the UNIX socket (an old socket file is replaced, the file is removed with the object).
+class CPoseSubscriber : public CPoseSocket
+{
+public:
+    CPoseSubscriber(const std::string& address);
+    ~CPoseSubscriber();
+
+    // waits for the next packet up to timeout [s] (< 0 = forever), false after the timeout
+    bool receive(SPoseFrame& result, double timeout = -1);
+
+    unsigned long long received = 0;
+    unsigned long long invalid = 0;     // packets of other versions or broken ones (skipped)
+
+private:
+    std::vector<char> packet;
+};
+
+
+#endif
+/* end of CPoseSubscriber.h */
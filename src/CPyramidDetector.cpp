@@ -0,0 +1,132 @@
+#include <algorithm>
+#include "CPyramidDetector.h"
+
+static const int MIN_COARSE_SIZE = 64;  // [px] the smallest side of the decimated frame
+static const int WINDOW_ALIGN = 32;     // window sides are rounded up, the window detectors are reused
+
+CPyramidDetector::CPyramidDetector(
+    int levels,
+    int width, int height,
+    const cv::Mat& intrinsic_mat,
+    const cv::Mat& distortion_coeffs,
+    std::string clib_space_transform_path,
+    float circle_diam,
+    int num_markers,
+    whycon::ETransformType trans_type,
+    int id_bits,
+    int id_samples,
+    int hamming_dist,
+    bool identify,
+    bool debug,
+    CStats* stats
+) :
+    frame_width(width), frame_height(height),
+    coarse_detector(debug),
+    coarse_distortion_coeffs(distortion_coeffs.clone()),
+    windows(num_markers),
+    intrinsic_mat(intrinsic_mat), distortion_coeffs(distortion_coeffs),
+    clib_space_transform_path(clib_space_transform_path), circle_diam(circle_diam), trans_type(trans_type),
+    id_bits(id_bits), id_samples(id_samples), hamming_dist(hamming_dist), identify(identify), debug(debug),
+    stats(stats)
+{
+    // the decimated frame has to stay usable
+    this->levels = std::max(0, levels);
+    while (this->levels > 0 && std::min(width, height) >> this->levels < MIN_COARSE_SIZE) this->levels--;
+    scale = 1 << this->levels;
+    this->width = width / scale;
+    this->height = height / scale;
+
+    // pixel (i, j) of the decimated frame covers pixels [i*scale, (i+1)*scale) of the frame
+    intrinsic_mat.convertTo(coarse_intrinsic_mat, CV_64F);
+    coarse_intrinsic_mat.at<double>(0, 0) /= scale;
+    coarse_intrinsic_mat.at<double>(1, 1) /= scale;
+    coarse_intrinsic_mat.at<double>(0, 2) = (coarse_intrinsic_mat.at<double>(0, 2) + 0.5) / scale - 0.5;
+    coarse_intrinsic_mat.at<double>(1, 2) = (coarse_intrinsic_mat.at<double>(1, 2) + 0.5) / scale - 0.5;
+
+    // only the positions of the candidates are used, the IDs are read at full resolution
+    coarse_detector.init(circle_diam, false, id_bits, id_samples, hamming_dist, num_markers, false, this->width, this->height);
+    coarse_detector.updateCameraInfo(coarse_intrinsic_mat, coarse_distortion_coeffs);
+    coarse_detector.setDrawing(false, false);
+    coarse_detector.setCoordinates(whycon::TRANSFORM_NONE);
+
+    pixels.assign((this->height + 1) * this->width + 4, 0);
+    row_sums.assign(this->width, 0);
+    image.reset(new whycon::CRawImage(pixels.data(), this->width, this->height, 1));
+}
+
+CPyramidDetector::~CPyramidDetector() {}
+
+int CPyramidDetector::get_levels() const
+{
+    return levels;
+}
+
+void CPyramidDetector::load_calibration(std::string clib_space_transform_path)
+{
+    this->clib_space_transform_path = clib_space_transform_path;
+    for (auto& window: windows) {
+        if (window) window->load_calibration(clib_space_transform_path);
+    }
+}
+
+// averages the segmented channel (the first byte of the pixel) in the blocks scale x scale
+void CPyramidDetector::decimate(const whycon::CRawImage* frame)
+{
+    int bpp = frame->bpp_;
+    int area = scale * scale;
+    for (int y = 0; y < height; y++) {
+        std::fill(row_sums.begin(), row_sums.end(), 0);
+        for (int dy = 0; dy < scale; dy++) {
+            const unsigned char* src = &frame->data_[(y * scale + dy) * frame->width_ * bpp];
+            for (int x = 0; x < width; x++) {
+                int sum = 0;
+                for (int dx = 0; dx < scale; dx++, src += bpp) sum += src[0];
+                row_sums[x] += sum;
+            }
+        }
+        unsigned char* dst = &pixels[y * width];
+        for (int x = 0; x < width; x++) dst[x] = row_sums[x] / area;
+    }
+}
+
+std::vector<whycon::SMarker> CPyramidDetector::detects(CCoreLock& lock, const whycon::CRawImage* frame, const SMarkerQuery& query)
+{
+    {
+        CStageTimer timer(stats, CStats::STAGE_DECIMATE);
+        decimate(frame);
+    }
+    std::vector<whycon::SMarker> candidates;
+    lock.prepare(width, height);
+    {
+        CStageTimer timer(stats, CStats::STAGE_CORE);
+        coarse_detector.processImage(image.get(), candidates);
+    }
+    if (stats) stats->count_core(width, height);
+
+    std::vector<whycon::SMarker> markers;
+    int limit = identify ? query.limit() : query.blind_limit();
+    for (size_t i = 0; i < candidates.size() && i < windows.size(); i++) {
+        if (limit > 0 && (int)markers.size() >= limit) break;
+        const whycon::SSegment& seg = candidates[i].seg;
+        // bounding box in the frame with a margin of one coarse pixel (and the border of the core)
+        int margin = scale + 4;
+        int minx = seg.minx * scale - margin, maxx = (seg.maxx + 1) * scale + margin;
+        int miny = seg.miny * scale - margin, maxy = (seg.maxy + 1) * scale + margin;
+        int side = std::max(maxx - minx, maxy - miny);
+        side = std::min((side + WINDOW_ALIGN - 1) / WINDOW_ALIGN * WINDOW_ALIGN, std::min(frame_width, frame_height));
+
+        std::unique_ptr<CWindowDetector>& window = windows[i];
+        if (!window || window->width < side || window->width >= 2 * side) {
+            window.reset(new CWindowDetector(
+                side, side, intrinsic_mat, distortion_coeffs, clib_space_transform_path, circle_diam, 1,
+                trans_type, id_bits, id_samples, hamming_dist, identify, debug, stats
+            ));
+        }
+        side = window->width;
+        int x0 = std::max(0, std::min(frame_width - side, (minx + maxx - side) / 2));
+        int y0 = std::max(0, std::min(frame_height - side, (miny + maxy - side) / 2));
+        std::vector<whycon::SMarker> found = window->detects(lock, frame, x0, y0);
+        if (!found.empty() && (!identify || query.wants(found[0].seg.ID))) markers.push_back(found[0]);
+    }
+    return markers;
+}
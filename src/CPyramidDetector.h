@@ -0,0 +1,84 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CPYRAMIDDETECTOR_H__
+#define __CPYRAMIDDETECTOR_H__
+
+#include <memory>
+#include <string>
+#include <vector>
+#include <opencv2/opencv.hpp>
+#include "CRawImage.h"
+#include "SStructDefs.h"
+#include "CWhycon.h"
+#include "CCoreLock.h"
+#include "CWindowDetector.h"
+#include "CStats.h"
+#include "SMarkerQuery.h"
+
+// Coarse to fine detection. Candidates are searched in the frame decimated 2^levels times (only the segmented
+// channel is averaged) and each of them is then detected (and identified) at full resolution in a small window.
+// The markers has to be big enough to pass the tests of the core at the decimated level.
+class CPyramidDetector
+{
+public:
+
+    CPyramidDetector(
+        int levels,                                 // num of halvings of the frame
+        int width, int height,                      // size of the frame
+        const cv::Mat& intrinsic_mat,               // camera of the frame
+        const cv::Mat& distortion_coeffs,
+        std::string clib_space_transform_path,
+        float circle_diam,
+        int num_markers,
+        whycon::ETransformType trans_type,
+        int id_bits,
+        int id_samples,
+        int hamming_dist,
+        bool identify,
+        bool debug = false,
+        CStats* stats = NULL
+    );
+    ~CPyramidDetector();
+
+    // detects markers in the frame (call it under CCoreLock), the candidates are not detected at full resolution
+    // when the markers asked by the query are found (the IDs are known only when the windows identify)
+    std::vector<whycon::SMarker> detects(CCoreLock& lock, const whycon::CRawImage* frame, const SMarkerQuery& query = SMarkerQuery());
+
+    int get_levels() const;
+    // replaces the space calibration of the windows (call it under CCoreLock)
+    void load_calibration(std::string clib_space_transform_path);
+
+private:
+    int levels;
+    int scale;                      // 2^levels
+    int frame_width, frame_height;
+    int width, height;              // size of the decimated frame
+    whycon::CWhycon coarse_detector;
+    cv::Mat coarse_intrinsic_mat;   // camera of the decimated frame
+    cv::Mat coarse_distortion_coeffs;
+    std::vector<unsigned char> pixels;          // decimated frame (one channel)
+    std::vector<int> row_sums;
+    std::unique_ptr<whycon::CRawImage> image;
+    std::vector<std::unique_ptr<CWindowDetector> > windows;    // full resolution detector for each candidate
+
+    // for the windows
+    cv::Mat intrinsic_mat;
+    cv::Mat distortion_coeffs;
+    std::string clib_space_transform_path;
+    float circle_diam;
+    whycon::ETransformType trans_type;
+    int id_bits;
+    int id_samples;
+    int hamming_dist;
+    bool identify;
+    bool debug;
+    CStats* stats;
+
+    void decimate(const whycon::CRawImage* frame);
+};
+
+
+#endif
+/* end of CPyramidDetector.h */
@@ -0,0 +1,65 @@
+#include <cstring>
+#include <stdexcept>
+#include <opencv2/opencv.hpp>
+#include "CTransformation.h"
+#include "CMemoryFile.h"
+#include "CSpaceCalibration.h"
+
+static void read_matrix(const cv::FileStorage& fs, const std::string& name, int rows, int cols, float* out)
+{
+    cv::Mat mat;
+    fs[name] >> mat;
+    if (mat.rows != rows || mat.cols != cols) {
+        throw std::runtime_error("Space calibration should have " + name + " matrix " +
+                                 std::to_string(rows) + "x" + std::to_string(cols) + ".");
+    }
+    mat.convertTo(mat, CV_32F);
+    for (int i = 0; i < rows; i++) {
+        for (int j = 0; j < cols; j++) out[cols * i + j] = mat.at<float>(i, j);
+    }
+}
+
+CSpaceCalibration::CSpaceCalibration() : dim_x(0), dim_y(0)
+{
+    memset(hom, 0, sizeof(hom));
+    memset(transforms, 0, sizeof(transforms));
+}
+
+CSpaceCalibration CSpaceCalibration::parse(const std::string& content)
+{
+    cv::FileStorage fs(content, cv::FileStorage::READ | cv::FileStorage::MEMORY);
+    if (!fs.isOpened()) throw std::runtime_error("Can not parse the space calibration.");
+    CSpaceCalibration result;
+    fs["dim_x"] >> result.dim_x;
+    fs["dim_y"] >> result.dim_y;
+    read_matrix(fs, "hom", 3, 3, result.hom);
+    for (int k = 0; k < 4; k++) {
+        read_matrix(fs, "offset_" + std::to_string(k), 3, 1, result.transforms[k].orig);
+        read_matrix(fs, "simlar_" + std::to_string(k), 3, 3, result.transforms[k].simlar);
+    }
+    return result;
+}
+
+CSpaceCalibration CSpaceCalibration::from_corners(const whycon::STrackedObject corners[4], float dim_x, float dim_y)
+{
+    whycon::CTransformation trans(1.0, false);
+    trans.calibrate2D(corners, dim_x, dim_y);
+    trans.calibrate3D(corners, dim_x, dim_y);
+    // the results are private in the core, they are read back from its file (in memory)
+    CMemoryFile file("whycon_space_calibration", "");
+    trans.saveCalibration(file.path());
+    return parse(file.read());
+}
+
+std::string CSpaceCalibration::content() const
+{
+    cv::FileStorage fs(".yml", cv::FileStorage::WRITE | cv::FileStorage::MEMORY | cv::FileStorage::FORMAT_YAML);
+    fs << "dim_x" << dim_x;
+    fs << "dim_y" << dim_y;
+    fs << "hom" << cv::Mat(3, 3, CV_32FC1, const_cast<float*>(hom));
+    for (int k = 0; k < 4; k++) {
+        fs << "offset_" + std::to_string(k) << cv::Mat(3, 1, CV_32FC1, const_cast<float*>(transforms[k].orig));
+        fs << "simlar_" + std::to_string(k) << cv::Mat(3, 3, CV_32FC1, const_cast<float*>(transforms[k].simlar));
+    }
+    return fs.releaseAndGetString();
+}
@@ -0,0 +1,32 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CSPACECALIBRATION_H__
+#define __CSPACECALIBRATION_H__
+
+#include <string>
+#include "SStructDefs.h"
+
+// Content of the space calibration file (CTransformation::loadCalibration / saveCalibration) as numbers.
+class CSpaceCalibration
+{
+public:
+    float dim_x, dim_y;                     // size of the field
+    float hom[9];                           // 2D homography (TRANSFORM_2D)
+    whycon::S3DTransform transforms[4];     // offset and similarity of each corner (TRANSFORM_3D)
+
+    CSpaceCalibration();                    // zeros
+
+    // from the content of the file (YAML, XML or JSON as written by OpenCV), throws on a broken one
+    static CSpaceCalibration parse(const std::string& content);
+    // from the positions of the markers at the corners of the field (in the camera coords) [0,0], [dim_x,0],
+    // [0,dim_y], [dim_x,dim_y] (the order of CWhycon::autoCalib), computed by the core itself
+    static CSpaceCalibration from_corners(const whycon::STrackedObject corners[4], float dim_x, float dim_y);
+    // content of the file (YAML) for the core
+    std::string content() const;
+};
+
+
+#endif
+/* end of CSpaceCalibration.h */
@@ -0,0 +1,43 @@
+#include "CStats.h"
+
+CStats::CStats()
+{
+    reset();
+}
+
+void CStats::reset()
+{
+    for (int i = 0; i < STAGE_NUMBER; i++) {
+        time[i] = 0;
+        calls[i] = 0;
+    }
+    frames = 0;
+    markers = 0;
+    core_pixels = 0;
+    ring_samples = 0;
+    skipped_markers = 0;
+}
+
+void CStats::count_core(int width, int height)
+{
+    if (enabled) core_pixels += (long long)width * height;
+}
+
+const char* CStats::stage_name(int stage)
+{
+    static const char* names[STAGE_NUMBER] = {"total", "copy", "decimate", "core", "decode", "merge", "publish", "draw"};
+    return names[stage];
+}
+
+CStageTimer::CStageTimer(CStats* stats, CStats::EStage stage) :
+    stats(stats && stats->enabled ? stats : NULL), stage(stage)
+{
+    if (this->stats) start = std::chrono::steady_clock::now();
+}
+
+CStageTimer::~CStageTimer()
+{
+    if (!stats) return;
+    stats->time[stage] += std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+    stats->calls[stage]++;
+}
@@ -0,0 +1,58 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CSTATS_H__
+#define __CSTATS_H__
+
+#include <chrono>
+
+// Wall clock times and counters of the detection stages. They are collected only when enabled,
+// otherwise a timer costs one test of the flag.
+// The whycon core is one stage (segmentation, roundness tests, ID decoding and transformation are inside of it).
+class CStats
+{
+public:
+    enum EStage {
+        STAGE_TOTAL,        // whole detection of the frame
+        STAGE_COPY,         // copies of windows and tiles
+        STAGE_DECIMATE,     // decimation for the pyramid
+        STAGE_CORE,         // whycon core (CWhycon::processImage)
+        STAGE_DECODE,       // identification of the markers by the wrapper (set_id_table)
+        STAGE_MERGE,        // merging of the markers found in the tiles
+        STAGE_PUBLISH,      // sending of the poses (set_publisher)
+        STAGE_DRAW,         // rendering of the results (draw_coords, draw_segments)
+        STAGE_NUMBER
+    };
+
+    bool enabled = false;
+    double time[STAGE_NUMBER];      // [s]
+    long calls[STAGE_NUMBER];
+    long frames;
+    long markers;                   // num of returned markers
+    long long core_pixels;          // num of pixels of the images given to the core (upper bound of visited pixels)
+    long long ring_samples;         // num of points of the ID rings read by the wrapper (set_id_table)
+    long skipped_markers;           // num of found markers not returned (not wanted by the query or over its limit)
+
+    CStats();
+    void reset();
+    void count_core(int width, int height);     // the core has got an image of this size
+    static const char* stage_name(int stage);
+};
+
+// adds the time of its scope to the stage
+class CStageTimer
+{
+public:
+    CStageTimer(CStats* stats, CStats::EStage stage);
+    ~CStageTimer();
+
+private:
+    CStats* stats;      // NULL = not measured
+    CStats::EStage stage;
+    std::chrono::steady_clock::time_point start;
+};
+
+
+#endif
+/* end of CStats.h */
@@ -0,0 +1,63 @@
+#include "CThreadPool.h"
+
+CThreadPool::CThreadPool(int num_threads) :
+    task(NULL), num_tasks(0), next_task(0), done_tasks(0), stopping(false)
+{
+    if (num_threads <= 0) num_threads = std::thread::hardware_concurrency();
+    if (num_threads <= 0) num_threads = 1;
+    for (int i = 0; i < num_threads; i++) {
+        workers.push_back(std::thread(&CThreadPool::worker, this));
+    }
+}
+
+CThreadPool::~CThreadPool()
+{
+    {
+        std::lock_guard<std::mutex> lock(mutex);
+        stopping = true;
+    }
+    has_work.notify_all();
+    for (auto& w: workers) w.join();
+}
+
+int CThreadPool::size() const
+{
+    return workers.size();
+}
+
+void CThreadPool::run(int n, const std::function<void(int)>& t)
+{
+    if (n <= 0) return;
+    std::lock_guard<std::mutex> run_lock(run_mutex);
+    std::unique_lock<std::mutex> lock(mutex);
+    task = &t;
+    num_tasks = n;
+    next_task = 0;
+    done_tasks = 0;
+    error = nullptr;
+    has_work.notify_all();
+    work_done.wait(lock, [this] { return done_tasks == num_tasks; });
+    task = NULL;
+    if (error) std::rethrow_exception(error);
+}
+
+void CThreadPool::worker()
+{
+    std::unique_lock<std::mutex> lock(mutex);
+    while (true) {
+        has_work.wait(lock, [this] { return stopping || (task != NULL && next_task < num_tasks); });
+        if (stopping) return;
+        int i = next_task++;
+        const std::function<void(int)>* t = task;
+        lock.unlock();
+        std::exception_ptr task_error = nullptr;
+        try {
+            (*t)(i);
+        } catch (...) {
+            task_error = std::current_exception();
+        }
+        lock.lock();
+        if (task_error && !error) error = task_error;
+        if (++done_tasks == num_tasks) work_done.notify_all();
+    }
+}
@@ -0,0 +1,45 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CTHREADPOOL_H__
+#define __CTHREADPOOL_H__
+
+#include <vector>
+#include <thread>
+#include <mutex>
+#include <condition_variable>
+#include <functional>
+#include <exception>
+
+// Simple pool of native threads. It runs the tasks 0 ... num_tasks-1 and waits for all of them.
+class CThreadPool
+{
+public:
+    CThreadPool(int num_threads = 0);       // 0 = num of CPU cores
+    ~CThreadPool();
+
+    // calls task(i) for i in [0, num_tasks) on the threads of the pool, the first exception is rethrown
+    void run(int num_tasks, const std::function<void(int)>& task);
+    int size() const;
+
+private:
+    std::vector<std::thread> workers;
+    std::mutex run_mutex;                   // only one run() at a time
+    std::mutex mutex;
+    std::condition_variable has_work;
+    std::condition_variable work_done;
+
+    const std::function<void(int)>* task;
+    int num_tasks;
+    int next_task;
+    int done_tasks;
+    bool stopping;
+    std::exception_ptr error;
+
+    void worker();
+};
+
+
+#endif
+/* end of CThreadPool.h */
@@ -0,0 +1,119 @@
+#include <algorithm>
+#include <stdexcept>
+#include "CTiledDetector.h"
+
+CTiledDetector::CTiledDetector(
+    int tile_size,
+    int max_marker_diameter,
+    int num_threads,
+    int width, int height,
+    const cv::Mat& intrinsic_mat,
+    const cv::Mat& distortion_coeffs,
+    std::string clib_space_transform_path,
+    float circle_diam,
+    int num_markers,
+    whycon::ETransformType trans_type,
+    int id_bits,
+    int id_samples,
+    int hamming_dist,
+    bool identify,
+    bool debug,
+    CStats* stats
+) :
+    merge_distance(std::max(2, max_marker_diameter / 4)),
+    pool(num_threads),
+    num_markers(num_markers),
+    stats(stats)
+{
+    // all tiles have the same size (the last ones are moved back to the border), so the buffers of the core
+    // are not prepared again between the tiles
+    int overlap = max_marker_diameter + 4;
+    int tile_width = std::min(tile_size, width);
+    int tile_height = std::min(tile_size, height);
+    if ((tile_width < width && tile_width <= overlap) || (tile_height < height && tile_height <= overlap)) {
+        throw std::runtime_error(
+            "Tile size " + std::to_string(tile_size) + " has to be bigger than the max marker diameter " +
+            std::to_string(max_marker_diameter) + " + 4."
+        );
+    }
+    std::vector<int> xs = tile_starts(width, tile_width, overlap);
+    std::vector<int> ys = tile_starts(height, tile_height, overlap);
+    for (int y: ys) {
+        for (int x: xs) {
+            tile_x.push_back(x);
+            tile_y.push_back(y);
+            // the tiles run in parallel, the stages are measured here (CStats is not shared by the threads)
+            tiles.push_back(std::unique_ptr<CWindowDetector>(new CWindowDetector(
+                tile_width, tile_height, intrinsic_mat, distortion_coeffs, clib_space_transform_path, circle_diam,
+                num_markers, trans_type, id_bits, id_samples, hamming_dist, identify, debug
+            )));
+        }
+    }
+}
+
+CTiledDetector::~CTiledDetector() {}
+
+int CTiledDetector::num_tiles() const
+{
+    return tiles.size();
+}
+
+void CTiledDetector::load_calibration(std::string clib_space_transform_path)
+{
+    for (auto& tile: tiles) tile->load_calibration(clib_space_transform_path);
+}
+
+std::vector<int> CTiledDetector::tile_starts(int size, int tile, int overlap)
+{
+    std::vector<int> starts;
+    for (int start = 0; ; start += tile - overlap) {
+        if (start + tile >= size) {
+            starts.push_back(size - tile);
+            break;
+        }
+        starts.push_back(start);
+    }
+    return starts;
+}
+
+std::vector<whycon::SMarker> CTiledDetector::detects(CCoreLock& lock, const whycon::CRawImage* frame)
+{
+    {
+        CStageTimer timer(stats, CStats::STAGE_COPY);
+        pool.run(tiles.size(), [&](int i) {
+            tiles[i]->crop(frame, tile_x[i], tile_y[i]);
+        });
+    }
+
+    std::vector<std::vector<whycon::SMarker> > found(tiles.size());
+    {
+        // each thread of the pool segments in its own buffers (CCoreLock::prepare in CWindowDetector::process)
+        CStageTimer timer(stats, CStats::STAGE_CORE);
+        pool.run(tiles.size(), [&](int i) {
+            found[i] = tiles[i]->process(lock);
+        });
+    }
+    if (stats) {
+        for (auto& tile: tiles) stats->count_core(tile->width, tile->height);
+    }
+
+    CStageTimer timer(stats, CStats::STAGE_MERGE);
+    std::vector<whycon::SMarker> markers;
+    for (auto const& tile_markers: found) {
+        for (auto const& marker: tile_markers) {
+            // the marker in the overlap is found by both tiles
+            bool merged = false;
+            for (auto const& known: markers) {
+                float dx = known.seg.x - marker.seg.x;
+                float dy = known.seg.y - marker.seg.y;
+                if (dx * dx + dy * dy < merge_distance * merge_distance) {
+                    merged = true;
+                    break;
+                }
+            }
+            if (!merged) markers.push_back(marker);
+        }
+    }
+    if ((int)markers.size() > num_markers) markers.resize(num_markers);
+    return markers;
+}
@@ -0,0 +1,68 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CTILEDDETECTOR_H__
+#define __CTILEDDETECTOR_H__
+
+#include <memory>
+#include <string>
+#include <vector>
+#include <opencv2/opencv.hpp>
+#include "CRawImage.h"
+#include "SStructDefs.h"
+#include "CCoreLock.h"
+#include "CThreadPool.h"
+#include "CWindowDetector.h"
+#include "CStats.h"
+
+// Detection in overlapping tiles of a big frame. The overlap is the max diameter of a marker, so each marker
+// lies whole in some tile. Markers cut by a tile border are dropped by the tile and the markers found
+// in more tiles are merged.
+// The tiles are copied and segmented in parallel on the threads of the pool (the whycon core keeps its buffers
+// per thread, see CCoreLock), the buffers of the core have only the size of a tile.
+class CTiledDetector
+{
+public:
+
+    CTiledDetector(
+        int tile_size,                              // [px] side of the tile
+        int max_marker_diameter,                    // [px] overlap of the tiles
+        int num_threads,                            // 0 = num of CPU cores
+        int width, int height,                      // size of the frame
+        const cv::Mat& intrinsic_mat,               // camera of the frame
+        const cv::Mat& distortion_coeffs,
+        std::string clib_space_transform_path,
+        float circle_diam,
+        int num_markers,
+        whycon::ETransformType trans_type,
+        int id_bits,
+        int id_samples,
+        int hamming_dist,
+        bool identify,
+        bool debug = false,
+        CStats* stats = NULL
+    );
+    ~CTiledDetector();
+
+    // detects markers in the frame (call it under CCoreLock)
+    std::vector<whycon::SMarker> detects(CCoreLock& lock, const whycon::CRawImage* frame);
+
+    int num_tiles() const;
+    // replaces the space calibration of the tiles (call it under CCoreLock)
+    void load_calibration(std::string clib_space_transform_path);
+
+private:
+    std::vector<std::unique_ptr<CWindowDetector> > tiles;
+    std::vector<int> tile_x, tile_y;    // top left corners of the tiles
+    float merge_distance;               // [px] markers closer than this are the same marker
+    CThreadPool pool;
+    int num_markers;
+    CStats* stats;
+
+    static std::vector<int> tile_starts(int size, int tile, int overlap);
+};
+
+
+#endif
+/* end of CTiledDetector.h */
@@ -1,3 +1,8 @@
+#include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <fstream>
+#include <sstream>
 #include "CWhyconWrapper.h"
 
 // @TODO Add parametrs of CWhycon::updateConfiguration to the constructor
@@ -13,17 +18,54 @@ CWhyconWrapper::CWhyconWrapper(
     bool identify,
     bool draw_coords,
     bool draw_segments,
-    bool debug
+    bool debug,
+    int pyramid_levels
 ) :
-    detector(debug),
+    detector(new whycon::CWhycon(debug)),
     clib_camera_path(clib_camera_path), clib_space_transform_path(clib_space_transform_path), circle_diam(circle_diam),
     num_markers(num_markers), trans_type(trans_type), id_bits(id_bits), id_samples(id_samples), 
-    hamming_dist(hamming_dist), identify(identify), draw_coords(draw_coords), draw_segments(draw_segments), debug(debug),     
+    hamming_dist(hamming_dist), identify(identify), draw_coords(draw_coords), draw_segments(draw_segments), debug(debug),
+    pyramid_levels(pyramid_levels),
     intrinsic_mat(cv::Mat::eye(3,3, CV_32FC1)),
     distortion_coeffs(cv::Mat::zeros(1,5, CV_32FC1)),
-    autocali_has_started(false)
+    autocali_has_started(false),
+    renderer(draw_segments, draw_coords, draw_coords, trans_type == whycon::TRANSFORM_2D)
     {
         read_camera_calib_params();
+        read_space_calibration();
+    }
+
+CWhyconWrapper::CWhyconWrapper(
+    const cv::Mat& intrinsic_mat,
+    const cv::Mat& distortion_coeffs,
+    const std::string& space_calibration,
+    float circle_diam,
+    int num_markers,
+    whycon::ETransformType trans_type,
+    int id_bits,
+    int id_samples,
+    int hamming_dist,
+    bool identify,
+    bool draw_coords,
+    bool draw_segments,
+    bool debug,
+    int pyramid_levels
+) :
+    detector(new whycon::CWhycon(debug)),
+    circle_diam(circle_diam),
+    num_markers(num_markers), trans_type(trans_type), id_bits(id_bits), id_samples(id_samples),
+    hamming_dist(hamming_dist), identify(identify), draw_coords(draw_coords), draw_segments(draw_segments), debug(debug),
+    pyramid_levels(pyramid_levels),
+    intrinsic_mat(intrinsic_mat.clone()),
+    distortion_coeffs(distortion_coeffs.clone()),
+    space_calibration(space_calibration),
+    autocali_has_started(false),
+    renderer(draw_segments, draw_coords, draw_coords, trans_type == whycon::TRANSFORM_2D)
+    {
+        if (!space_calibration.empty()) {
+            space_file.reset(new CMemoryFile("whycon_space_calibration", space_calibration));
+            clib_space_transform_path = space_file->path();
+        }
     }
 
 
@@ -35,8 +77,7 @@ void CWhyconWrapper::read_camera_calib_params() {
    
     cv::FileStorage fs(clib_camera_path, cv::FileStorage::READ);
     if (!fs.isOpened()) {
-        std::cerr << "failed to open " << clib_camera_path << std::endl;
-        exit(1);
+        throw std::runtime_error("Failed to open camera calibration " + clib_camera_path + ".");
     }
     std::string camera_id;
     
@@ -52,17 +93,78 @@ void CWhyconWrapper::read_camera_calib_params() {
     }
 }
 
+// keeps the content of the space calibration file (empty when it can not be read, the core only warns about it)
+void CWhyconWrapper::read_space_calibration() {
+    std::ifstream file(clib_space_transform_path, std::ios::binary);
+    if (!file) return;
+    std::ostringstream content;
+    content << file.rdbuf();
+    space_calibration = content.str();
+}
+
+// Limits the num of markers searched by the core in one call (its arrays keep the size given by init),
+// the num of the core is restored when the call ends in any way.
+class CCoreMarkersLimit
+{
+public:
+    CCoreMarkersLimit(whycon::CWhycon& core, int limit) : core(core), num_markers(core.num_markers_)
+    {
+        if (limit > 0 && limit < num_markers) core.num_markers_ = limit;
+    }
+    ~CCoreMarkersLimit()
+    {
+        core.num_markers_ = num_markers;
+    }
+
+private:
+    whycon::CWhycon& core;
+    const int num_markers;
+};
+
 // initialize if you know size of image 
 void CWhyconWrapper::init_lean(whycon::CRawImage* image) {
-    if (initialized) return;
-    initialized = true;
+    if (initialized) {
+        if (image->width_ == detector->image_width_ && image->height_ == detector->image_height_) return;
+        // Other image size: the core and the helpers made for the size are built again (the buffers of the core
+        // are prepared for the size by CCoreLock, so the core can not adjust itself), the tracks are forgotten.
+        detector.reset(new whycon::CWhycon(debug));
+        pyramid.reset();
+        tiled.reset();
+        release_windows();
+        tracker.tracks.clear();
+        autocali_has_started = false;
+    } else {
+        initialized = true;
+        core_identify = identify;
+        core_id_bits = id_bits;
+        core_hamming_dist = hamming_dist;
+        if (id_table && identify) {
+            id_decoder.reset(new CIdDecoder(
+                CIdCodebook::get(id_bits, hamming_dist, id_cache_dir), id_samples, intrinsic_mat, distortion_coeffs,
+                clib_space_transform_path, circle_diam, trans_type, adaptive_id_sampling, debug, &stats
+            ));
+            // the core builds its own (unused) ID table, the smallest one is enough
+            core_identify = false;
+            core_id_bits = 3;
+            core_hamming_dist = 1;
+        }
+    }
     // init(float circle_diam, bool use_gui, int id_b, int id_s, int ham_dist, int markers, bool identify, int img_w, int img_h);
-    detector.init(circle_diam, false, id_bits, id_samples, hamming_dist, num_markers, identify,  image->width_, image->height_);
-    // @TODO: detector.loadCalibration(clib_space_transform_path);
-    detector.updateCameraInfo(intrinsic_mat, distortion_coeffs);
-    detector.setDrawing(draw_coords, draw_segments);
-    detector.setCoordinates(trans_type);
-    detector.loadCalibration(clib_space_transform_path);
+    detector->init(
+        circle_diam, false, core_id_bits, id_samples, core_hamming_dist, num_markers, core_identify, image->width_, image->height_
+    );
+    // @TODO: detector->loadCalibration(clib_space_transform_path);
+    detector->updateCameraInfo(intrinsic_mat, distortion_coeffs);
+    // the core does not draw, the results are rendered after the detection (see process)
+    detector->setDrawing(false, false);
+    detector->setCoordinates(trans_type);
+    if (!clib_space_transform_path.empty()) detector->loadCalibration(clib_space_transform_path);
+    if (pyramid_levels > 0) {
+        pyramid.reset(new CPyramidDetector(
+            pyramid_levels, image->width_, image->height_, intrinsic_mat, distortion_coeffs, clib_space_transform_path,
+            circle_diam, num_markers, trans_type, core_id_bits, id_samples, core_hamming_dist, core_identify, debug, &stats
+        ));
+    }
     if (debug) {    
         printf("\nDBG: clib_camera_path: %s\n", clib_camera_path.c_str());
         printf("DBG: clib_space_transform_path: %s\n", clib_space_transform_path.c_str());
@@ -75,32 +177,419 @@ void CWhyconWrapper::init_lean(whycon::CRawImage* image) {
         printf("DBG: identify: %s\n", identify ? "true" : "false");
         printf("DBG: draw_coords: %s\n", draw_coords ? "true" : "false");
         printf("DBG: draw_segments: %s\n", draw_segments ? "true" : "false");
+        printf("DBG: id_table: %s%s\n", id_decoder ? "true" : "false", adaptive_id_sampling ? " (adaptive)" : "");
+        printf("DBG: pyramid_levels: %d\n", pyramid ? pyramid->get_levels() : 0);
         printf("DBG: initialized: %s\n", initialized ? "true" : "false");
         //std::cout << "detector" << detector << std::endl;
     }
 }
 
-std::vector<whycon::SMarker> CWhyconWrapper::detects(whycon::CRawImage* image)
-{   
+// Wraps the caller's buffer without copying it. The wrapper is created only once (or when the format changes),
+// then only its data pointer is moved to the new frame.
+whycon::CRawImage* CWhyconWrapper::wrap_frame(unsigned char* data, int width, int height, int bpp)
+{
+    if (!frame || frame->width_ != width || frame->height_ != height || frame->bpp_ != bpp) {
+        frame.reset(new whycon::CRawImage(data, width, height, bpp));
+    } else {
+        frame->data_ = data;
+    }
+    return frame.get();
+}
+
+std::vector<whycon::SMarker> CWhyconWrapper::process(whycon::CRawImage* image, CCoreLock& lock, const SMarkerQuery& query)
+{
     init_lean(image);
+    this->query = query;
+    std::sort(this->query.ids.begin(), this->query.ids.end());
+    CStageTimer timer(&stats, CStats::STAGE_TOTAL);
+    std::chrono::steady_clock::time_point start = std::chrono::steady_clock::now();
+    int degradations = latency.start(available_degradations());
+    if (id_decoder) id_decoder->sparse = degradations & DEGRADE_ID_SAMPLING;
+    if (stats.enabled) stats.frames++;
+    std::vector<whycon::SMarker> markers = search(image, lock);
+    select(markers);
+    if (stats.enabled) stats.markers += markers.size();
+    if (publisher) {
+        CStageTimer timer(&stats, CStats::STAGE_PUBLISH);
+        publisher->publish(markers);
+    }
+    if (draw_coords || draw_segments) {
+        CStageTimer timer(&stats, CStats::STAGE_DRAW);
+        renderer.render(image, markers);
+    }
+    latency.update(std::chrono::duration<float>(std::chrono::steady_clock::now() - start).count());
+    return markers;
+}
+
+// drops the markers not wanted by the query and the ones over its max_markers
+void CWhyconWrapper::select(std::vector<whycon::SMarker>& markers)
+{
+    if (query.ids.empty() && query.max_markers <= 0) return;
+    size_t n = 0;
+    for (size_t i = 0; i < markers.size(); i++) {
+        const whycon::SMarker& marker = markers[i];
+        if (!marker.valid || !query.wants(marker.seg.ID) || (query.max_markers > 0 && (int)n >= query.max_markers)) {
+            if (stats.enabled) stats.skipped_markers++;
+            continue;
+        }
+        if (n != i) markers[n] = marker;
+        n++;
+    }
+    markers.resize(n);
+}
+
+// the degradations which change something with the settings of the detector
+int CWhyconWrapper::available_degradations() const
+{
+    int available = DEGRADE_NONE;
+    // the decoder is created with the first frame (whether its rings can be read sparsely is known then)
+    bool decoder = initialized ? (bool)id_decoder : id_table && identify;
+    bool sparse = initialized ? id_decoder && id_decoder->can_read_sparsely() : decoder;
+    if (decoder && tracker.enabled) available |= DEGRADE_STABLE_IDS;
+    if (sparse) available |= DEGRADE_ID_SAMPLING;
+    if (tracker.enabled && tracker.rescan_interval > 0) available |= DEGRADE_RESCANS;
+    return available;
+}
+
+// searches the frame in the windows of the tracked markers or as a whole (by tiles, pyramid or the core itself)
+std::vector<whycon::SMarker> CWhyconWrapper::search(whycon::CRawImage* image, CCoreLock& lock)
+{
     std::vector<whycon::SMarker> markers;
-    detector.processImage(image, markers);
+    if (tracker.enabled) {
+        tracker.counters.frames++;
+        tracker.predict();
+        bool postpone = latency.active & DEGRADE_RESCANS;
+        bool full_scan = tracker.needs_full_scan(postpone);
+        if (postpone && !full_scan && tracker.needs_full_scan()) latency.postponed_scans++;
+        tracker.counters.last_full_scan = full_scan || !track_in_windows(image, lock, markers);
+        if (!tracker.counters.last_full_scan) return markers;
+        tracker.counters.full_scans++;
+        markers.clear();
+    }
+    if (tile_size > 0) {
+        if (!tiled) {
+            tiled.reset(new CTiledDetector(
+                tile_size, max_marker_diameter, tile_threads, image->width_, image->height_, intrinsic_mat, distortion_coeffs,
+                clib_space_transform_path, circle_diam, num_markers, trans_type, core_id_bits, id_samples, core_hamming_dist,
+                core_identify, debug, &stats
+            ));
+        }
+        markers = tiled->detects(lock, image);
+    } else if (pyramid) {
+        markers = pyramid->detects(lock, image, query);
+    } else {
+        lock.prepare(image->width_, image->height_);   // the windows could use the buffers of the core
+        CStageTimer timer(&stats, CStats::STAGE_CORE);
+        // the core stops after the asked num of markers (its arrays keep the size given by init)
+        CCoreMarkersLimit limit(*detector, query.blind_limit());
+        detector->processImage(image, markers);
+        stats.count_core(image->width_, image->height_);
+    }
+    if (id_decoder) id_decoder->decode(image, markers, query);
+    if (tracker.enabled) {
+        // all the found markers are tracked (the ones not wanted now for the other queries), process() selects
+        release_windows();  // the tracks not found are dropped, the others take their windows again
+        tracker.update_from_scan(markers);
+    }
+    return markers;
+}
+
+// Searches each tracked marker in the window around its predicted position.
+// Returns false if the whole image has to be searched (a marker was missed too many times or its window is too big).
+bool CWhyconWrapper::track_in_windows(whycon::CRawImage* image, CCoreLock& lock, std::vector<whycon::SMarker>& markers)
+{
+    std::vector<int> hits(tracker.tracks.size(), -1);   // index of the found marker for each track
+    std::vector<bool> reused(tracker.tracks.size(), false);     // the ID was taken from the track
+    std::vector<bool> skipped(tracker.tracks.size(), false);    // the marker is not wanted by the query
+    int searched = 0;
+    for (size_t i = 0; i < tracker.tracks.size(); i++) {
+        STrack& track = tracker.tracks[i];
+        // the tracks of the markers not wanted now are kept for the other queries
+        skipped[i] = track.id > 0 && !query.wants(track.id);
+        if (skipped[i]) continue;
+        searched++;
+        int side = tracker.window_side(track);
+        if (2 * side > std::min(image->width_, image->height_)) return false;
+        if (!track.window || track.window->width < side || track.window->width >= 2 * side) {
+            if (track.window) spare_windows.emplace(track.window->width, std::move(track.window));
+            track.window = window_detector(side);
+        }
+        side = track.window->width;
+        int x0 = std::max(0, std::min(image->width_ - side, (int)track.fx.position - side / 2));
+        int y0 = std::max(0, std::min(image->height_ - side, (int)track.fy.position - side / 2));
+
+        tracker.counters.window_searches++;
+        std::vector<whycon::SMarker> found = track.window->detects(lock, image, x0, y0);
+        if (!found.empty() && id_decoder) {
+            reused[i] = (latency.active & DEGRADE_STABLE_IDS) && tracker.has_stable_id(track);
+            if (reused[i]) {
+                tracker.reuse_id(track, found[0]);
+            } else {
+                id_decoder->decode(image, found[0], query);
+            }
+        }
+        if (!found.empty() && (!found[0].valid || !query.wants(found[0].seg.ID))) {
+            if (track.id <= 0 && found[0].valid && found[0].seg.ID > 0 && !query.ids.empty()) {
+                // the marker of the track is identified now, it is not wanted
+                track.id = found[0].seg.ID;
+                skipped[i] = true;
+                continue;
+            }
+            found.clear();      // another or unreadable marker in the window, a miss
+        }
+        if (!found.empty() && tracker.accepts(track, found[0])) {
+            hits[i] = markers.size();
+            markers.push_back(found[0]);
+        } else if (track.misses + 1 >= tracker.max_misses) {
+            return false;
+        }
+    }
+    if (searched == 0) return false;    // no wanted marker is tracked
+    // the frame is done without the full scan, so the tracks can be updated
+    for (size_t i = 0; i < tracker.tracks.size(); i++) {
+        if (skipped[i]) continue;
+        if (hits[i] < 0) {
+            tracker.tracks[i].misses++;
+        } else {
+            tracker.counters.window_hits++;
+            if (reused[i]) latency.reused_ids++;
+            tracker.correct(tracker.tracks[i], markers[hits[i]], !reused[i]);
+        }
+    }
+    return true;
+}
+
+std::unique_ptr<CWindowDetector> CWhyconWrapper::window_detector(int side)
+{
+    // the same size class as the one of the track (the window is replaced when it is not in [side, 2 * side))
+    auto spare = spare_windows.lower_bound(side);
+    if (spare != spare_windows.end() && spare->first < 2 * side) {
+        std::unique_ptr<CWindowDetector> window = std::move(spare->second);
+        spare_windows.erase(spare);
+        return window;
+    }
+    return std::unique_ptr<CWindowDetector>(new CWindowDetector(
+        side, side, intrinsic_mat, distortion_coeffs, clib_space_transform_path, circle_diam, 1,
+        trans_type, core_id_bits, id_samples, core_hamming_dist, core_identify, debug, &stats
+    ));
+}
+
+void CWhyconWrapper::release_windows()
+{
+    for (auto& track: tracker.tracks) {
+        if (track.window) spare_windows.emplace(track.window->width, std::move(track.window));
+    }
+    // the biggest ones are dropped, there are at most as many windows as tracked markers
+    while (spare_windows.size() > (size_t)std::max(num_markers, 1)) spare_windows.erase(std::prev(spare_windows.end()));
+}
+
+void CWhyconWrapper::set_tracking(
+    bool enable, int max_misses, int rescan_interval, float process_noise, float measurement_noise
+) {
+    std::lock_guard<std::mutex> guard(mutex);
+    tracker.enabled = enable;
+    tracker.max_misses = std::max(1, max_misses);
+    tracker.rescan_interval = rescan_interval;
+    tracker.process_noise = process_noise;
+    tracker.measurement_noise = measurement_noise;
+    release_windows();
+    tracker.tracks.clear();
+}
+
+STrackingCounters CWhyconWrapper::get_tracking_counters() const
+{
+    return tracker.counters;
+}
+
+void CWhyconWrapper::reset_tracking_counters()
+{
+    std::lock_guard<std::mutex> guard(mutex);
+    tracker.reset_counters();
+}
+
+void CWhyconWrapper::set_tiles(int tile_size, int max_marker_diameter, int num_threads)
+{
+    std::lock_guard<std::mutex> guard(mutex);
+    this->tile_size = std::max(0, tile_size);
+    this->max_marker_diameter = max_marker_diameter;
+    tile_threads = num_threads;
+    tiled.reset();
+}
+
+int CWhyconWrapper::num_tiles() const
+{
+    return tiled ? tiled->num_tiles() : 0;
+}
+
+void CWhyconWrapper::set_id_table(bool enable, std::string cache_dir, bool adaptive_sampling)
+{
+    std::lock_guard<std::mutex> guard(mutex);
+    // the core is initialized with or without its identification with the first frame
+    if (initialized) throw std::runtime_error("The ID table has to be set before the first frame.");
+    id_table = enable;
+    id_cache_dir = cache_dir;
+    adaptive_id_sampling = adaptive_sampling;
+    helpers.clear();    // detects_parallel creates them again with the table
+}
+
+const cv::Mat& CWhyconWrapper::get_intrinsic_mat() const
+{
+    return intrinsic_mat;
+}
+
+const cv::Mat& CWhyconWrapper::get_distortion_coeffs() const
+{
+    return distortion_coeffs;
+}
+
+const std::string& CWhyconWrapper::get_space_calibration() const
+{
+    return space_calibration;
+}
+
+std::vector<float> CWhyconWrapper::get_tracking_state() const
+{
+    return tracker.get_state();
+}
+
+void CWhyconWrapper::set_tracking_state(const std::vector<float>& state)
+{
+    std::lock_guard<std::mutex> guard(mutex);
+    release_windows();
+    tracker.set_state(state);
+}
+
+void CWhyconWrapper::set_publisher(const std::string& address)
+{
+    std::unique_ptr<CPosePublisher> replacement(address.empty() ? NULL : new CPosePublisher(address));
+    std::lock_guard<std::mutex> guard(mutex);
+    publisher = std::move(replacement);
+}
+
+const CPosePublisher* CWhyconWrapper::get_publisher() const
+{
+    return publisher.get();
+}
+
+void CWhyconWrapper::set_latency_budget(float max_latency, int restore_frames)
+{
+    std::lock_guard<std::mutex> guard(mutex);
+    latency.set_budget(max_latency, restore_frames);
+}
+
+const CLatencyController& CWhyconWrapper::get_latency_controller() const
+{
+    return latency;
+}
+
+void CWhyconWrapper::enable_stats(bool enable)
+{
+    std::lock_guard<std::mutex> guard(mutex);
+    stats.enabled = enable;
+}
+
+const CStats& CWhyconWrapper::get_stats() const
+{
+    return stats;
+}
+
+void CWhyconWrapper::reset_stats()
+{
+    std::lock_guard<std::mutex> guard(mutex);
+    stats.reset();
+    tracker.reset_counters();
+    latency.reset_counters();
+}
+
+std::vector<whycon::SMarker> CWhyconWrapper::detects(
+    whycon::CRawImage* image, const SMarkerQuery& query, int* degradations
+)
+{   
+    CCoreLock lock(mutex, image->width_, image->height_);
+    std::vector<whycon::SMarker> markers = process(image, lock, query);
+    if (degradations) *degradations = latency.active;
     return markers;
 }
 
+std::vector<whycon::SMarker> CWhyconWrapper::detects(
+    unsigned char* data, int width, int height, int bpp, const SMarkerQuery& query, int* degradations
+)
+{
+    // the wrapper of the frame is shared, it is changed only under the lock
+    CCoreLock lock(mutex, width, height);
+    std::vector<whycon::SMarker> markers = process(wrap_frame(data, width, height, bpp), lock, query);
+    if (degradations) *degradations = latency.active;
+    return markers;
+}
+
+std::vector<std::vector<whycon::SMarker> > CWhyconWrapper::detects_batch(
+    const std::vector<SFrame>& frames, const SMarkerQuery& query, std::vector<int>* degradations
+)
+{
+    std::vector<std::vector<whycon::SMarker> > results;
+    results.reserve(frames.size());
+    if (degradations) degradations->clear();
+    if (frames.empty()) return results;
+    // one lock for the whole batch (the buffers are prepared again only when the size changes)
+    CCoreLock lock(mutex, frames[0].width, frames[0].height);
+    for (auto const& f: frames) {
+        lock.prepare(f.width, f.height);
+        results.push_back(process(wrap_frame(f.data, f.width, f.height, f.bpp), lock, query));
+        if (degradations) degradations->push_back(latency.active);
+    }
+    return results;
+}
+
+std::vector<std::vector<whycon::SMarker> > CWhyconWrapper::detects_parallel(
+    const std::vector<SFrame>& frames, int num_threads, const SMarkerQuery& query
+)
+{
+    std::lock_guard<std::mutex> guard(mutex);   // the helpers are used by one call at a time
+    if (!helper_threads || (num_threads > 0 && num_threads != helper_threads->size())) {
+        helper_threads.reset(new CThreadPool(num_threads));
+        helpers.clear();
+    }
+    while ((int)helpers.size() < helper_threads->size()) {
+        std::unique_ptr<CWhyconWrapper> helper(new CWhyconWrapper(
+            intrinsic_mat, distortion_coeffs, space_calibration, circle_diam, num_markers, trans_type,
+            id_bits, id_samples, hamming_dist, identify, draw_coords, draw_segments, debug, pyramid_levels
+        ));
+        helper->set_id_table(id_table, id_cache_dir, adaptive_id_sampling);
+        helpers.push_back(std::move(helper));
+    }
+    std::vector<std::vector<whycon::SMarker> > results(frames.size());
+    int n = helpers.size();
+    // the helper k takes the frames k, k + n, ... (each helper is used by one thread)
+    helper_threads->run(n, [&](int k) {
+        for (size_t i = k; i < frames.size(); i += n) {
+            const SFrame& f = frames[i];
+            if (f.data) results[i] = helpers[k]->detects(f.data, f.width, f.height, f.bpp, query);
+        }
+    });
+    return results;
+}
+
 // Entry point for autocalibration
 CAutocalibrationResult CWhyconWrapper::detect_and_calibrate(
     whycon::CRawImage* image, std::string autocalib_space_out_path, float field_length, float field_width, bool idebug
 ) { 
+    CCoreLock lock(mutex, image->width_, image->height_);
+    return autocalibrate(image, lock, autocalib_space_out_path, field_length, field_width, idebug);
+}
+
+CAutocalibrationResult CWhyconWrapper::autocalibrate(
+    whycon::CRawImage* image, CCoreLock& lock, std::string autocalib_space_out_path, float field_length, float field_width,
+    bool idebug
+) {
     CAutocalibrationResult autocalibration_result;
 
     init_lean(image);
-    detector.debug = idebug;
-    detector.field_length_ = field_length;
-    detector.field_width_ = field_width;
+    detector->debug = idebug;
+    detector->field_length_ = field_length;
+    detector->field_width_ = field_width;
     if (not autocali_has_started) {
         try {
-            detector.autocalibration();  // Sets autocalibration_result.saved = True (until autocalibration is not done).
+            detector->autocalibration();  // Sets autocalibration_result.saved = True (until autocalibration is not done).
             autocalibration_result.saved = false;
             autocali_has_started = true;
         } catch(const std::exception& e) {
@@ -108,11 +597,126 @@ CAutocalibrationResult CWhyconWrapper::detect_and_calibrate(
             autocali_has_started = false;
         }
     }
-    detector.processImage(image, autocalibration_result.markers);
-    if (autocali_has_started and (not detector.autocalibrate_)) {
+    detector->processImage(image, autocalibration_result.markers);
+    if (id_decoder) id_decoder->decode(image, autocalibration_result.markers);
+    if (draw_coords || draw_segments) renderer.render(image, autocalibration_result.markers);
+    if (autocali_has_started and (not detector->autocalibrate_)) {
             std::cout << "Write calibration result to " << autocalib_space_out_path <<  std::endl;
-            detector.saveCalibration(autocalib_space_out_path);
+            detector->saveCalibration(autocalib_space_out_path);
             autocalibration_result.saved = true;
     }
     return autocalibration_result;
 }
+
+// the mean of the points without the ones further than OUTLIER_MADS * median distance from the median
+static whycon::STrackedObject robust_mean(const std::vector<whycon::STrackedObject>& points)
+{
+    static const float OUTLIER_MADS = 3;
+    auto median = [](std::vector<float> values) {
+        std::nth_element(values.begin(), values.begin() + values.size() / 2, values.end());
+        return values[values.size() / 2];
+    };
+    std::vector<float> xs, ys, zs;
+    for (auto const& p: points) {
+        xs.push_back(p.x);
+        ys.push_back(p.y);
+        zs.push_back(p.z);
+    }
+    float mx = median(xs), my = median(ys), mz = median(zs);
+    std::vector<float> distances;
+    for (auto const& p: points) {
+        distances.push_back(std::sqrt((p.x - mx) * (p.x - mx) + (p.y - my) * (p.y - my) + (p.z - mz) * (p.z - mz)));
+    }
+    float limit = OUTLIER_MADS * median(distances);
+
+    whycon::STrackedObject result = whycon::STrackedObject();
+    int n = 0;
+    for (size_t i = 0; i < points.size(); i++) {
+        if (distances[i] > limit) continue;
+        result.x += points[i].x;
+        result.y += points[i].y;
+        result.z += points[i].z;
+        n++;
+    }
+    result.x /= n;
+    result.y /= n;
+    result.z /= n;
+    return result;
+}
+
+CCalibrationResult CWhyconWrapper::calibrate_from_frames(
+    const std::vector<SFrame>& frames, float field_length, float field_width
+) {
+    // camera coords without the identification (the smallest ID table), the settings of this detector are not touched
+    CWhyconWrapper calibrator(
+        intrinsic_mat, distortion_coeffs, "", circle_diam, std::max(num_markers, 4), whycon::TRANSFORM_NONE,
+        3, id_samples, 1, false, false, false, debug
+    );
+    static const int sX[] = {-1, +1, -1, +1};
+    static const int sY[] = {+1, +1, -1, -1};
+    std::vector<whycon::STrackedObject> observations[4];
+    CCalibrationResult result;
+    for (auto const& f: frames) {
+        if (!f.data) continue;
+        std::vector<whycon::SMarker> found = calibrator.detects(f.data, f.width, f.height, f.bpp);
+        std::vector<whycon::SMarker> markers;
+        for (auto const& marker: found) {
+            if (marker.valid) markers.push_back(marker);
+        }
+        if (markers.size() < 4) continue;
+        // the outermost markers in the image, [0,0] is left-top, [field_length,0] is the next clockwise
+        int index[4];
+        for (int b = 0; b < 4; b++) {
+            float max_eval = -1e30;
+            for (size_t i = 0; i < markers.size(); i++) {
+                float eval = sX[b] * markers[i].seg.x + sY[b] * markers[i].seg.y;
+                if (eval > max_eval) {
+                    max_eval = eval;
+                    index[b] = i;
+                }
+            }
+        }
+        bool distinct = true;
+        for (int b = 0; b < 4; b++) {
+            for (int c = 0; c < b; c++) distinct = distinct && index[b] != index[c];
+        }
+        if (!distinct) continue;
+        for (int b = 0; b < 4; b++) observations[b].push_back(markers[index[b]].obj);
+        result.num_frames++;
+    }
+    if (result.num_frames == 0) {
+        throw std::runtime_error("Calibration not possible. Cannot locate 4 markers in any frame.");
+    }
+    for (int b = 0; b < 4; b++) result.corners[b] = robust_mean(observations[b]);
+    result.calibration = CSpaceCalibration::from_corners(result.corners, field_length, field_width);
+    return result;
+}
+
+void CWhyconWrapper::set_space_calibration(const std::string& content)
+{
+    CSpaceCalibration::parse(content);  // throws on a broken content before anything is changed
+    std::unique_ptr<CMemoryFile> file(new CMemoryFile("whycon_space_calibration", content));
+    CCoreLock lock(mutex);
+    space_calibration = content;
+    space_file = std::move(file);
+    clib_space_transform_path = space_file->path();
+    helpers.clear();            // detects_parallel creates them again with the new calibration
+    if (!initialized) return;   // it is loaded with the 1st frame
+    detector->loadCalibration(clib_space_transform_path);
+    if (pyramid) pyramid->load_calibration(clib_space_transform_path);
+    if (tiled) tiled->load_calibration(clib_space_transform_path);
+    for (auto& track: tracker.tracks) {
+        if (track.window) track.window->load_calibration(clib_space_transform_path);
+    }
+    for (auto& spare: spare_windows) spare.second->load_calibration(clib_space_transform_path);
+    if (id_decoder) id_decoder->load_calibration(clib_space_transform_path);
+}
+
+CAutocalibrationResult CWhyconWrapper::detect_and_calibrate(
+    unsigned char* data, int width, int height, int bpp,
+    std::string autocalib_space_out_path, float field_length, float field_width, bool idebug
+) {
+    // the wrapper of the frame is shared, it is changed only under the lock
+    CCoreLock lock(mutex, width, height);
+    return autocalibrate(wrap_frame(data, width, height, bpp), lock, autocalib_space_out_path, field_length, field_width, idebug);
+}
@@ -7,6 +7,9 @@
 
 #include <stdlib.h>
 #include <list>
+#include <map>
+#include <memory>
+#include <mutex>
 #include <iostream>
 #include <string>
 #include <vector>
@@ -14,6 +17,27 @@
 #include "CRawImage.h"
 #include "SStructDefs.h"
 #include "CWhycon.h"
+#include "CCoreLock.h"
+#include "CMarkerTracker.h"
+#include "CPyramidDetector.h"
+#include "CTiledDetector.h"
+#include "CThreadPool.h"
+#include "CStats.h"
+#include "CMarkerRenderer.h"
+#include "CIdDecoder.h"
+#include "CMemoryFile.h"
+#include "CPosePublisher.h"
+#include "CSpaceCalibration.h"
+#include "CLatencyController.h"
+#include "SMarkerQuery.h"
+
+// image buffer shared with the caller (for example with the NumPy array)
+struct SFrame {
+    unsigned char* data;    // NULL = no frame
+    int width;
+    int height;
+    int bpp;                // bytes per pixel
+};
 
 class CAutocalibrationResult {
     public:
@@ -21,6 +45,13 @@ class CAutocalibrationResult {
         bool saved = false;        
 };
 
+class CCalibrationResult {
+    public:
+        CSpaceCalibration calibration;
+        whycon::STrackedObject corners[4];  // robust mean positions of the corner markers (camera coords)
+        int num_frames = 0;                 // frames in which 4 markers were found
+};
+
 class CWhyconWrapper
 {
 public:
@@ -35,18 +66,112 @@ public:
         int id_samples = 360,                       // num of id_samples to identify ID
         int hamming_dist = 1,                       // hamming distance of ID code
         bool identify = true,                       // whether to identify ID
+        bool draw_coords = true,                    // render the results into the image after the detection
+        bool draw_segments = true,
+        bool debug = false,                         // whether write debug info
+        int pyramid_levels = 0                      // candidates are searched in the frame decimated 2^levels times
+    );
+    // The same detector without files: the camera matrices and the content of the space calibration file
+    // ("" = none) are given from memory (for example from a pickled detector).
+    CWhyconWrapper(
+        const cv::Mat& intrinsic_mat,
+        const cv::Mat& distortion_coeffs,
+        const std::string& space_calibration,
+        float circle_diam,
+        int num_markers=3,
+        whycon::ETransformType trans_type=whycon::TRANSFORM_NONE,
+        int id_bits = 3,
+        int id_samples = 360,
+        int hamming_dist = 1,
+        bool identify = true,
         bool draw_coords = true,
         bool draw_segments = true,
-        bool debug = false                          // whether write debug info
+        bool debug = false,
+        int pyramid_levels = 0
     );
     ~CWhyconWrapper();
-    std::vector<whycon::SMarker> detects(whycon::CRawImage* image);
+    // The query limits the markers of this call (max_markers, wanted IDs). The search stops when they are found
+    // (as far as the IDs are known at that stage), the poses of the markers with other IDs are not computed
+    // when the wrapper decodes the IDs (set_id_table) and the markers with other IDs are not searched by the tracker.
+    // The degradations (EDegradation flags) of the latency budget active in the frame are given to *degradations.
+    std::vector<whycon::SMarker> detects(
+        whycon::CRawImage* image, const SMarkerQuery& query = SMarkerQuery(), int* degradations = NULL
+    );
+    // detects markers in the image buffer owned by the caller (no copy, no channel swap)
+    std::vector<whycon::SMarker> detects(
+        unsigned char* data, int width, int height, int bpp = 3, const SMarkerQuery& query = SMarkerQuery(),
+        int* degradations = NULL
+    );
+    // detects markers in the sequence of frames (in order, tracking continues from frame to frame),
+    // the query is the same for all of them
+    std::vector<std::vector<whycon::SMarker> > detects_batch(
+        const std::vector<SFrame>& frames, const SMarkerQuery& query = SMarkerQuery(), std::vector<int>* degradations = NULL
+    );
+    // Detects markers in independent frames in parallel on num_threads native threads (0 = num of CPU cores).
+    // Each thread has its own copy of this detector (the same camera, space calibration, pyramid and ID table,
+    // created with the first call), the frames are not tracked and the stats, publisher and latency budget
+    // of this detector are not used.
+    std::vector<std::vector<whycon::SMarker> > detects_parallel(
+        const std::vector<SFrame>& frames, int num_threads = 0, const SMarkerQuery& query = SMarkerQuery()
+    );
     CAutocalibrationResult detect_and_calibrate(
         whycon::CRawImage* image, std::string autocalib_space_out_path, float field_length, float field_width, bool debug = false
     );
+    CAutocalibrationResult detect_and_calibrate(
+        unsigned char* data, int width, int height, int bpp,
+        std::string autocalib_space_out_path, float field_length, float field_width, bool debug = false
+    );
+    // Space calibration from the frames of the field with 4 markers at its corners, without files and without
+    // changing this detector. The corner markers are found in each frame (the outermost ones as CWhycon::autoCalib
+    // does) and their positions are averaged with the outliers dropped. Throws if no frame has 4 markers.
+    CCalibrationResult calibrate_from_frames(const std::vector<SFrame>& frames, float field_length, float field_width);
+    // Replaces the space calibration (content of the file) of the running detector and of all its helpers,
+    // nothing is re-initialized and nothing is written to the disk. It is used by trans_type of the detector.
+    void set_space_calibration(const std::string& content);
+    // Markers found in a frame are predicted (constant velocity Kalman filter) and searched only in small windows
+    // around the prediction in the next frames. The whole image is searched when a marker is missed
+    // max_misses times in a row, when nothing is tracked, or every rescan_interval frames (0 = never).
+    void set_tracking(
+        bool enable, int max_misses = 3, int rescan_interval = 0, float process_noise = 16, float measurement_noise = 0.25
+    );
+    STrackingCounters get_tracking_counters() const;
+    void reset_tracking_counters();
+    // The whole frame is searched in overlapping tiles (tile_size = 0 switches it off), it is used instead of the pyramid.
+    void set_tiles(int tile_size, int max_marker_diameter, int num_threads = 0);
+    int num_tiles() const;
+    // The IDs are decoded by the wrapper with the codebook shared by the process and cached on the disk
+    // (cache_dir "" = CIdCodebook::default_cache_dir()), the core only finds the markers. adaptive_sampling reads
+    // a part of the ID ring first and all id_samples points only when it is not unambiguous.
+    // Call it before the first frame.
+    void set_id_table(bool enable, std::string cache_dir = "", bool adaptive_sampling = false);
+    // The poses of the markers of each frame are sent as one datagram (SPosePacket.h) right after the detection,
+    // address is udp://host:port (unicast or multicast) or unix:///path, "" stops it.
+    void set_publisher(const std::string& address);
+    const CPosePublisher* get_publisher() const;    // NULL = not publishing
+    // Budget of the detection of one frame [s] (0 = off). When a frame takes longer, the quality of the next frames
+    // is lowered step by step (see CLatencyController and EDegradation): stable IDs of the tracked markers are not
+    // decoded again, the ID rings are read sparsely, periodic full scans are postponed. The quality is restored
+    // when the frames are fast enough again. The degradations need set_id_table and set_tracking.
+    void set_latency_budget(float max_latency, int restore_frames = 30);
+    const CLatencyController& get_latency_controller() const;  // degradations of the last frame, latencies, counters
+    // the degradations which change something with the settings of the detector (the expected ones before
+    // the first frame), none = the latency budget can not do anything
+    int available_degradations() const;
+    // what the detector was built from (the copies of the files read by the constructor)
+    const cv::Mat& get_intrinsic_mat() const;
+    const cv::Mat& get_distortion_coeffs() const;
+    const std::string& get_space_calibration() const;
+    // tracked markers (see CMarkerTracker::get_state)
+    std::vector<float> get_tracking_state() const;
+    void set_tracking_state(const std::vector<float>& state);
+    // times of the detection stages and counters (collected only when enabled)
+    void enable_stats(bool enable);
+    const CStats& get_stats() const;
+    void reset_stats();               // resets the tracking and latency counters too
 
 private:
-    whycon::CWhycon detector;
+    std::mutex mutex;                           // of the calls which use the core (see CCoreLock)
+    std::unique_ptr<whycon::CWhycon> detector;  // built again when the image size changes
     std::string clib_camera_path;
     std::string clib_space_transform_path;
     float circle_diam;
@@ -59,16 +184,62 @@ private:
     bool draw_coords;
     bool draw_segments;
     bool debug;
+    int pyramid_levels;
     // --- camera params ---
     cv::Mat intrinsic_mat;         // camera intrinsic matrix
     cv::Mat distortion_coeffs;     // camera distortion parameters
+    std::string space_calibration;              // content of the space calibration file
+    std::unique_ptr<CMemoryFile> space_file;    // the space calibration given from memory
 
     bool autocali_has_started = false;
 
     bool initialized = false; // is whole object (with all object which it owns) initialized?
 
-    void init_lean(whycon::CRawImage* image); // initialize if you know size of image
+    std::unique_ptr<whycon::CRawImage> frame;   // reused wrapper of the caller's image buffer
+
+    void init_lean(whycon::CRawImage* image); // initialize if you know size of image (call it under CCoreLock)
+    CStats stats;
+    CMarkerRenderer renderer;
+    CMarkerTracker tracker;
+    // window detectors released by the tracks by their width, so the core (and its ID table) is not built again
+    std::multimap<int, std::unique_ptr<CWindowDetector> > spare_windows;
+    std::unique_ptr<CPyramidDetector> pyramid;  // coarse to fine search of the whole frame (pyramid_levels > 0)
+    // --- IDs decoded by the wrapper (set_id_table) ---
+    bool id_table = false;
+    std::string id_cache_dir;
+    bool adaptive_id_sampling = false;
+    std::unique_ptr<CIdDecoder> id_decoder;     // created with 1st frame
+    // what the core and the helper detectors get (the core does not identify when the wrapper does)
+    bool core_identify;
+    int core_id_bits;
+    int core_hamming_dist;
+    int tile_size = 0;
+    int max_marker_diameter = 0;
+    int tile_threads = 0;
+    std::unique_ptr<CTiledDetector> tiled;      // tiled search of the whole frame (tile_size > 0), created with 1st frame
+    std::unique_ptr<CPosePublisher> publisher;  // set_publisher
+    CLatencyController latency;                 // set_latency_budget
+    SMarkerQuery query;                         // of the current call
+    // --- detects_parallel ---
+    std::unique_ptr<CThreadPool> helper_threads;
+    std::vector<std::unique_ptr<CWhyconWrapper> > helpers;  // one copy of the detector per thread
+
+    std::vector<whycon::SMarker> process(
+        whycon::CRawImage* image, CCoreLock& lock, const SMarkerQuery& query = SMarkerQuery()
+    );
+    std::vector<whycon::SMarker> search(whycon::CRawImage* image, CCoreLock& lock);
+    CAutocalibrationResult autocalibrate(
+        whycon::CRawImage* image, CCoreLock& lock, std::string autocalib_space_out_path, float field_length,
+        float field_width, bool debug
+    );
+    bool track_in_windows(whycon::CRawImage* image, CCoreLock& lock, std::vector<whycon::SMarker>& markers);
+    // detector of the square window of the side, the one of the same size class is reused (released by a track)
+    std::unique_ptr<CWindowDetector> window_detector(int side);
+    void release_windows();     // the windows of all tracks are kept for reuse (before the tracks are dropped)
+    void select(std::vector<whycon::SMarker>& markers);
+    whycon::CRawImage* wrap_frame(unsigned char* data, int width, int height, int bpp);
     void read_camera_calib_params();
+    void read_space_calibration();
 };
 
 
@@ -0,0 +1,118 @@
+#include <cstring>
+#include "CWindowDetector.h"
+
+// moves the marker from the window coords to the frame coords
+static void shift_marker(whycon::SMarker& marker, int dx, int dy)
+{
+    marker.seg.x += dx;
+    marker.seg.y += dy;
+    marker.seg.minx += dx;
+    marker.seg.maxx += dx;
+    marker.seg.miny += dy;
+    marker.seg.maxy += dy;
+    marker.obj.u += dx;
+    marker.obj.v += dy;
+}
+
+CWindowDetector::CWindowDetector(
+    int width, int height,
+    const cv::Mat& intrinsic_mat,
+    const cv::Mat& distortion_coeffs,
+    std::string clib_space_transform_path,
+    float circle_diam,
+    int num_markers,
+    whycon::ETransformType trans_type,
+    int id_bits,
+    int id_samples,
+    int hamming_dist,
+    bool identify,
+    bool debug,
+    CStats* stats
+) :
+    width(width), height(height),
+    detector(debug),
+    intrinsic_mat(intrinsic_mat.clone()),
+    distortion_coeffs(distortion_coeffs.clone()),
+    x0(0), y0(0), frame_width(0), frame_height(0),
+    stats(stats)
+{
+    cv::Mat k;
+    intrinsic_mat.convertTo(k, CV_64F);
+    cx = k.at<double>(0, 2);
+    cy = k.at<double>(1, 2);
+
+    detector.init(circle_diam, false, id_bits, id_samples, hamming_dist, num_markers, identify, width, height);
+    // the transformation shares the matrices, so the principal point can be moved without updating it
+    detector.updateCameraInfo(this->intrinsic_mat, this->distortion_coeffs);
+    detector.setDrawing(false, false);  // the window is a copy, nothing would be seen
+    detector.setCoordinates(trans_type);
+    if (trans_type != whycon::TRANSFORM_NONE) detector.loadCalibration(clib_space_transform_path);
+}
+
+CWindowDetector::~CWindowDetector() {}
+
+void CWindowDetector::load_calibration(std::string clib_space_transform_path)
+{
+    detector.loadCalibration(clib_space_transform_path);
+}
+
+void CWindowDetector::set_principal_point(double x, double y)
+{
+    if (intrinsic_mat.type() == CV_64F) {
+        intrinsic_mat.at<double>(0, 2) = x;
+        intrinsic_mat.at<double>(1, 2) = y;
+    } else {
+        intrinsic_mat.at<float>(0, 2) = x;
+        intrinsic_mat.at<float>(1, 2) = y;
+    }
+}
+
+std::vector<whycon::SMarker> CWindowDetector::detects(CCoreLock& lock, const whycon::CRawImage* frame, int x0, int y0)
+{
+    {
+        CStageTimer timer(stats, CStats::STAGE_COPY);
+        crop(frame, x0, y0);
+    }
+    return process(lock);
+}
+
+void CWindowDetector::crop(const whycon::CRawImage* frame, int x0, int y0)
+{
+    int bpp = frame->bpp_;
+    if (!image || image->bpp_ != bpp) {
+        // one spare row, the ID sampling of the core reads behind the sampled pixel
+        pixels.assign((height + 1) * width * bpp + 4, 0);
+        image.reset(new whycon::CRawImage(pixels.data(), width, height, bpp));
+    }
+    size_t row = width * bpp;
+    for (int y = 0; y < height; y++) {
+        memcpy(&pixels[y * row], &frame->data_[((y0 + y) * frame->width_ + x0) * bpp], row);
+    }
+    this->x0 = x0;
+    this->y0 = y0;
+    frame_width = frame->width_;
+    frame_height = frame->height_;
+}
+
+std::vector<whycon::SMarker> CWindowDetector::process(CCoreLock& lock)
+{
+    set_principal_point(cx - x0, cy - y0);
+    lock.prepare(width, height);
+    std::vector<whycon::SMarker> found;
+    {
+        CStageTimer timer(stats, CStats::STAGE_CORE);
+        detector.processImage(image.get(), found);
+    }
+    if (stats) stats->count_core(width, height);
+
+    std::vector<whycon::SMarker> markers;
+    for (auto& marker: found) {
+        if (
+            (marker.seg.minx <= 1 && x0 > 0) || (marker.seg.maxx >= width - 2 && x0 + width < frame_width) ||
+            (marker.seg.miny <= 1 && y0 > 0) || (marker.seg.maxy >= height - 2 && y0 + height < frame_height)
+        ) continue;
+        shift_marker(marker, x0, y0);
+        markers.push_back(marker);
+    }
+    return markers;
+}
@@ -0,0 +1,70 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __CWINDOWDETECTOR_H__
+#define __CWINDOWDETECTOR_H__
+
+#include <memory>
+#include <string>
+#include <vector>
+#include <opencv2/opencv.hpp>
+#include "CRawImage.h"
+#include "SStructDefs.h"
+#include "CWhycon.h"
+#include "CCoreLock.h"
+#include "CStats.h"
+
+// Whycon core working in a window (fixed size part) of a bigger frame.
+// The window is copied to its own buffer and the principal point of the camera is shifted to the window,
+// so positions and poses of the found markers are in the coords of the whole frame.
+class CWindowDetector
+{
+public:
+
+    CWindowDetector(
+        int width, int height,                      // size of the window
+        const cv::Mat& intrinsic_mat,               // camera of the whole frame
+        const cv::Mat& distortion_coeffs,
+        std::string clib_space_transform_path,
+        float circle_diam,
+        int num_markers,
+        whycon::ETransformType trans_type,
+        int id_bits,
+        int id_samples,
+        int hamming_dist,
+        bool identify,
+        bool debug = false,
+        CStats* stats = NULL                        // where to measure the stages (NULL = nowhere)
+    );
+    ~CWindowDetector();
+
+    // Detects markers in the window with the top left corner (x0, y0) of the frame. Call it under CCoreLock.
+    // Markers cut by the window border (which is not the frame border) are dropped.
+    std::vector<whycon::SMarker> detects(CCoreLock& lock, const whycon::CRawImage* frame, int x0, int y0);
+    // the same in two steps, the copy of the window does not need the lock
+    void crop(const whycon::CRawImage* frame, int x0, int y0);
+    std::vector<whycon::SMarker> process(CCoreLock& lock);
+    // replaces the space calibration (call it under CCoreLock)
+    void load_calibration(std::string clib_space_transform_path);
+
+    const int width;
+    const int height;
+
+private:
+    whycon::CWhycon detector;
+    cv::Mat intrinsic_mat;          // camera intrinsic matrix with the principal point in the window
+    cv::Mat distortion_coeffs;
+    double cx, cy;                  // principal point of the whole frame
+    std::vector<unsigned char> pixels;              // copy of the window
+    std::unique_ptr<whycon::CRawImage> image;       // wrapper of the pixels
+    int x0, y0;                     // position of the cropped window in the frame
+    int frame_width, frame_height;
+    CStats* stats;
+
+    void set_principal_point(double x, double y);
+};
+
+
+#endif
+/* end of CWindowDetector.h */
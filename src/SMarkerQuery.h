@@ -0,0 +1,37 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __SMARKERQUERY_H__
+#define __SMARKERQUERY_H__
+
+#include <algorithm>
+#include <vector>
+
+// What one detection call asks for, so one detector can serve callers with different needs without rebuilding.
+// The markers are assumed to have unique IDs, so the search can stop when all wanted IDs are found.
+struct SMarkerQuery
+{
+    int max_markers = 0;        // max num of returned markers (0 = num_markers of the detector, it cannot be more)
+    std::vector<int> ids;       // wanted IDs, sorted (empty = all)
+
+    bool wants(int id) const
+    {
+        return ids.empty() || std::binary_search(ids.begin(), ids.end(), id);
+    }
+    // num of wanted markers after which the search can stop (0 = no limit)
+    int limit() const
+    {
+        if (ids.empty()) return max_markers;
+        return max_markers > 0 ? std::min<int>(max_markers, ids.size()) : ids.size();
+    }
+    // the stages which do not know the IDs can stop after limit() markers only when any ID is wanted
+    int blind_limit() const
+    {
+        return ids.empty() ? max_markers : 0;
+    }
+};
+
+
+#endif
+/* end of SMarkerQuery.h */
@@ -0,0 +1,96 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __SMARKERRECORD_H__
+#define __SMARKERRECORD_H__
+
+#include <stdint.h>
+#include "SStructDefs.h"
+
+// Flat record of one found marker. It is the item of the numpy structured array (whycon.marker_dtype).
+typedef struct
+{
+    int32_t ID;                 // pattern ID
+    float u, v;                 // center in the image coords
+    float x, y, z, d;           // position (camera or transformed coords) and distance from the camera
+    float cos_view;             // cos of the viewing angle of the marker (in the camera coords)
+    float qx, qy, qz, qw;       // quaternion
+    float roll, pitch, yaw;     // fixed axis angles
+    float angle;                // axis angle around marker's surface normal
+    float n0, n1, n2;           // marker surface normal pointing from the camera
+    float roundness;            // result of the first roundness test
+    float bwRatio;              // ratio of white to black pixels
+    int32_t minx, miny, maxx, maxy;  // bounding box in the image
+    int32_t degradations;       // of the latency budget active in the frame (whycon.DEGRADE_* flags)
+    bool valid;                 // marker passed all tests
+} SMarkerRecord;
+
+inline void fill_marker_record(const whycon::SMarker& marker, SMarkerRecord& record, int degradations = 0)
+{
+    record.ID = marker.seg.ID;
+    record.u = marker.obj.u;
+    record.v = marker.obj.v;
+    record.x = marker.obj.x;
+    record.y = marker.obj.y;
+    record.z = marker.obj.z;
+    record.d = marker.obj.d;
+    record.cos_view = marker.obj.cos_view;
+    record.qx = marker.obj.qx;
+    record.qy = marker.obj.qy;
+    record.qz = marker.obj.qz;
+    record.qw = marker.obj.qw;
+    record.roll = marker.obj.roll;
+    record.pitch = marker.obj.pitch;
+    record.yaw = marker.obj.yaw;
+    record.angle = marker.obj.angle;
+    record.n0 = marker.obj.n0;
+    record.n1 = marker.obj.n1;
+    record.n2 = marker.obj.n2;
+    record.roundness = marker.seg.roundness;
+    record.bwRatio = marker.seg.bwRatio;
+    record.minx = marker.seg.minx;
+    record.miny = marker.seg.miny;
+    record.maxx = marker.seg.maxx;
+    record.maxy = marker.seg.maxy;
+    record.degradations = degradations;
+    record.valid = marker.valid;
+}
+
+inline void marker_from_record(const SMarkerRecord& record, whycon::SMarker& marker)
+{
+    marker = whycon::SMarker();   // moments and other fields not kept in the record are zero
+    marker.valid = record.valid;
+    marker.seg.valid = record.valid;
+    marker.seg.ID = record.ID;
+    marker.seg.x = record.u;
+    marker.seg.y = record.v;
+    marker.seg.roundness = record.roundness;
+    marker.seg.bwRatio = record.bwRatio;
+    marker.seg.minx = record.minx;
+    marker.seg.miny = record.miny;
+    marker.seg.maxx = record.maxx;
+    marker.seg.maxy = record.maxy;
+    marker.obj.u = record.u;
+    marker.obj.v = record.v;
+    marker.obj.x = record.x;
+    marker.obj.y = record.y;
+    marker.obj.z = record.z;
+    marker.obj.d = record.d;
+    marker.obj.cos_view = record.cos_view;
+    marker.obj.qx = record.qx;
+    marker.obj.qy = record.qy;
+    marker.obj.qz = record.qz;
+    marker.obj.qw = record.qw;
+    marker.obj.roll = record.roll;
+    marker.obj.pitch = record.pitch;
+    marker.obj.yaw = record.yaw;
+    marker.obj.angle = record.angle;
+    marker.obj.n0 = record.n0;
+    marker.obj.n1 = record.n1;
+    marker.obj.n2 = record.n2;
+}
+
+
+#endif
+/* end of SMarkerRecord.h */
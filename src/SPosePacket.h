@@ -0,0 +1,37 @@
+/*
+ * Author:   ivo@marvan.cz
+ */
+
+#ifndef __SPOSEPACKET_H__
+#define __SPOSEPACKET_H__
+
+#include <stdint.h>
+
+// Datagram with the poses of one frame (little endian, packed): the header followed by num_markers records.
+// It is sent by CPosePublisher and read by CPoseSubscriber (or by anything with the same layout).
+
+static const uint32_t POSE_PACKET_MAGIC = 0x534F5057;  // "WPOS"
+static const uint16_t POSE_PACKET_VERSION = 1;
+
+#pragma pack(push, 1)
+typedef struct
+{
+    uint32_t magic;             // POSE_PACKET_MAGIC
+    uint16_t version;           // POSE_PACKET_VERSION
+    uint16_t num_markers;
+    uint64_t frame;             // num of the frame (from 0) of the publishing detector
+    double timestamp;           // [s] steady (monotonic) clock of the host when the detection was done
+} SPoseHeader;                  // 24 bytes
+
+typedef struct
+{
+    int32_t ID;                 // pattern ID
+    float x, y, z;              // position in the camera (or transformed) coords
+    float qx, qy, qz, qw;       // quaternion
+    uint8_t valid;              // marker passed all tests
+} SPoseRecord;                  // 33 bytes
+#pragma pack(pop)
+
+
+#endif
+/* end of SPosePacket.h */
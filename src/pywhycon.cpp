@@ -2,21 +2,123 @@
 #include <pybind11/stl.h>
 #include <pybind11/numpy.h>
 #include <vector>
+#include <algorithm>
 #include "CRawImage.h"
 #include "CWhyconWrapper.h"
+#include "CDetectorPool.h"
+#include "SMarkerRecord.h"
+#include "CIdCodebook.h"
+#include "CPoseSubscriber.h"
+#include "CPoseFusion.h"
 
 namespace py = pybind11;
 
 typedef unsigned char uint8_t;
 
+typedef py::array_t<uint8_t, py::array::c_style | py::array::forcecast> ImageArray;
+typedef py::array_t<SMarkerRecord, py::array::c_style> RecordsArray;
+typedef py::array_t<SPoseRecord, py::array::c_style> PosesArray;
+typedef py::array_t<SFusedPose, py::array::c_style> FusedArray;
+
+// --- layout of the image buffer given from python -----------------------------------------------------------------
+// The whycon core segments only the first byte of each pixel (bpp = step), so the luminance is enough.
+// With bpp < 3 the ID rings are sampled in the first byte too (whycon_core.patch, CIdDecoder::sample).
+enum pixel_format {
+  PF_AUTO,  // by the shape: (H,W,3) -> BGR, (H,W) -> GRAY, (H,W,2) -> YUYV
+  PF_BGR,   // (H,W,3) OpenCV colour image, segmentation runs on the blue channel
+  PF_GRAY,  // (H,W) luminance
+  PF_YUYV,  // (H,W,2) packed YUV 4:2:2 (Y0 U Y1 V), segmentation runs on Y
+  PF_NV12   // (H*3/2,W) Y plane followed by the interleaved UV plane, only the Y plane is used
+};
+
+// --- frame of the given shape (without the batch axis) and pixel format ---------------------------------------------
+SFrame frame_layout(unsigned char* data, ssize_t ndim, const ssize_t* shape, pixel_format format) {
+  if (format == PF_AUTO) {
+    if (ndim == 2) format = PF_GRAY;
+    else if (ndim == 3 && shape[2] == 3) format = PF_BGR;
+    else if (ndim == 3 && shape[2] == 2) format = PF_YUYV;
+    else throw std::runtime_error("Input should have size [N,M,3] (BGR), [N,M] (GRAY) or [N,M,2] (YUYV)");
+  }
+
+  SFrame frame;
+  frame.data = data;
+  switch (format) {
+    case PF_BGR:
+      if ( ndim != 3 || shape[2] != 3 )
+        throw std::runtime_error("Input should have size [N,M,3] for BGR");
+      frame.bpp = 3;
+      break;
+    case PF_YUYV:
+      if ( ndim != 3 || shape[2] != 2 )
+        throw std::runtime_error("Input should have size [N,M,2] for YUYV");
+      frame.bpp = 2;
+      break;
+    case PF_GRAY:
+      if ( ndim != 2 )
+        throw std::runtime_error("Input should have size [N,M] for GRAY");
+      frame.bpp = 1;
+      break;
+    case PF_NV12:
+      if ( ndim != 2 || shape[0] % 3 != 0 )
+        throw std::runtime_error("Input should have size [N*3/2,M] for NV12");
+      frame.height = shape[0] * 2 / 3;
+      frame.width = shape[1];
+      frame.bpp = 1;
+      return frame;
+    default:
+      throw std::runtime_error("Unknown pixel format");
+  }
+  frame.height = shape[0];
+  frame.width = shape[1];
+  return frame;
+}
+
+// --- np.ndarray (image) is shared with CRawImage, nothing is copied -------------------------------------------------
+// --- (a read-only array is written only when the results are drawn into it) ------------------------------------------
+void check_writeable(const ImageArray& array, bool writeable) {
+  if (writeable && !array.writeable())
+    throw std::runtime_error("Input should be writeable when the results are drawn (draw_coords, draw_segments)");
+}
+
+SFrame frame_from_array(ImageArray& array, pixel_format format = PF_AUTO, bool writeable = false) {
+  check_writeable(array, writeable);
+  return frame_layout(const_cast<unsigned char*>(array.data()), array.ndim(), array.shape(), format);
+}
+
+// --- batch of frames: np.ndarray with the batch as the first axis (BxNxMx3, BxNxM, ...) or list of np.ndarray ---------
+// --- (shared, nothing is copied) --------------------------------------------------------------------------------------
+std::vector<SFrame> frames_from_batch(
+  py::object batch, std::vector<ImageArray>& arrays, pixel_format format = PF_AUTO, bool writeable = false
+) {
+  std::vector<SFrame> frames;
+  if (py::isinstance<py::array>(batch)) {
+    arrays.push_back(batch.cast<ImageArray>());
+    ImageArray& array = arrays.back();
+    if ( array.ndim() < 3 )
+      throw std::runtime_error("Input should have size [B,N,M,3], [B,N,M] or [B,N,M,2]");
+    check_writeable(array, writeable);
+    for (ssize_t i = 0; i < array.shape()[0]; i++) {
+      frames.push_back(frame_layout(const_cast<unsigned char*>(array.data(i)), array.ndim() - 1, array.shape() + 1, format));
+    }
+    return frames;
+  }
+  for (auto item: batch) {
+    arrays.push_back(item.cast<ImageArray>());
+    frames.push_back(frame_from_array(arrays.back(), format, writeable));
+  }
+  return frames;
+}
+
 
 class CWhyconMarker {
     public:
         whycon::SSegment segment_in_image;
         whycon::STrackedObject coords;
-        CWhyconMarker(const whycon::SMarker marker) {
+        int degradations;
+        CWhyconMarker(const whycon::SMarker marker, int degradations = 0) {
            segment_in_image = marker.seg;
            coords = marker.obj;
+           this->degradations = degradations;
         }
 };
 
@@ -28,6 +130,114 @@ class WhycodeAutocalibResult {
         bool saved = false;        
 };
 
+// --- cv::Mat <-> np.ndarray (copies, float64) for the pickled camera matrices ------------------------------------------
+py::array_t<double> array_from_mat(const cv::Mat& mat) {
+  cv::Mat values;
+  mat.convertTo(values, CV_64F);
+  py::array_t<double> array({values.rows, values.cols});
+  for (int r = 0; r < values.rows; r++) {
+    std::copy(values.ptr<double>(r), values.ptr<double>(r) + values.cols, array.mutable_data(r));
+  }
+  return array;
+}
+
+cv::Mat mat_from_array(py::object values) {
+  auto array = values.cast<py::array_t<double, py::array::c_style | py::array::forcecast> >();
+  if (array.ndim() > 2) throw std::runtime_error("Camera matrix should have 1 or 2 dimensions");
+  int rows = array.ndim() == 2 ? array.shape(0) : 1;
+  int cols = array.ndim() == 2 ? array.shape(1) : array.size();
+  return cv::Mat(rows, cols, CV_64F, const_cast<double*>(array.data())).clone();
+}
+
+// --- space calibration <-> dict of np.ndarray (float32) ----------------------------------------------------------------
+py::dict dict_from_calibration(const CSpaceCalibration& calibration) {
+  py::array_t<float> hom({3, 3}), offsets({4, 3}), simlars({4, 3, 3});
+  std::copy(calibration.hom, calibration.hom + 9, hom.mutable_data());
+  for (int k = 0; k < 4; k++) {
+    std::copy(calibration.transforms[k].orig, calibration.transforms[k].orig + 3, offsets.mutable_data(k));
+    std::copy(calibration.transforms[k].simlar, calibration.transforms[k].simlar + 9, simlars.mutable_data(k));
+  }
+  return py::dict(
+    py::arg("dim_x") = calibration.dim_x,
+    py::arg("dim_y") = calibration.dim_y,
+    py::arg("hom") = hom,
+    py::arg("offsets") = offsets,
+    py::arg("simlars") = simlars
+  );
+}
+
+void copy_from_array(py::handle values, size_t size, const char* name, float* out) {
+  auto array = py::cast<py::array_t<float, py::array::c_style | py::array::forcecast> >(values);
+  if ((size_t)array.size() != size)
+    throw std::runtime_error(std::string("Space calibration should have ") + name + " with " + std::to_string(size) + " values");
+  std::copy(array.data(), array.data() + size, out);
+}
+
+CSpaceCalibration calibration_from_dict(py::dict values) {
+  CSpaceCalibration calibration;
+  calibration.dim_x = values["dim_x"].cast<float>();
+  calibration.dim_y = values["dim_y"].cast<float>();
+  copy_from_array(values["hom"], 9, "hom", calibration.hom);
+  float offsets[12], simlars[36];
+  copy_from_array(values["offsets"], 12, "offsets", offsets);
+  copy_from_array(values["simlars"], 36, "simlars", simlars);
+  for (int k = 0; k < 4; k++) {
+    std::copy(offsets + 3 * k, offsets + 3 * k + 3, calibration.transforms[k].orig);
+    std::copy(simlars + 9 * k, simlars + 9 * k + 9, calibration.transforms[k].simlar);
+  }
+  return calibration;
+}
+
+// constructor parameters and settings of the detector, they are pickled
+struct SDetectorParams {
+  std::string clib_camera_path;
+  std::string clib_space_transform_path;
+  float circle_diam;
+  int num_markers;
+  int trans_type;
+  int id_bits;
+  int id_samples;
+  int hamming_dist;
+  bool identify;
+  bool draw_coords;
+  bool draw_segments;
+  bool debug;
+  int pyramid_levels;
+  // set_tracking
+  bool tracking = false;
+  int max_misses = 3;
+  int rescan_interval = 0;
+  float process_noise = 16;
+  float measurement_noise = 0.25;
+  // set_tiles
+  int tile_size = 0;
+  int max_marker_diameter = 0;
+  int tile_threads = 0;
+  // set_id_table
+  bool id_table = false;
+  std::string id_cache_dir;
+  bool adaptive_id_sampling = false;
+  // enable_stats
+  bool stats = false;
+  // set_latency_budget
+  float max_latency_ms = 0;
+  int restore_frames = 30;
+};
+
+// --- what one detection call asks for (max_markers 0 = all, ids None = all) ----------------------------------------
+SMarkerQuery query_from_args(int max_markers, py::object ids) {
+  if (max_markers < 0) throw std::runtime_error("max_markers should be >= 0");
+  SMarkerQuery query;
+  query.max_markers = max_markers;
+  if (!ids.is_none()) {
+    query.ids = ids.cast<std::vector<int> >();
+    if (query.ids.empty()) throw std::runtime_error("ids should not be empty (None = all IDs)");
+  }
+  return query;
+}
+
+static const int PICKLE_VERSION = 2;    // version 1 was without the latency budget
+
 class WhyCodeCppPython
 {
 
@@ -55,86 +265,419 @@ class WhyCodeCppPython
       bool identify = true,
       bool draw_coords = true,
       bool draw_segments = true,
-      bool debug = false  
+      bool debug = false,
+      int pyramid_levels = 0
     ):  detector(
           clib_camera_path, clib_space_transform_path, circle_diam, num_markers, 
-          whycon::ETransformType(trans_type), id_bits, id_samples, hamming_dist, identify, draw_coords, draw_segments, debug
-        ) {}        
+          whycon::ETransformType(trans_type), id_bits, id_samples, hamming_dist, identify, draw_coords, draw_segments, debug,
+          pyramid_levels
+        ) {
+      params.clib_camera_path = clib_camera_path;
+      params.clib_space_transform_path = clib_space_transform_path;
+      params.circle_diam = circle_diam;
+      params.num_markers = num_markers;
+      params.trans_type = trans_type;
+      params.id_bits = id_bits;
+      params.id_samples = id_samples;
+      params.hamming_dist = hamming_dist;
+      params.identify = identify;
+      params.draw_coords = draw_coords;
+      params.draw_segments = draw_segments;
+      params.debug = debug;
+      params.pyramid_levels = pyramid_levels;
+    }
+
+    // contructor of the unpickled detector (the files are not read again)
+    WhyCodeCppPython(const SDetectorParams& params, const cv::Mat& intrinsic_mat, const cv::Mat& distortion_coeffs,
+      const std::string& space_calibration
+    ):  detector(
+          intrinsic_mat, distortion_coeffs, space_calibration, params.circle_diam, params.num_markers,
+          whycon::ETransformType(params.trans_type), params.id_bits, params.id_samples, params.hamming_dist, params.identify,
+          params.draw_coords, params.draw_segments, params.debug, params.pyramid_levels
+        ), params(params) {
+      set_tracking(
+        params.tracking, params.max_misses, params.rescan_interval, params.process_noise, params.measurement_noise
+      );
+      if (params.tile_size > 0) set_tiles(params.tile_size, params.max_marker_diameter, params.tile_threads);
+      if (params.id_table) set_id_table(params.id_table, params.id_cache_dir, params.adaptive_id_sampling);
+      enable_stats(params.stats);
+      set_latency_budget(params.max_latency_ms, params.restore_frames);
+    }
 
     // desstructor
     ~WhyCodeCppPython() {}
 
     // wraper python/c++ interface
-    WhyconMarkersList detect(py::array_t<uint8_t, py::array::c_style | py::array::forcecast> array) {
+    WhyconMarkersList detect(
+      ImageArray array, pixel_format format = PF_AUTO, int max_markers = 0, py::object ids = py::none()
+    ) {
       std::vector<whycon::SMarker> markers_list;
-      whycon::CRawImage* img = prepare_image(array);
-      // --- detect ----
-      markers_list = detector.detects(img);
-      img->swapRGB();
-      return return_results(markers_list);
+      SFrame frame = frame_from_array(array, format, draws());
+      SMarkerQuery query = query_from_args(max_markers, ids);
+      int degradations;
+      // --- detect (directly in the buffer of the array, BGR order or Y plane as it is, other python threads can run) ----
+      {
+        py::gil_scoped_release release;
+        markers_list = detector.detects(frame.data, frame.width, frame.height, frame.bpp, query, &degradations);
+      }
+      return return_results(markers_list, degradations);
+    }
+
+
+    // wraper python/c++ interface
+    RecordsArray detect_array(
+      ImageArray array, pixel_format format = PF_AUTO, int max_markers = 0, py::object ids = py::none()
+    ) {
+      std::vector<whycon::SMarker> markers_list;
+      SFrame frame = frame_from_array(array, format, draws());
+      SMarkerQuery query = query_from_args(max_markers, ids);
+      int degradations;
+      {
+        py::gil_scoped_release release;
+        markers_list = detector.detects(frame.data, frame.width, frame.height, frame.bpp, query, &degradations);
+      }
+      RecordsArray records(markers_list.size());
+      SMarkerRecord* record = records.mutable_data();
+      for (auto const& marker: markers_list) {
+        fill_marker_record(marker, *record++, degradations);
+      }
+      return records;
+    }
+
+    // wraper python/c++ interface
+    size_t detect_into(
+      ImageArray array, py::array out, pixel_format format = PF_AUTO, int max_markers = 0, py::object ids = py::none()
+    ) {
+      if (!RecordsArray::check_(out))
+        throw std::runtime_error("Output should be C-contiguous NumPy array with dtype whycon.marker_dtype");
+      RecordsArray records = py::reinterpret_borrow<RecordsArray>(out);
+      SMarkerRecord* record = records.mutable_data();
+      size_t capacity = records.size();
+      SFrame frame = frame_from_array(array, format, draws());
+      SMarkerQuery query = query_from_args(max_markers, ids);
+      size_t written;
+      {
+        py::gil_scoped_release release;
+        int degradations;
+        std::vector<whycon::SMarker> markers_list = detector.detects(
+          frame.data, frame.width, frame.height, frame.bpp, query, &degradations
+        );
+        written = std::min(markers_list.size(), capacity);
+        for (size_t i = 0; i < written; i++) fill_marker_record(markers_list[i], record[i], degradations);
+        for (size_t i = written; i < capacity; i++) record[i].valid = false;
+      }
+      return written;
     }
 
+    // wraper python/c++ interface
+    std::vector<WhyconMarkersList> detect_batch(
+      py::object batch, pixel_format format = PF_AUTO, bool parallel = false, int num_threads = 0,
+      int max_markers = 0, py::object ids = py::none()
+    ) {
+      std::vector<ImageArray> arrays;   // keeps (possibly converted) arrays alive during detection
+      std::vector<SFrame> frames = frames_from_batch(batch, arrays, format, draws());
+      SMarkerQuery query = query_from_args(max_markers, ids);
+      std::vector<std::vector<whycon::SMarker> > markers_lists;
+      std::vector<int> degradations;    // the copies of the parallel mode have no latency budget
+      {
+        py::gil_scoped_release release;
+        markers_lists = parallel ?
+          detector.detects_parallel(frames, num_threads, query) : detector.detects_batch(frames, query, &degradations);
+      }
+      std::vector<WhyconMarkersList> results;
+      for (size_t i = 0; i < markers_lists.size(); i++) {
+        results.push_back(return_results(markers_lists[i], i < degradations.size() ? degradations[i] : 0));
+      }
+      return results;
+    }
   
     // wraper python/c++ interface
     WhycodeAutocalibResult detect_and_calibrate(
-      py::array_t<uint8_t, py::array::c_style | py::array::forcecast> array, 
-      std::string outCalibPath, float fieldLength = 1, float fieldWidth = 1, bool debug = false
+      ImageArray array, 
+      std::string outCalibPath, float fieldLength = 1, float fieldWidth = 1, bool debug = false,
+      pixel_format format = PF_AUTO
     ) {
       WhycodeAutocalibResult py_autocalib_result;
       CAutocalibrationResult autocalib_result;
-      whycon::CRawImage* img = prepare_image(array);
+      SFrame frame = frame_from_array(array, format, draws());
       // --- detect and calibrate ----
-      autocalib_result = detector.detect_and_calibrate(img, outCalibPath, fieldLength, fieldWidth, debug);
-      img->swapRGB();
+      {
+        py::gil_scoped_release release;
+        autocalib_result = detector.detect_and_calibrate(
+          frame.data, frame.width, frame.height, frame.bpp, outCalibPath, fieldLength, fieldWidth, debug
+        );
+      }
       py_autocalib_result.saved = autocalib_result.saved;
       py_autocalib_result.markers = return_results(autocalib_result.markers);
       return py_autocalib_result;
     }
-    
+
+    // wraper python/c++ interface
+    py::dict calibrate_from_frames(py::object batch, float field_length, float field_width, pixel_format format = PF_AUTO) {
+      std::vector<ImageArray> arrays;
+      std::vector<SFrame> frames = frames_from_batch(batch, arrays, format);   // the calibrator draws nothing
+      CCalibrationResult result;
+      {
+        py::gil_scoped_release release;
+        result = detector.calibrate_from_frames(frames, field_length, field_width);
+      }
+      py::dict calibration = dict_from_calibration(result.calibration);
+      py::array_t<float> corners({4, 3});
+      for (int b = 0; b < 4; b++) {
+        corners.mutable_at(b, 0) = result.corners[b].x;
+        corners.mutable_at(b, 1) = result.corners[b].y;
+        corners.mutable_at(b, 2) = result.corners[b].z;
+      }
+      calibration["corners"] = corners;
+      calibration["num_frames"] = result.num_frames;
+      return calibration;
+    }
+
+    // wraper python/c++ interface
+    void set_space_calibration(py::object calibration) {
+      std::string content;
+      if (py::isinstance<py::str>(calibration) || py::isinstance<py::bytes>(calibration)) {
+        content = calibration.cast<std::string>();
+      } else {
+        content = calibration_from_dict(calibration.cast<py::dict>()).content();
+      }
+      py::gil_scoped_release release;
+      detector.set_space_calibration(content);
+    }
+
+    // wraper python/c++ interface
+    py::object get_space_calibration(bool as_text = false) const {
+      const std::string& content = detector.get_space_calibration();
+      if (content.empty()) return py::none();
+      if (as_text) return py::str(content);
+      return dict_from_calibration(CSpaceCalibration::parse(content));
+    }
+
+    // wraper python/c++ interface
+    void set_tracking(
+      bool enable, int max_misses = 3, int rescan_interval = 0, float process_noise = 16, float measurement_noise = 0.25
+    ) {
+      detector.set_tracking(enable, max_misses, rescan_interval, process_noise, measurement_noise);
+      params.tracking = enable;
+      params.max_misses = max_misses;
+      params.rescan_interval = rescan_interval;
+      params.process_noise = process_noise;
+      params.measurement_noise = measurement_noise;
+    }
+
+    // wraper python/c++ interface
+    py::dict tracking_counters() const {
+      STrackingCounters counters = detector.get_tracking_counters();
+      return py::dict(
+        py::arg("frames") = counters.frames,
+        py::arg("full_scans") = counters.full_scans,
+        py::arg("window_searches") = counters.window_searches,
+        py::arg("window_hits") = counters.window_hits,
+        py::arg("last_full_scan") = counters.last_full_scan
+      );
+    }
+
+    void reset_tracking_counters() {
+      detector.reset_tracking_counters();
+    }
+
+    // wraper python/c++ interface
+    void set_tiles(int tile_size, int max_marker_diameter, int num_threads = 0) {
+      detector.set_tiles(tile_size, max_marker_diameter, num_threads);
+      params.tile_size = tile_size;
+      params.max_marker_diameter = max_marker_diameter;
+      params.tile_threads = num_threads;
+    }
+
+    int num_tiles() const { return detector.num_tiles(); }
+
+    // wraper python/c++ interface
+    void set_id_table(bool enable = true, std::string cache_dir = "", bool adaptive_sampling = false) {
+      detector.set_id_table(enable, cache_dir, adaptive_sampling);
+      params.id_table = enable;
+      params.id_cache_dir = cache_dir;
+      params.adaptive_id_sampling = adaptive_sampling;
+    }
+
+    // wraper python/c++ interface
+    void set_publisher(std::string address = "") {
+      detector.set_publisher(address);
+    }
+
+    // wraper python/c++ interface
+    py::object get_publisher_counters() const {
+      const CPosePublisher* publisher = detector.get_publisher();
+      if (!publisher) return py::none();
+      return py::dict(
+        py::arg("address") = publisher->address,
+        py::arg("frames") = publisher->frame,
+        py::arg("sent") = publisher->sent,
+        py::arg("errors") = publisher->errors
+      );
+    }
+
+    // wraper python/c++ interface
+    void set_latency_budget(float max_latency_ms = 0, int restore_frames = 30) {
+      detector.set_latency_budget(max_latency_ms / 1000, restore_frames);
+      params.max_latency_ms = max_latency_ms;
+      params.restore_frames = restore_frames;
+      if (max_latency_ms > 0 && detector.available_degradations() == DEGRADE_NONE) {
+        PyErr_WarnEx(PyExc_RuntimeWarning,
+          "The latency budget can not degrade anything with the current settings, it needs set_id_table and set_tracking "
+          "(see available_degradations in latency_report).", 1
+        );
+      }
+    }
+
+    // wraper python/c++ interface
+    py::dict latency_report() const {
+      const CLatencyController& latency = detector.get_latency_controller();
+      py::list degradations, available;
+      int available_flags = detector.available_degradations();
+      for (int i = 0; i < NUM_DEGRADATIONS; i++) {
+        if (latency.active & (1 << i)) degradations.append(CLatencyController::degradation_name(1 << i));
+        if (available_flags & (1 << i)) available.append(CLatencyController::degradation_name(1 << i));
+      }
+      return py::dict(
+        py::arg("max_latency_ms") = latency.max_latency * 1000,
+        py::arg("level") = latency.level,
+        py::arg("degradations") = degradations,
+        py::arg("available_degradations") = available,
+        py::arg("latency_ms") = latency.last_latency * 1000,
+        py::arg("average_ms") = latency.average_latency * 1000,
+        py::arg("frames") = latency.frames,
+        py::arg("degraded_frames") = latency.degraded_frames,
+        py::arg("reused_ids") = latency.reused_ids,
+        py::arg("postponed_scans") = latency.postponed_scans
+      );
+    }
+
+    // wraper python/c++ interface
+    void enable_stats(bool enable = true) {
+      detector.enable_stats(enable);
+      params.stats = enable;
+    }
+
+    // wraper python/c++ interface
+    py::dict get_stats() const {
+      const CStats& stats = detector.get_stats();
+      STrackingCounters counters = detector.get_tracking_counters();
+      py::dict time, calls;
+      for (int i = 0; i < CStats::STAGE_NUMBER; i++) {
+        time[CStats::stage_name(i)] = stats.time[i];
+        calls[CStats::stage_name(i)] = stats.calls[i];
+      }
+      return py::dict(
+        py::arg("enabled") = stats.enabled,
+        py::arg("frames") = stats.frames,
+        py::arg("markers") = stats.markers,
+        py::arg("core_pixels") = stats.core_pixels,
+        py::arg("ring_samples") = stats.ring_samples,
+        py::arg("skipped_markers") = stats.skipped_markers,
+        py::arg("full_scans") = counters.full_scans,
+        py::arg("window_searches") = counters.window_searches,
+        py::arg("window_hits") = counters.window_hits,
+        py::arg("time") = time,
+        py::arg("calls") = calls
+      );
+    }
+
+    void reset_stats() {
+      detector.reset_stats();
+    }
+
+    // --- pickling: parameters, settings, camera matrices and space calibration (and optionally the tracks) -------------
+    py::tuple getstate() const {
+      // the copy would not publish, the receivers would miss its frames without any notice
+      if (detector.get_publisher()) {
+        throw std::runtime_error("A publishing WhyCodeDetector can not be pickled, call set_publisher('') first.");
+      }
+      py::object tracks = py::none();
+      if (pickle_tracking_state) tracks = py::cast(detector.get_tracking_state());
+      return py::make_tuple(
+        PICKLE_VERSION,
+        py::make_tuple(
+          params.clib_camera_path, params.clib_space_transform_path, params.circle_diam, params.num_markers,
+          params.trans_type, params.id_bits, params.id_samples, params.hamming_dist, params.identify, params.draw_coords,
+          params.draw_segments, params.debug, params.pyramid_levels
+        ),
+        py::make_tuple(
+          params.tracking, params.max_misses, params.rescan_interval, params.process_noise, params.measurement_noise
+        ),
+        py::make_tuple(params.tile_size, params.max_marker_diameter, params.tile_threads),
+        py::make_tuple(params.id_table, params.id_cache_dir, params.adaptive_id_sampling),
+        params.stats,
+        array_from_mat(detector.get_intrinsic_mat()),
+        array_from_mat(detector.get_distortion_coeffs()),
+        py::bytes(detector.get_space_calibration()),
+        tracks,
+        py::make_tuple(params.max_latency_ms, params.restore_frames)
+      );
+    }
+
+    static WhyCodeCppPython* setstate(py::tuple state) {
+      int version = state.size() > 0 ? state[0].cast<int>() : 0;
+      if (!(version == 1 && state.size() == 10) && !(version == PICKLE_VERSION && state.size() == 11))
+        throw std::runtime_error("Unsupported pickled WhyCodeDetector (version " + std::to_string(PICKLE_VERSION) + " expected)");
+      SDetectorParams p;
+      py::tuple ctor = state[1], tracking = state[2], tiles = state[3], id_table = state[4];
+      p.clib_camera_path = ctor[0].cast<std::string>();
+      p.clib_space_transform_path = ctor[1].cast<std::string>();
+      p.circle_diam = ctor[2].cast<float>();
+      p.num_markers = ctor[3].cast<int>();
+      p.trans_type = ctor[4].cast<int>();
+      p.id_bits = ctor[5].cast<int>();
+      p.id_samples = ctor[6].cast<int>();
+      p.hamming_dist = ctor[7].cast<int>();
+      p.identify = ctor[8].cast<bool>();
+      p.draw_coords = ctor[9].cast<bool>();
+      p.draw_segments = ctor[10].cast<bool>();
+      p.debug = ctor[11].cast<bool>();
+      p.pyramid_levels = ctor[12].cast<int>();
+      p.tracking = tracking[0].cast<bool>();
+      p.max_misses = tracking[1].cast<int>();
+      p.rescan_interval = tracking[2].cast<int>();
+      p.process_noise = tracking[3].cast<float>();
+      p.measurement_noise = tracking[4].cast<float>();
+      p.tile_size = tiles[0].cast<int>();
+      p.max_marker_diameter = tiles[1].cast<int>();
+      p.tile_threads = tiles[2].cast<int>();
+      p.id_table = id_table[0].cast<bool>();
+      p.id_cache_dir = id_table[1].cast<std::string>();
+      p.adaptive_id_sampling = id_table[2].cast<bool>();
+      p.stats = state[5].cast<bool>();
+      if (version >= 2) {
+        py::tuple latency = state[10];
+        p.max_latency_ms = latency[0].cast<float>();
+        p.restore_frames = latency[1].cast<int>();
+      }
+
+      WhyCodeCppPython* detector = new WhyCodeCppPython(
+        p, mat_from_array(state[6]), mat_from_array(state[7]), state[8].cast<std::string>()
+      );
+      if (!state[9].is_none()) {
+        detector->detector.set_tracking_state(state[9].cast<std::vector<float> >());
+        detector->pickle_tracking_state = true;
+      }
+      return detector;
+    }
+
+    bool pickle_tracking_state = false;   // whether the tracks are pickled
 
     private:
       CWhyconWrapper detector;
+      SDetectorParams params;
 
-      whycon::CRawImage* prepare_image(py::array_t<uint8_t, py::array::c_style | py::array::forcecast> array) {
-        // --- convert np.ndarray (image with shape NxMx3) to CRawImage ---------------------------------------------------------
-        // check input dimensions
-        if ( array.ndim()     != 3 )
-          throw std::runtime_error("Input should be 3-D NumPy array");
-        if ( array.shape()[2] != 3 )
-          throw std::runtime_error("Input should have size [N,M,3]");
-
-
-        // ssize_t ndim = array.ndim();
-        auto rows = array.shape()[0];
-        auto cols = array.shape()[1];
-        auto colors = array.shape()[2];
-        auto byte_size = (long int)  sizeof(uint8_t);      
-
-        // allocate std::vector (to pass to the C++ function)
-        std::vector<uint8_t> vect(array.size());
-        // copy py::array -> std::vector
-        std::memcpy(vect.data(),array.data(),array.size()*byte_size);
-
-
-        std::vector<ssize_t> shape   = { rows , cols, colors };
-
-        // creatw wraper which share data of original vector vect
-        whycon::CRawImage* img = new whycon::CRawImage( (unsigned char*) array.data(), cols, rows, colors);
-        /*
-        whycon::CRawImage* img = img_orig->copy();
-        delete img_orig;
-        */
-        img->swapRGB();
-        //show_and_wait(img, false, "C++ Before detect, after swap"); 
-        return img;
-      }
+      // the results are drawn into the frames (they have to be writeable)
+      bool draws() const { return params.draw_coords || params.draw_segments; }
 
+    public:
     // store results to one object
-    WhyconMarkersList return_results(std::vector<whycon::SMarker> markers_list) {
+    static WhyconMarkersList return_results(std::vector<whycon::SMarker> markers_list, int degradations = 0) {
       WhyconMarkersList ret_markers_list;
       
       for(auto const& marker: markers_list) {
-        CWhyconMarker ret_marker = CWhyconMarker(marker);
+        CWhyconMarker ret_marker = CWhyconMarker(marker, degradations);
         ret_markers_list.push_back(ret_marker);
       }
 
@@ -161,13 +704,155 @@ class WhyCodeCppPython
     }
 };
 
+class DetectorPoolCppPython
+{
+  public:
+
+    DetectorPoolCppPython(int num_threads = 0): pool(num_threads) {}
+
+    int add_stream(
+      std::string clib_camera_path,
+      std::string clib_space_transform_path,
+      float circle_diam,
+      int num_markers,
+      WhyCodeCppPython::trans_type trans_type = WhyCodeCppPython::trans_type::T_NONE,
+      int id_bits = 3,
+      int id_samples = 360,
+      int hamming_dist = 1,
+      bool identify = true,
+      bool draw_coords = true,
+      bool draw_segments = true,
+      bool debug = false,
+      int pyramid_levels = 0
+    ) {
+      int stream = pool.add_stream(
+        clib_camera_path, clib_space_transform_path, circle_diam, num_markers,
+        whycon::ETransformType(trans_type), id_bits, id_samples, hamming_dist, identify, draw_coords, draw_segments, debug,
+        pyramid_levels
+      );
+      draws.resize(std::max<size_t>(draws.size(), stream + 1));
+      draws[stream] = draw_coords || draw_segments;
+      return stream;
+    }
+
+    // frames[i] (np.ndarray or None) belongs to the stream i
+    std::vector<WhyconMarkersList> detect(
+      py::list frames, pixel_format format = PF_AUTO, int max_markers = 0, py::object ids = py::none()
+    ) {
+      SMarkerQuery query = query_from_args(max_markers, ids);
+      std::vector<ImageArray> arrays;   // keeps (possibly converted) arrays alive during detection
+      std::vector<SFrame> pool_frames(frames.size());
+      for (size_t i = 0; i < frames.size(); i++) {
+        pool_frames[i].data = NULL;
+        if (frames[i].is_none()) continue;
+        arrays.push_back(frames[i].cast<ImageArray>());
+        pool_frames[i] = frame_from_array(arrays.back(), format, i < draws.size() && draws[i]);
+      }
+
+      std::vector<std::vector<whycon::SMarker> > markers_lists;
+      {
+        py::gil_scoped_release release;
+        markers_lists = pool.detects(pool_frames, query);
+      }
+
+      std::vector<WhyconMarkersList> results;
+      for (auto const& markers_list: markers_lists) {
+        results.push_back(WhyCodeCppPython::return_results(markers_list));
+      }
+      return results;
+    }
+
+    int num_streams() const { return pool.num_streams(); }
+    int num_threads() const { return pool.num_threads(); }
+
+  private:
+    CDetectorPool pool;
+    std::vector<bool> draws;   // the stream draws its results into its frames
+};
+
+// --- results of the detection (list of WhyconMarker or np.ndarray with dtype whycon.marker_dtype) ------------------------
+std::vector<whycon::SMarker> markers_from_results(py::object results) {
+  std::vector<whycon::SMarker> markers;
+  if (py::isinstance<py::array>(results)) {
+    if (!RecordsArray::check_(results))
+      throw std::runtime_error("Results should be list of WhyconMarker or NumPy array with dtype whycon.marker_dtype");
+    RecordsArray records = py::reinterpret_borrow<RecordsArray>(results);
+    markers.resize(records.size());
+    for (ssize_t i = 0; i < records.size(); i++) marker_from_record(records.data()[i], markers[i]);
+  } else {
+    for (auto item: results) {
+      const CWhyconMarker& result = item.cast<const CWhyconMarker&>();
+      whycon::SMarker marker;
+      marker.valid = result.segment_in_image.valid;
+      marker.seg = result.segment_in_image;
+      marker.obj = result.coords;
+      markers.push_back(marker);
+    }
+  }
+  return markers;
+}
+
+// --- fused poses at the timestamp as np.ndarray with dtype whycon.fused_dtype -------------------------------------------
+FusedArray fused_poses(CPoseFusion& fusion, double timestamp) {
+  std::vector<SFusedPose> poses;
+  fusion.fuse(timestamp, poses);
+  FusedArray result(poses.size());
+  std::copy(poses.begin(), poses.end(), result.mutable_data());
+  return result;
+}
+
+// --- draws the results into the image in place (np.ndarray HxWxC or HxW, uint8, C-contiguous) ---------------------------
+void render_markers(
+  py::array image, py::object results,
+  bool draw_segments = true, bool draw_ids = true, bool draw_coords = true, bool trans_2d = false
+) {
+  typedef py::array_t<uint8_t, py::array::c_style> InPlaceArray;   // without forcecast, a copy would be drawn
+  if (!InPlaceArray::check_(image) || !image.writeable())
+    throw std::runtime_error("Image should be writeable C-contiguous NumPy array with dtype uint8");
+  if (image.ndim() != 2 && !(image.ndim() == 3 && image.shape()[2] >= 1 && image.shape()[2] <= 4))
+    throw std::runtime_error("Image should have size [N,M] or [N,M,C] (C <= 4)");
+
+  std::vector<whycon::SMarker> markers = markers_from_results(results);
+  whycon::CRawImage raw(
+    (unsigned char*)image.mutable_data(), image.shape()[1], image.shape()[0], image.ndim() == 2 ? 1 : image.shape()[2]
+  );
+  CMarkerRenderer renderer(draw_segments, draw_ids, draw_coords, trans_2d);
+  py::gil_scoped_release release;
+  renderer.render(&raw, markers);
+}
+
 PYBIND11_MODULE(whycon, m) {
   using namespace pybind11::literals; // for _a literal to define arguments
+  PYBIND11_NUMPY_DTYPE(
+    SMarkerRecord, ID, u, v, x, y, z, d, cos_view, qx, qy, qz, qw, roll, pitch, yaw, angle, n0, n1, n2, roundness, bwRatio,
+    minx, miny, maxx, maxy, degradations, valid
+  );
   m.doc() = "WhyCon is a version of a vision-based localization system that can be used with low-cost web cameras, and achieves millimiter\n"
   "precision with very high performance.\n"
   "It also searches for marker IDs with the \"whycode\" extension.\n\n"
   "See https://github.com/LCAS/whycon, https://github.com/lrse/whycon, https://github.com/jiriUlr/whycon-ros for details and credits.\n\n";
 
+  m.attr("marker_dtype") = py::dtype::of<SMarkerRecord>();
+  // degradations of the latency budget (set_latency_budget), flags of WhyconMarker.degradations
+  m.attr("DEGRADE_STABLE_IDS") = (int)DEGRADE_STABLE_IDS;
+  m.attr("DEGRADE_ID_SAMPLING") = (int)DEGRADE_ID_SAMPLING;
+  m.attr("DEGRADE_RESCANS") = (int)DEGRADE_RESCANS;
+
+  PYBIND11_NUMPY_DTYPE(SPoseRecord, ID, x, y, z, qx, qy, qz, qw, valid);
+  m.attr("pose_dtype") = py::dtype::of<SPoseRecord>();
+
+  PYBIND11_NUMPY_DTYPE(SFusedPose, ID, x, y, z, weight, spread, num_cameras, valid);
+  m.attr("fused_dtype") = py::dtype::of<SFusedPose>();
+
+  // registered before the methods, it is used as a default argument
+  py::enum_<pixel_format>(m, "PixelFormat", "Layout of the image buffer given to the detector.")
+    .value("PF_AUTO", PF_AUTO)  // by the shape: (H,W,3) BGR, (H,W) GRAY, (H,W,2) YUYV
+    .value("PF_BGR", PF_BGR)
+    .value("PF_GRAY", PF_GRAY)
+    .value("PF_YUYV", PF_YUYV)
+    .value("PF_NV12", PF_NV12)  // (H*3/2,W), only the Y plane is used
+    .export_values();
+
   pybind11::class_<WhyCodeCppPython> whycon_detector ( m,  "WhyCodeDetector", 
     "The detector implements the algorithm of searching markers and ist numeric ID's."
   );
@@ -184,8 +869,13 @@ PYBIND11_MODULE(whycon, m) {
         bool,
         bool,
         bool,
-        bool
-      >(), "The constructor.",
+        bool,
+        int
+      >(), "The constructor.\n"
+      "With pyramid_levels > 0 the markers are searched in the image decimated 2^pyramid_levels times and then detected\n"
+      "at full resolution in small windows around the candidates (markers have to be big enough for the decimated image).\n"
+      "draw_coords and draw_segments render the results into the image after each detection (see render_markers),\n"
+      "the detection itself does not draw.",
       py::arg("\n\tcalib_camera_path"), // "path to existing camera calibration file"
       py::arg("\n\tcalib_space_transform_path"), // "path to existing space calibration file"
       py::arg("\n\tcircle_diam"), // default black circle diameter [m];
@@ -197,20 +887,236 @@ PYBIND11_MODULE(whycon, m) {
       py::arg("\n\tidentify"),    // whether to identify ID
       py::arg("\n\tdraw_coords"), 
       py::arg("\n\tdraw_segments"),
-      py::arg("\n\tdebug")       // whether write debug info
+      py::arg("\n\tdebug"),      // whether write debug info
+      py::arg("pyramid_levels") = 0
     )
 
     .def(
           "detect", 
           &WhyCodeCppPython::detect,
           "Detect whycon markers in the image (np.ndarray, shape=(W,H,3)) and returns list of found markers (as WhyconMarker object).\n"
-          "Tags found markers or highlights they in the image (according to the boolean parameters fill_found and fill_found_highlight)",
-          py::arg("\n\timg_array, shape=(width, height,3)")
+          "The image is used in place in the OpenCV (BGR) order, it is not copied and it is changed only by rendering\n"
+          "of the results (draw_coords, draw_segments).\n"
+          "The segmentation runs on the first byte of each pixel, that is the blue channel of a BGR image (the versions\n"
+          "which swapped the image to RGB segmented the red one). For another channel pass it as a luminance frame,\n"
+          "for example np.ascontiguousarray(img_array[:, :, 2]) for the red one.\n"
+          "Luminance (H,W), YUYV (H,W,2) and NV12 (H*3/2,W) frames are used directly too (see PixelFormat),\n"
+          "the segmentation and the ID sampling run on their Y plane.\n"
+          "A frame of other size than the previous one is accepted, the detector is set up for it again (the tracking\n"
+          "starts from the full scan).\n"
+          "max_markers (0 = num_markers of the detector) and ids (the wanted IDs, None = all) limit the markers\n"
+          "of this call, the markers with other IDs are not returned. max_markers stops the search when so many\n"
+          "markers are found. ids saves work only with set_id_table (the poses of the markers with other IDs are\n"
+          "not computed, the tracker does not search them and the search stops when the wanted IDs are found),\n"
+          "otherwise the core identifies each marker itself and ids is only a filter of the results.\n"
+          "Callers with different limits can share one detector.",
+          py::arg("\n\timg_array, shape=(width, height,3)"),
+          py::arg("pixel_format") = PF_AUTO,
+          py::arg("max_markers") = 0,
+          py::arg("ids") = py::none()
         //  py::arg("\n\tfill_found - show found markers in the image"),
         //  py::arg("\n\tfill_found_highlight - highlight markers in the image"),
         //  py::arg("\n\tdebug - do you like to write debug info?")         
      )
 
+    .def(
+          "detect_array",
+          &WhyCodeCppPython::detect_array,
+          "Detect whycon markers in the image (np.ndarray, shape=(H,W,3)) and returns them as one structured np.ndarray\n"
+          "(dtype=whycon.marker_dtype, one record per found marker). max_markers and ids as in detect.",
+          py::arg("\n\timg_array, shape=(height, width, 3)"),
+          py::arg("pixel_format") = PF_AUTO,
+          py::arg("max_markers") = 0,
+          py::arg("ids") = py::none()
+     )
+
+    .def(
+          "detect_into",
+          &WhyCodeCppPython::detect_into,
+          "Detect whycon markers in the image (np.ndarray, shape=(H,W,3)) and writes them to the preallocated structured\n"
+          "np.ndarray out (dtype=whycon.marker_dtype, size >= num_markers). Records behind the found markers get valid=False.\n"
+          "Returns the number of written markers. Nothing is allocated on the python side.\n"
+          "max_markers and ids as in detect.",
+          py::arg("\n\timg_array, shape=(height, width, 3)"),
+          py::arg("\n\tout, dtype=whycon.marker_dtype"),
+          py::arg("pixel_format") = PF_AUTO,
+          py::arg("max_markers") = 0,
+          py::arg("ids") = py::none()
+     )
+
+    .def(
+          "detect_batch",
+          &WhyCodeCppPython::detect_batch,
+          "Detect whycon markers in the sequence of frames by one call (np.ndarray, shape=(B,H,W,3) or list of np.ndarray\n"
+          "with shape=(H,W,3)). The first axis of np.ndarray is always the batch, so (B,H,W) is a batch of luminance frames.\n"
+          "The frames are processed in order (tracking continues from frame to frame).\n"
+          "With parallel=True the frames are independent (no tracking), they are detected in parallel on num_threads\n"
+          "native threads (0 = num of CPU cores), each with its own copy of this detector (the same camera, space\n"
+          "calibration, pyramid_levels and ID table, created with the first call, set_tiles, stats, publisher and\n"
+          "latency budget are not used by the copies).\n"
+          "max_markers and ids as in detect (the same for all frames).\n"
+          "Returns list of found markers (list of WhyconMarker objects) for each frame.\n"
+          "Frames of more streams (one detector per stream) can be processed by DetectorPool.",
+          py::arg("\n\tframes, shape=(batch, height, width, 3)"),
+          py::arg("pixel_format") = PF_AUTO,
+          py::arg("parallel") = false,
+          py::arg("num_threads") = 0,
+          py::arg("max_markers") = 0,
+          py::arg("ids") = py::none()
+     )
+
+    .def(
+        "set_tracking",
+        &WhyCodeCppPython::set_tracking,
+        "Tracking mode. Each found marker is predicted by a constant velocity Kalman filter and in the next frames it is\n"
+        "searched only in a small window around the prediction (the window grows with the uncertainty of the prediction).\n"
+        "The whole image is searched when a marker is missed max_misses times in a row, when nothing is tracked\n"
+        "or every rescan_interval frames (0 = never, new markers are then found only after a miss).\n"
+        "process_noise [px^2/frame^4] is the variance of the acceleration, measurement_noise [px^2] of the found center.",
+        py::arg("enable") = true,
+        py::arg("max_misses") = 3,
+        py::arg("rescan_interval") = 0,
+        py::arg("process_noise") = 16.0,
+        py::arg("measurement_noise") = 0.25
+    )
+    .def_property_readonly(
+        "tracking_counters",
+        &WhyCodeCppPython::tracking_counters,
+        "dict with num of processed frames, full scans (frames searched as a whole), searched windows, markers found\n"
+        "in their windows and whether the last frame was searched as a whole"
+    )
+    .def("reset_tracking_counters", &WhyCodeCppPython::reset_tracking_counters, "Sets the tracking counters to zero.")
+
+    .def(
+        "set_tiles",
+        &WhyCodeCppPython::set_tiles,
+        "Tiled mode. The whole image is searched in square tiles (tile_size [px], 0 = off) overlapping\n"
+        "by max_marker_diameter [px], so each marker lies whole in some tile. Markers found in more tiles are merged.\n"
+        "The tiles are copied and segmented in parallel on num_threads native threads (0 = num of CPU cores),\n"
+        "the buffers of the whycon core have only the size of a tile.\n"
+        "It is used instead of pyramid_levels and for the full scans of the tracking mode.",
+        py::arg("tile_size"),
+        py::arg("max_marker_diameter"),
+        py::arg("num_threads") = 0
+    )
+    .def_property_readonly("num_tiles", &WhyCodeCppPython::num_tiles, "num of tiles (0 before the first frame)")
+
+    .def(py::pickle(
+        [](const WhyCodeCppPython& detector) { return detector.getstate(); },
+        [](py::tuple state) { return WhyCodeCppPython::setstate(state); }
+    ))
+    .def_readwrite(
+        "pickle_tracking_state",
+        &WhyCodeCppPython::pickle_tracking_state,
+        "The detector can be pickled (copy.deepcopy, multiprocessing ...). The constructor parameters, settings,\n"
+        "camera matrices and the content of the space calibration file are pickled, so the copy is built without\n"
+        "reading the files. The tracked markers (set_tracking) are pickled too when this is True (default False).\n"
+        "The inner state of the whycon core (thresholds of the last frame) is not pickled.\n"
+        "A detector with a publisher (set_publisher) can not be pickled, RuntimeError is raised."
+    )
+
+    .def(
+        "set_id_table",
+        &WhyCodeCppPython::set_id_table,
+        "IDs are decoded by the wrapper, the whycon core only finds the markers. The table of IDs (it is the same as\n"
+        "the one of the core) is built once per process and cached in cache_dir ('' = $WHYCON_CACHE_DIR,\n"
+        "$XDG_CACHE_HOME/whycon or ~/.cache/whycon) for each (id_bits, hamming_dist), so the next starts only read it\n"
+        "(see prepare_id_table). adaptive_sampling reads every 4th point of the ID ring first and all id_samples points\n"
+        "only when the result is not unambiguous. Nothing is written into the image. Call it before the first frame.",
+        py::arg("enable") = true,
+        py::arg("cache_dir") = "",
+        py::arg("adaptive_sampling") = false
+    )
+
+    .def(
+        "calibrate_from_frames",
+        &WhyCodeCppPython::calibrate_from_frames,
+        "Space calibration from frames (list or array [N,H,W,...]) of the field with 4 markers at its corners,\n"
+        "[0,0] is left-top and [field_length,0] the next one clockwise (as in detect_and_calibrate). The markers are\n"
+        "found in each frame, the positions of the corner markers are averaged with the outliers dropped and the\n"
+        "transformation is computed by the whycon core. Nothing is written and the detector is not changed.\n"
+        "Returns dict of np.ndarray: dim_x, dim_y, hom (3x3, TRANSFORM_2D), offsets (4x3) and simlars (4x3x3,\n"
+        "TRANSFORM_3D), corners (4x3, camera coords) and num_frames (frames with 4 markers). Throws if there is none.\n"
+        "The frames are detected one by one, the GIL is released.",
+        py::arg("frames"),
+        py::arg("field_length"),
+        py::arg("field_width"),
+        py::arg("pixel_format") = PF_AUTO
+    )
+    .def(
+        "set_space_calibration",
+        &WhyCodeCppPython::set_space_calibration,
+        "Replaces the space calibration of the running detector (the result of calibrate_from_frames or the content\n"
+        "of a space calibration file), nothing is re-initialized and nothing is read from or written to the disk.\n"
+        "It is used by the trans_type given to the constructor (T_2D, T_3D). Pickled copies get it too.",
+        py::arg("calibration")
+    )
+    .def(
+        "get_space_calibration",
+        &WhyCodeCppPython::get_space_calibration,
+        "The space calibration in use as dict of np.ndarray (see calibrate_from_frames) or the content of the file\n"
+        "(as_text=True), for example to be saved. None when there is none.",
+        py::arg("as_text") = false
+    )
+
+    .def(
+        "set_publisher",
+        &WhyCodeCppPython::set_publisher,
+        "Sends the poses of the markers of each detected frame as one binary datagram (frame id, steady clock\n"
+        "timestamp [s] and ID, x, y, z, qx, qy, qz, qw, valid of each marker, see whycon.pose_dtype) right after\n"
+        "the detection. address is 'udp://host:port' (unicast, or multicast for 224.0.0.0/4) or 'unix:///path'\n"
+        "(UNIX datagram socket of a PoseSubscriber), '' stops it. The socket never blocks, packets which can not\n"
+        "be sent are dropped and counted. A publishing detector can not be pickled (RuntimeError).",
+        py::arg("address") = ""
+    )
+    .def(
+        "get_publisher_counters",
+        &WhyCodeCppPython::get_publisher_counters,
+        "Returns dict with address and num of published frames, sent and dropped (errors) packets, None when\n"
+        "nothing is published."
+    )
+
+    .def(
+        "set_latency_budget",
+        &WhyCodeCppPython::set_latency_budget,
+        "Budget of the detection of one frame [ms] (0 = off). When a frame takes longer, the quality of the next frames\n"
+        "is lowered step by step: 'stable_ids' (tracked markers with the same ID in the last frames are not decoded\n"
+        "again, the pose is taken without the identification and the angle from the last decoding), 'id_sampling'\n"
+        "(the ID rings are read sparsely only, as by set_id_table(adaptive_sampling=True) without the full reading)\n"
+        "and 'rescans' (the periodic full scans of set_tracking are postponed 4 times). The full quality is restored\n"
+        "step by step when the average latency has been under 60 % of the budget for restore_frames frames.\n"
+        "The degradations need set_id_table and set_tracking, the ones not possible with the settings are skipped,\n"
+        "RuntimeWarning is given when none of them is possible (the budget would only measure the latency).\n"
+        "The degradations active in each frame are in its results (WhyconMarker.degradations, the field degradations\n"
+        "of whycon.marker_dtype) as whycon.DEGRADE_* flags.",
+        py::arg("max_latency_ms") = 0.0,
+        py::arg("restore_frames") = 30
+    )
+    .def(
+        "latency_report",
+        &WhyCodeCppPython::latency_report,
+        "Returns dict with the budget, level and degradations (list of names) active in the last detected frame,\n"
+        "the degradations possible with the settings, its latency and the moving average [ms], num of frames,\n"
+        "degraded frames, IDs taken from the tracks and postponed full scans."
+    )
+
+    .def(
+        "enable_stats",
+        &WhyCodeCppPython::enable_stats,
+        "Switches on (off) measuring of the detection stages. When it is off, the timers cost only a test of the flag.",
+        py::arg("enable") = true
+    )
+    .def(
+        "get_stats",
+        &WhyCodeCppPython::get_stats,
+        "Returns dict with num of frames, returned markers, pixels given to the whycon core (upper bound of visited\n"
+        "pixels), points of the ID rings read by set_id_table decoding, full scans and tracked window searches/hits,\n"
+        "and dicts time [s] and calls of the stages: total, copy (windows, tiles), decimate (pyramid), core (whycon core:\n"
+        "segmentation, roundness tests, ID decoding and transformation together, they are not separable from the outside),\n"
+        "decode (set_id_table), merge (tiles), publish (set_publisher) and draw."
+    )
+    .def("reset_stats", &WhyCodeCppPython::reset_stats, "Sets the stats (and tracking and latency counters) to zero.")
+
     .def(
         "detect_and_calibrate",
         &WhyCodeCppPython::detect_and_calibrate,
@@ -220,8 +1126,216 @@ PYBIND11_MODULE(whycon, m) {
         py::arg("\n\tout_autocalibration_path - path to store result of alibration"),
         py::arg("\n\tfield_height - X dimension of the coordinate system"),
         py::arg("\n\tfield_width - Y dimension of the coordinate system"),
-        py::arg("\n\tdebug - do you like to write debug info?")           
+        py::arg("\n\tdebug - do you like to write debug info?"),
+        py::arg("pixel_format") = PF_AUTO
+    )
+    ;
+
+  pybind11::class_<DetectorPoolCppPython> detector_pool ( m,  "DetectorPool", 
+    "One detector per stream (camera). Frames of all streams are processed by one call on a pool of native threads\n"
+    "(without GIL), the streams are detected in parallel (the whycon core keeps its buffers per thread)."
+  );
+  detector_pool
+    .def(pybind11::init<int>(), "The constructor.",
+      py::arg("num_threads") = 0   // num of native threads, 0 = num of CPU cores
+    )
+    .def(
+        "add_stream",
+        &DetectorPoolCppPython::add_stream,
+        "Adds detector for a new stream and returns index of the stream. The parameters are the same as for WhyCodeDetector.",
+        py::arg("\n\tcalib_camera_path"),
+        py::arg("\n\tcalib_space_transform_path"),
+        py::arg("\n\tcircle_diam"),
+        py::arg("\n\tnum_markers"),
+        py::arg("\n\ttrans_type"),
+        py::arg("\n\tid_bits"),
+        py::arg("\n\tid_samples"),
+        py::arg("\n\thamming_dist"),
+        py::arg("\n\tidentify"),
+        py::arg("\n\tdraw_coords"), 
+        py::arg("\n\tdraw_segments"),
+        py::arg("\n\tdebug"),
+        py::arg("pyramid_levels") = 0
+    )
+    .def(
+        "detect",
+        &DetectorPoolCppPython::detect,
+        "Detect whycon markers in one frame of each stream. frames[i] (np.ndarray, shape=(H,W,3) or None to skip the stream)\n"
+        "belongs to the stream i. Returns list of found markers (list of WhyconMarker objects) for each stream.\n"
+        "max_markers and ids as in WhyCodeDetector.detect (the same for all streams).",
+        py::arg("\n\tframes"),
+        py::arg("pixel_format") = PF_AUTO,  // the same for all streams
+        py::arg("max_markers") = 0,
+        py::arg("ids") = py::none()
+    )
+    .def_property_readonly("num_streams", &DetectorPoolCppPython::num_streams, "num of streams")
+    .def_property_readonly("num_threads", &DetectorPoolCppPython::num_threads, "num of native threads")
+    ;
+
+  m.def(
+    "render_markers",
+    &render_markers,
+    "Draws the results of the detection (list of WhyconMarker or np.ndarray with dtype whycon.marker_dtype) into\n"
+    "the image (np.ndarray, uint8, shape=(H,W,3) or (H,W)) in place: segments (ellipses, bounding box ellipses for\n"
+    "the structured array), IDs and coordinates. It is independent of the detection (create detectors with\n"
+    "draw_coords=False, draw_segments=False for draw-free detection), so it can be called only for the displayed\n"
+    "frames or on another thread. The GIL is released while drawing.",
+    py::arg("image"),
+    py::arg("results"),
+    py::arg("draw_segments") = true,
+    py::arg("draw_ids") = true,
+    py::arg("draw_coords") = true,
+    py::arg("trans_2d") = false
+  );
+
+  m.def(
+    "prepare_id_table",
+    [](int id_bits, int hamming_dist, std::string cache_dir) {
+      py::gil_scoped_release release;
+      CIdCodebook::get(id_bits, hamming_dist, cache_dir);
+      return CIdCodebook::cache_path(id_bits, hamming_dist, cache_dir);
+    },
+    "Builds the table of IDs for set_id_table and stores it in the cache (for example at the installation),\n"
+    "returns path of the cached file ('' when there is no cache dir).",
+    py::arg("id_bits"),
+    py::arg("hamming_dist"),
+    py::arg("cache_dir") = ""
+  );
+
+  m.def(
+    "space_calibration_from_corners",
+    [](py::object corners, float field_length, float field_width) {
+      auto values = py::cast<py::array_t<float, py::array::c_style | py::array::forcecast> >(corners);
+      if (values.size() != 12) throw std::runtime_error("Corners should have 4x3 values");
+      whycon::STrackedObject objects[4] = {};
+      for (int b = 0; b < 4; b++) {
+        objects[b].x = values.data()[3 * b];
+        objects[b].y = values.data()[3 * b + 1];
+        objects[b].z = values.data()[3 * b + 2];
+      }
+      return dict_from_calibration(CSpaceCalibration::from_corners(objects, field_length, field_width));
+    },
+    "Space calibration (dict of np.ndarray for WhyCodeDetector.set_space_calibration) from the positions of the\n"
+    "corners of the field in the camera coords (4x3, T_NONE coords of the detector) in the order [0,0], [length,0],\n"
+    "[0,width], [length,width] of the field, as calibrate_from_frames computes it from the found markers.",
+    py::arg("corners"),
+    py::arg("field_length"),
+    py::arg("field_width")
+  );
+
+  m.def(
+    "id_codes",
+    [](int id_bits, int hamming_dist, std::string cache_dir) {
+      std::vector<int> codes;
+      {
+        py::gil_scoped_release release;
+        codes = CIdCodebook::get(id_bits, hamming_dist, cache_dir)->codes();
+      }
+      return py::array_t<int32_t>(codes.size(), codes.data());
+    },
+    "Returns np.ndarray with the code (id_bits bits, the first bit is the most significant) of each pattern,\n"
+    "the detector returns ID = index + 1 (0 = unknown). For printing or rendering of the markers\n"
+    "(see usecases/synthetic_markers.py).",
+    py::arg("id_bits"),
+    py::arg("hamming_dist"),
+    py::arg("cache_dir") = ""
+  );
+
+  pybind11::class_<CPoseSubscriber> pose_subscriber (
+    m,
+    "PoseSubscriber",
+    "Receives the poses sent by WhyCodeDetector.set_publisher. It listens on the address of the publisher\n"
+    "('udp://host:port' - the port is bound, the multicast group is joined; 'unix:///path' - the socket file is\n"
+    "created and removed with the subscriber)."
+  );
+  pose_subscriber
+    .def(pybind11::init<std::string>(), py::arg("address"))
+    .def(
+      "receive",
+      [](CPoseSubscriber& subscriber, double timeout) -> py::object {
+        SPoseFrame frame;
+        bool received;
+        {
+          py::gil_scoped_release release;
+          received = subscriber.receive(frame, timeout);
+        }
+        if (!received) return py::none();
+        PosesArray poses(frame.markers.size());
+        std::copy(frame.markers.begin(), frame.markers.end(), poses.mutable_data());
+        return py::make_tuple(frame.frame, frame.timestamp, poses);
+      },
+      "Waits for the next packet up to timeout [s] (< 0 = forever). Returns (frame, timestamp, poses) - frame id\n"
+      "of the publisher, its steady clock timestamp [s] (time.monotonic() of the host) and np.ndarray with dtype\n"
+      "whycon.pose_dtype - or None after the timeout.",
+      py::arg("timeout") = -1.0
     )
+    .def_readonly("address", &CPoseSubscriber::address)
+    .def_readonly("received", &CPoseSubscriber::received, "num of received packets")
+    .def_readonly("invalid", &CPoseSubscriber::invalid, "num of skipped packets (other version, broken)")
+    ;
+
+  pybind11::class_<CPoseFusion> pose_fusion (
+    m,
+    "PoseFusion",
+    "Fuses the markers found by several cameras into one pose per ID. The detectors of the cameras have to give\n"
+    "the positions in one world frame (T_2D, T_3D or T_4D with the space calibrations of one field), the markers are\n"
+    "associated by ID (ID 0 is not fused). The last two observations of each marker by each camera are kept, so\n"
+    "its position is interpolated to the asked timestamp (extrapolated up to max_extrapolation [s]), the ones\n"
+    "older than max_age [s] are not used. The cameras are weighted by cos(viewing angle) / distance^2 (cos_view\n"
+    "and d of the markers, both in the camera coords). The orientation is not fused (the quaternions of the detectors\n"
+    "are in the camera coords). The results of the cameras can come at their own rates, the fused poses are\n"
+    "available at the combined rate."
+  );
+  pose_fusion
+    .def(pybind11::init<float, float>(), py::arg("max_age") = 0.1, py::arg("max_extrapolation") = 0.05)
+    .def(
+      "set_camera",
+      [](CPoseFusion& fusion, int camera, py::object position, double time_offset) {
+        if (position.is_none()) return fusion.set_camera(camera, NULL, time_offset);
+        auto values = py::cast<py::array_t<float, py::array::c_style | py::array::forcecast> >(position);
+        if (values.size() != 3) throw std::runtime_error("Position of the camera should have 3 values");
+        fusion.set_camera(camera, values.data(), time_offset);
+      },
+      "Sets the position of the camera in the world coords (x, y, z or None = unknown, it gives the distance only\n"
+      "for the results without d) and the offset [s] added to its timestamps (to have one clock for all cameras).",
+      py::arg("camera"),
+      py::arg("position") = py::none(),
+      py::arg("time_offset") = 0.0
+    )
+    .def(
+      "add",
+      [](CPoseFusion& fusion, int camera, double timestamp, py::object results) {
+        fusion.add(camera, timestamp, markers_from_results(results));
+      },
+      "Adds the results of the detection of the camera (list of WhyconMarker or np.ndarray with dtype\n"
+      "whycon.marker_dtype) taken at the timestamp [s].",
+      py::arg("camera"),
+      py::arg("timestamp"),
+      py::arg("results")
+    )
+    .def(
+      "fuse",
+      &fused_poses,
+      "Returns np.ndarray with dtype whycon.fused_dtype - one fused pose per ID seen at the timestamp [s]\n"
+      "(sorted by ID).",
+      py::arg("timestamp")
+    )
+    .def(
+      "add_and_fuse",
+      [](CPoseFusion& fusion, int camera, double timestamp, py::object results) {
+        fusion.add(camera, timestamp, markers_from_results(results));
+        return fused_poses(fusion, timestamp);
+      },
+      "add and fuse at the same timestamp (the fused poses for each frame of any camera).",
+      py::arg("camera"),
+      py::arg("timestamp"),
+      py::arg("results")
+    )
+    .def("clear", &CPoseFusion::clear, "Forgets all observations (the cameras are kept).")
+    .def_readwrite("max_age", &CPoseFusion::max_age)
+    .def_readwrite("max_extrapolation", &CPoseFusion::max_extrapolation)
+    .def_readonly("observations", &CPoseFusion::observations, "num of added markers")
+    .def_readonly("dropped", &CPoseFusion::dropped, "num of markers not newer than the last one of their camera")
     ;
 
   pybind11::class_<CWhyconMarker> marker (
@@ -232,6 +1346,10 @@ PYBIND11_MODULE(whycon, m) {
   marker
     .def_readwrite("segment_in_image", &CWhyconMarker::segment_in_image, "found segment in the image")
     .def_readwrite("coords", &CWhyconMarker::coords, "logical coordinates of found marker")
+    .def_readwrite(
+      "degradations", &CWhyconMarker::degradations,
+      "degradations of the latency budget active in the frame (whycon.DEGRADE_* flags, 0 = full quality)"
+    )
     ;
     
   
@@ -287,7 +1405,11 @@ PYBIND11_MODULE(whycon, m) {
     .def_readwrite("x", &whycon::STrackedObject::x, "float, x position in the camera coords")
     .def_readwrite("y", &whycon::STrackedObject::y, "float, y position in the camera coords")
     .def_readwrite("z", &whycon::STrackedObject::z, "float, z position in the camera coords")
-    .def_readwrite("d", &whycon::STrackedObject::d, "float, position and distance in the camera coords")
+    .def_readwrite("d", &whycon::STrackedObject::d, "float, distance from the camera")
+    .def_readwrite(
+      "cos_view", &whycon::STrackedObject::cos_view,
+      "float, cos of the angle between the normal and the line of sight (in the camera coords)"
+    )
     .def_readwrite("pitch", &whycon::STrackedObject::pitch, "float, fixed axis angles")
     .def_readwrite("roll", &whycon::STrackedObject::roll, "float, fixed axis angles")
     .def_readwrite("yaw", &whycon::STrackedObject::yaw, "float, fixed axis angles")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+__author__ = "Ivo Marvan"
+__email__ = "ivo@marvan.cz"
+__description__ = '''
+    Read images from a camera and find markers in an asyncio pipeline (see whycon_stream.py).
+    The event loop stays free for other tasks, only the newest poses are delivered when the detection is slow.
+'''
+import os
+import sys
+import asyncio
+
+# root of project repository
+THE_FILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.abspath(os.path.join(THE_FILE_DIR, '..'))
+sys.path.append(PROJECT_ROOT)
+
+try:
+    from whycon import WhyCodeDetector, SpaceTransofmType as TransType, render_markers
+    import whycon
+    print(f'Use installed whycon package in "{whycon.__file__}"')
+except ModuleNotFoundError:
+    PACKAGE_DIR = os.path.abspath(os.path.join(PROJECT_ROOT, 'bin'))
+    sys.path.append(PACKAGE_DIR)
+    from whycon import WhyCodeDetector, SpaceTransofmType as TransType, render_markers
+    print(f'Use whycon paskage from local installation: "{PACKAGE_DIR}"')
+
+from web_camera import ThreadedWebCamera
+from whycon_stream import stream, DROP_OLDEST
+from window import ImgStorageWindow
+
+
+async def main():
+    camera_calibration_path = os.path.realpath(os.path.join(PROJECT_ROOT, 'config', 'camera_calibration.example.yml'))
+    space_calibration_path  = os.path.realpath(os.path.join(PROJECT_ROOT, 'config', 'space_calibration.example.yml'))
+
+    window = ImgStorageWindow()
+    camera = ThreadedWebCamera()
+
+    detector = WhyCodeDetector(
+        camera_calibration_path, # path to existing camera calibration file
+        space_calibration_path,  # path to existing space calibration file
+        0.15,             # default black circle diameter [m];
+        4,                # num of markers to track
+        TransType.T_NONE, # calibation transform type
+        7,                # num of ID id_bits
+        720,              # num of id_samples to identify ID
+        2,                # hamming distance of ID code
+        True,             # whether to identify ID
+        False,            # whether to show coords (the results are rendered bellow)
+        False,            # whether to show segment
+        False             # whether print debug info
+    )
+
+    results = stream(camera.frames(timeout=5.0), detector, max_in_flight=2, policy=DROP_OLDEST)
+    async for result in results:
+        for i, marker in enumerate(result.markers):
+            print(f'{result.index}:{i}\tID {marker.segment_in_image.ID} at {result.timestamp:.3f} [s]', end='\t')
+            print(f'in space x:{marker.coords.x}, y:{marker.coords.y}, z:{marker.coords.z}')
+        render_markers(result.image, result.markers)
+        window.swow(result.image)
+        if window.is_stopped():
+            break
+    camera.stop()
+    print(f'Read {results.read} frames, {results.dropped} dropped in the pipeline, {camera.dropped} by the camera.')
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -15,16 +15,16 @@ PROJECT_ROOT = os.path.abspath(os.path.join(THE_FILE_DIR, '..'))
 sys.path.append(PROJECT_ROOT)
 
 try:
-    from whycon import WhyCodeDetector, SpaceTransofmType as TransType
+    from whycon import WhyCodeDetector, SpaceTransofmType as TransType, render_markers
     import whycon
     print(f'Use installed whycon package in "{whycon.__file__}"')
 except ModuleNotFoundError:
     PACKAGE_DIR = os.path.abspath(os.path.join(PROJECT_ROOT, 'bin'))
     sys.path.append(PACKAGE_DIR)
-    from whycon import WhyCodeDetector, SpaceTransofmType as TransType
+    from whycon import WhyCodeDetector, SpaceTransofmType as TransType, render_markers
     print(f'Use whycon paskage from local installation: "{PACKAGE_DIR}"')
 
-from web_camera import WebCamera
+from web_camera import ThreadedWebCamera
 from window import ImgStorageWindow
 
 
@@ -40,7 +40,7 @@ if __name__ == "__main__":
 
     window = ImgStorageWindow()
 
-    camera = WebCamera()
+    camera = ThreadedWebCamera()   # grabs on its own thread, read() returns the newest frame
 
     detector = WhyCodeDetector(
         camera_calibration_path, # path to existing camera calibration file
@@ -52,8 +52,8 @@ if __name__ == "__main__":
         720,              # num of id_samples to identify ID
         2,                # hamming distance of ID code
         True,             # whether to identify ID
-        True,             # whether to show coords
-        True,             # whether to show segment
+        False,            # whether to show coords (detection is draw-free, see render_markers bellow)
+        False,            # whether to show segment
         False             # whether print debug info
     )
 
@@ -73,12 +73,17 @@ if __name__ == "__main__":
                     print(f'\t\tID {marker.segment_in_image.ID}')
                     print(f'{i}\t\tin image x:{marker.segment_in_image.x}, y:{marker.segment_in_image.y}')
                     print(f'\t\tin space x:{marker.coords.x}, y:{marker.coords.y}, z:{marker.coords.z}, d:{marker.coords.d}')
+            if detector_result:
+                render_markers(img_array, detector_result)
             window.swow(img_array)
             delta_time = stop_time - start_time
             t_sum += delta_time
             t_count += 1
         # print(f'delta time = {delta_time}')
         stop = window.is_stopped()
-    print(f'AVG(delta time) = {round(1000*delta_time, 1)} [ms]')
+    camera.stop()
+    print(f'Captured {camera.captured} frames, {camera.dropped} dropped (newer frame was ready).')
+    if t_count:
+        print(f'AVG(delta time) = {round(1000 * t_sum / t_count, 1)} [ms] of {t_count} frames')
 
 
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+__author__ = "Ivo Marvan"
+__email__ = "ivo@marvan.cz"
+__description__ = '''
+    Fusion of the markers found by several cameras (each with its own detector) into one pose per ID
+    (whycon.PoseFusion). The detectors have to give the positions in one world frame (T_2D, T_3D, T_4D
+    with the space calibrations of one field), the frames of the cameras are processed in the order
+    of their timestamps and the fused poses are given for each of them (the combined frame rate).
+
+    Replayed captures (whycon_capture.py), CAMERA is capture.wcap:camera_calibration.yml:space_calibration.yml:
+
+        ./multi_camera_fusion.py replay cam0.wcap:cam0.yml:space0.yml cam1.wcap:cam1.yml:space1.yml --trans-type T_3D
+
+    Synthetic frames (synthetic_markers.py): N cameras at different poses around one scene take its frames
+    in turns (camera k takes the frames k, k + N, ...), so each camera runs at 1/N of the rate of the scene.
+    The world frame is a field in the plane of the markers, each detector (T_3D) is calibrated by the corners
+    of the field seen by its camera. The fused positions are compared with the ground truth of each frame
+    (in the world frame) and with the last position reported by any camera:
+
+        ./multi_camera_fusion.py synthetic --cameras 4 --frames 200
+'''
+import os
+import sys
+import heapq
+import argparse
+import tempfile
+import numpy as np
+
+# root of project repository
+THE_FILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.abspath(os.path.join(THE_FILE_DIR, '..'))
+sys.path.append(PROJECT_ROOT)
+
+try:
+    import whycon
+except ModuleNotFoundError:
+    PACKAGE_DIR = os.path.abspath(os.path.join(PROJECT_ROOT, 'bin'))
+    sys.path.append(PACKAGE_DIR)
+    import whycon
+
+from synthetic_markers import SyntheticScene
+from whycon_capture import ReplaySource
+
+
+def create_detector(args: argparse.Namespace, camera_path: str, space_path: str, trans_type):
+    detector = whycon.WhyCodeDetector(
+        camera_path, space_path, args.circle_diam, args.num_markers, trans_type,
+        args.id_bits, args.id_samples, args.hamming_dist,
+        True,       # identify
+        False,      # draw-free detection
+        False,
+        False
+    )
+    detector.set_tracking(True)
+    return detector
+
+
+def create_fusion(args: argparse.Namespace):
+    return whycon.PoseFusion(args.max_age / 1000, args.max_extrapolation / 1000)
+
+
+def replay(args: argparse.Namespace) -> int:
+    fusion = create_fusion(args)
+    trans_type = getattr(whycon.SpaceTransofmType, args.trans_type)
+    sources, detectors = [], []
+    for camera, spec in enumerate(args.cameras):
+        capture_path, camera_path, space_path = spec.split(':')
+        sources.append(ReplaySource(capture_path))
+        detectors.append(create_detector(args, camera_path, space_path, trans_type))
+    # the frames of all cameras in the order of their timestamps
+    streams = [
+        ((frame.timestamp, camera, frame) for frame in source.frames()) for camera, source in enumerate(sources)
+    ]
+    for timestamp, camera, frame in heapq.merge(*streams, key=lambda item: item[:2]):
+        records = detectors[camera].detect_array(frame.image)
+        poses = fusion.add_and_fuse(camera, timestamp, records)
+        for pose in poses:
+            print(
+                f'{timestamp:.4f} cam {camera} ID {pose["ID"]:3d} x={pose["x"]:8.4f} y={pose["y"]:8.4f} '
+                f'z={pose["z"]:8.4f} cameras {pose["num_cameras"]} spread {pose["spread"] * 1000:.1f} mm'
+            )
+    print(f'observations {fusion.observations}, dropped {fusion.dropped}', file=sys.stderr)
+    return 0
+
+
+def camera_views(num_cameras: int, pivot: np.ndarray, angle: float) -> list:
+    '''
+    Cameras looking at the pivot (scene coords) from the same distance as the scene camera, turned around
+    the vertical axis through it by -angle .. angle [deg] (and a little up and down).
+    '''
+    views = []
+    for k in range(num_cameras):
+        yaw = np.radians(angle) * (2 * k / max(num_cameras - 1, 1) - 1)
+        pitch = np.radians(5.0) * (-1) ** k
+        cz, sz, cy, sy = np.cos(yaw), np.sin(yaw), np.cos(pitch), np.sin(pitch)
+        rot = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]]) @ np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+        views.append((rot, pivot - rot @ pivot))
+    return views
+
+
+def synthetic(args: argparse.Namespace) -> int:
+    scene = SyntheticScene(
+        args.width, args.height, args.num_markers, args.circle_diam, args.id_bits, args.hamming_dist,
+        fps=args.fps * args.cameras, seed=args.seed
+    )
+    # the world is the field in the plane of the markers, corners [0,0], [length,0], [0,width], [length,width]
+    pivot = np.array([float(np.mean(scene.truth(0)['x'])), 0.0, 0.0])
+    origin = pivot + np.array([0.0, args.field_length / 2, -args.field_width / 2])
+    corners = origin + np.array([
+        [0, 0, 0], [0, -args.field_length, 0], [0, 0, args.field_width], [0, -args.field_length, args.field_width]
+    ])
+    axis_x = (corners[1] - corners[0]) / args.field_length
+    axis_y = (corners[2] - corners[0]) / args.field_width
+    world = np.stack([axis_x, axis_y, np.cross(axis_y, axis_x)])     # as the 3D transformation of the core
+    views = camera_views(args.cameras, pivot, args.angle)
+
+    fusion = create_fusion(args)
+    fused_errors, last_errors = [], []
+    last = {}       # ID -> the last position reported by any camera
+    with tempfile.TemporaryDirectory(prefix='multi_camera_fusion_') as directory:
+        camera_path = scene.write_calibration(os.path.join(directory, 'camera.yml'))
+        space_path = os.path.join(PROJECT_ROOT, 'config', 'space_calibration.example.yml')
+        detectors = []
+        for camera, (rot, center) in enumerate(views):
+            detector = create_detector(args, camera_path, space_path, whycon.SpaceTransofmType.T_3D)
+            # the corners of the field seen by the camera give its transformation to the world
+            detector.set_space_calibration(whycon.space_calibration_from_corners(
+                (corners - center) @ rot, args.field_length, args.field_width
+            ))
+            fusion.set_camera(camera, position=world @ (center - origin))
+            detectors.append(detector)
+        for index in range(args.frames):
+            camera = index % args.cameras
+            frame = scene.frame(index, views[camera])
+            records = detectors[camera].detect_array(frame.image)
+            poses = fusion.add_and_fuse(camera, frame.timestamp, records)
+            for record in records[(records['valid'] != 0) & (records['ID'] > 0)]:
+                last[int(record['ID'])] = np.array([record['x'], record['y'], record['z']])
+            truth = {
+                int(t['ID']): world @ (np.array([t['x'], t['y'], t['z']]) - origin) for t in frame.truth
+            }
+            for pose in poses:
+                position = truth.get(int(pose['ID']))
+                if position is None or int(pose['ID']) not in last:
+                    continue
+                fused_errors.append(np.linalg.norm(np.array([pose['x'], pose['y'], pose['z']]) - position))
+                last_errors.append(np.linalg.norm(last[int(pose['ID'])] - position))
+    if not fused_errors:
+        print('No marker was fused.', file=sys.stderr)
+        return 1
+    print(
+        f'{args.cameras} cameras at {args.fps:.1f} fps, {len(fused_errors)} fused poses '
+        f'({fusion.observations} observations, {fusion.dropped} dropped)\n'
+        f'fused position error       mean {np.mean(fused_errors) * 1000:7.2f} mm  '
+        f'p95 {np.percentile(fused_errors, 95) * 1000:7.2f} mm\n'
+        f'last reported camera error mean {np.mean(last_errors) * 1000:7.2f} mm  '
+        f'p95 {np.percentile(last_errors, 95) * 1000:7.2f} mm'
+    )
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Fusion of the markers found by several cameras.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    replay_parser = commands.add_parser('replay', help='fuse the detections in the captures of the cameras')
+    replay_parser.add_argument('cameras', nargs='+', help='capture.wcap:camera_calibration.yml:space_calibration.yml')
+    replay_parser.add_argument('--trans-type', default='T_3D', choices=['T_2D', 'T_3D', 'T_4D'])
+    synthetic_parser = commands.add_parser('synthetic', help='fuse the synthetic frames taken by the cameras in turns')
+    synthetic_parser.add_argument('--cameras', type=int, default=4, help='num of cameras')
+    synthetic_parser.add_argument('--frames', type=int, default=200, help='num of frames of the scene')
+    synthetic_parser.add_argument('--fps', type=float, default=30.0, help='frame rate of each camera')
+    synthetic_parser.add_argument('--width', type=int, default=640)
+    synthetic_parser.add_argument('--height', type=int, default=480)
+    synthetic_parser.add_argument('--seed', type=int, default=0)
+    synthetic_parser.add_argument('--angle', type=float, default=20.0, help='[deg] cameras are turned by -angle .. angle')
+    synthetic_parser.add_argument('--field-length', type=float, default=1.0, help='[m] field of the world frame')
+    synthetic_parser.add_argument('--field-width', type=float, default=0.75, help='[m]')
+    for command in (replay_parser, synthetic_parser):
+        command.add_argument('--num-markers', type=int, default=4, help='num of markers to track')
+        command.add_argument('--circle-diam', type=float, default=0.15, help='black circle diameter [m]')
+        command.add_argument('--id-bits', type=int, default=7, help='num of ID bits')
+        command.add_argument('--id-samples', type=int, default=360, help='num of samples to identify ID')
+        command.add_argument('--hamming-dist', type=int, default=2, help='hamming distance of ID code')
+        command.add_argument('--max-age', type=float, default=100.0, help='[ms] older observations are not fused')
+        command.add_argument('--max-extrapolation', type=float, default=50.0, help='[ms]')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    return replay(args) if args.command == 'replay' else synthetic(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+__author__ = "Ivo Marvan"
+__email__ = "ivo@marvan.cz"
+__description__ = '''
+    Receiver of the poses sent by WhyCodeDetector.set_publisher without the whycon module (only socket and NumPy),
+    for example on the controller of a robot. One datagram per detected frame (little endian, packed):
+
+        header:  magic 'WPOS' (u4), version (u2), num_markers (u2), frame (u8), timestamp [s] (f8)
+        markers: ID (i4), x, y, z (f4), qx, qy, qz, qw (f4), valid (u1)      - num_markers times
+
+    The layout is src/SPosePacket.h, whycon.PoseSubscriber is the same receiver in the extension.
+    The timestamp is the steady clock of the detecting host (time.monotonic() there).
+
+        ./pose_subscriber.py udp://239.255.0.1:5005         # detector.set_publisher('udp://239.255.0.1:5005')
+        ./pose_subscriber.py unix:///tmp/whycon_poses.sock
+'''
+import os
+import sys
+import socket
+import struct
+import argparse
+from time import monotonic
+from typing import NamedTuple, Optional
+import numpy as np
+
+MAGIC = 0x534F5057      # 'WPOS'
+VERSION = 1
+
+HEADER_DTYPE = np.dtype([
+    ('magic', '<u4'), ('version', '<u2'), ('num_markers', '<u2'), ('frame', '<u8'), ('timestamp', '<f8')
+])
+POSE_DTYPE = np.dtype([
+    ('ID', '<i4'), ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+    ('qx', '<f4'), ('qy', '<f4'), ('qz', '<f4'), ('qw', '<f4'), ('valid', 'u1')
+])
+MAX_PACKET = 65536
+
+
+class PoseFrame(NamedTuple):
+    frame: int              # frame id of the publisher
+    timestamp: float        # [s] steady clock of the publisher
+    poses: np.ndarray       # records with dtype POSE_DTYPE (the same as whycon.pose_dtype)
+
+
+def parse_packet(packet: bytes) -> Optional[PoseFrame]:
+    ''' PoseFrame of the datagram, None for packets of other versions or broken ones. '''
+    if len(packet) < HEADER_DTYPE.itemsize:
+        return None
+    header = np.frombuffer(packet, dtype=HEADER_DTYPE, count=1)[0]
+    num_markers = int(header['num_markers'])
+    if (
+        header['magic'] != MAGIC or header['version'] != VERSION or
+        len(packet) != HEADER_DTYPE.itemsize + num_markers * POSE_DTYPE.itemsize
+    ):
+        return None
+    poses = np.frombuffer(packet, dtype=POSE_DTYPE, count=num_markers, offset=HEADER_DTYPE.itemsize)
+    return PoseFrame(int(header['frame']), float(header['timestamp']), poses)
+
+
+class PoseReceiver:
+    """
+    Listens on the address of the publisher: 'udp://host:port' (the port is bound, the multicast group is joined)
+    or 'unix:///path' (the socket file is created and removed by close()).
+    """
+    def __init__(self, address: str):
+        self.address = address
+        self._path = None
+        if address.startswith('unix://'):
+            self._path = address[len('unix://'):]
+            if os.path.exists(self._path):
+                os.unlink(self._path)
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._socket.bind(self._path)
+        elif address.startswith('udp://'):
+            host, _, port = address[len('udp://'):].rpartition(':')
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            multicast = 224 <= int(host.split('.')[0]) <= 239
+            if multicast:
+                self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._socket.bind(('', int(port)))
+            if multicast:
+                group = struct.pack('4s4s', socket.inet_aton(host), socket.inet_aton('0.0.0.0'))
+                self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, group)
+        else:
+            raise ValueError(f'Address should be udp://host:port or unix:///path, not {address}')
+        self.received = 0
+        self.invalid = 0        # skipped packets
+
+    def receive(self, timeout: Optional[float] = None) -> Optional[PoseFrame]:
+        ''' Waits for the next packet up to timeout [s] (None = forever), None after the timeout. '''
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            self._socket.settimeout(None if deadline is None else max(0.0, deadline - monotonic()))
+            try:
+                packet = self._socket.recv(MAX_PACKET)
+            except (socket.timeout, BlockingIOError):
+                return None
+            result = parse_packet(packet)
+            if result is not None:
+                self.received += 1
+                return result
+            self.invalid += 1
+
+    def __iter__(self):
+        while True:
+            yield self.receive()
+
+    def close(self):
+        self._socket.close()
+        if self._path is not None and os.path.exists(self._path):
+            os.unlink(self._path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Prints the poses sent by WhyCodeDetector.set_publisher.')
+    parser.add_argument('address', help='udp://host:port or unix:///path')
+    args = parser.parse_args(argv)
+    with PoseReceiver(args.address) as receiver:
+        try:
+            for result in receiver:
+                latency_ms = (monotonic() - result.timestamp) * 1000    # meaningful on the same host only
+                print(f'frame {result.frame} ({latency_ms:.3f} ms):')
+                for pose in result.poses[result.poses['valid'] != 0]:
+                    print(
+                        f'    ID {pose["ID"]}: x={pose["x"]:.3f} y={pose["y"]:.3f} z={pose["z"]:.3f} '
+                        f'q=({pose["qx"]:.3f}, {pose["qy"]:.3f}, {pose["qz"]:.3f}, {pose["qw"]:.3f})'
+                    )
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+__author__ = "Ivo Marvan"
+__email__ = "ivo@marvan.cz"
+__description__ = '''
+    Synthetic frames with WhyCode markers of known IDs and poses (no camera is needed).
+
+    The markers are rendered by a pinhole camera without distortion (write_calibration() writes its calibration
+    file for the detector), each pixel is supersampled, then the frame is blurred and the noise is added:
+
+        scene = SyntheticScene(1280, 720, num_markers=8, id_bits=7, hamming_dist=2, seed=1)
+        scene.write_calibration('/tmp/synthetic_camera.yml')
+        for frame in scene.frames(100):
+            records = detector.detect_array(frame.image)
+            print(frame.truth['ID'], frame.truth['u'], frame.truth['v'])
+
+    The markers move slowly (each one inside its own cell of the frame, so they never overlap) and turn,
+    the frames follow each other as a video (the tracking works). The ground truth has the coordinates
+    of the detector without the space transformation (T_NONE): x is the depth, y to the left, z up [m].
+
+    The same scene can be taken by other cameras (of the same calibration): frame(index, view) renders it
+    from the camera with the rotation and position given in the coordinates of the scene (the ground truth
+    stays in them).
+
+    The code of each ID is taken from the codebook of the extension (whycon.id_codes), it is drawn as the white
+    and black teeth of the ID ring (Manchester code: the bit and its complement, the first bit is the most
+    significant) in the same direction as the detector reads it.
+
+        ./synthetic_markers.py out_dir --frames 10 --width 1280 --height 720 --num-markers 8
+'''
+import os
+import sys
+import argparse
+from typing import Iterator, NamedTuple, Optional, Tuple
+import cv2
+import numpy as np
+
+# root of project repository
+THE_FILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.abspath(os.path.join(THE_FILE_DIR, '..'))
+sys.path.append(PROJECT_ROOT)
+
+try:
+    import whycon
+except ModuleNotFoundError:
+    PACKAGE_DIR = os.path.abspath(os.path.join(PROJECT_ROOT, 'bin'))
+    sys.path.append(PACKAGE_DIR)
+    import whycon
+
+# radii of the pattern relative to the outer radius of the black ring
+INNER_RADIUS = 0.33 / 0.70          # white circle, the detector reads the ID on it
+TEETH_RADII = (0.6 * INNER_RADIUS, 1.28 * INNER_RADIUS)     # the teeth keep the white area of the circle
+PAPER_RADIUS = 1.4                  # white square around the marker (half of its side)
+
+TRUTH_DTYPE = np.dtype([
+    ('ID', '<i4'),                  # as returned by the detector (index of the code + 1)
+    ('u', '<f4'), ('v', '<f4'),     # [px] projection of the center
+    ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),   # [m] coordinates of the detector (T_NONE)
+    ('diameter', '<f4'),            # [px] projected outer diameter (approximately)
+    ('angle', '<f4')                # [rad] rotation of the marker in its plane
+])
+
+
+class SyntheticFrame(NamedTuple):
+    index: int
+    timestamp: float        # [s] index / fps
+    image: np.ndarray       # uint8, shape=(height, width, 3)
+    truth: np.ndarray       # records with dtype TRUTH_DTYPE, one per marker
+
+
+def rotation(yaw: float, tilt_x: float, tilt_y: float) -> np.ndarray:
+    ''' Rotation of the marker plane (yaw in the plane, then the tilts about the x and y axes of the camera). '''
+    cz, sz = np.cos(yaw), np.sin(yaw)
+    cx, sx = np.cos(tilt_x), np.sin(tilt_x)
+    cy, sy = np.cos(tilt_y), np.sin(tilt_y)
+    rz = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+    rx = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    return ry @ rx @ rz
+
+
+# coords of the detector (x depth, y left, z up) -> coords of OpenCV (x right, y down, z forward)
+AXES = np.array([[0.0, -1.0, 0.0], [0.0, 0.0, -1.0], [1.0, 0.0, 0.0]])
+
+View = Tuple[np.ndarray, np.ndarray]    # rotation (columns = axes of the camera) and position in the scene coords
+
+
+def pattern(x: np.ndarray, y: np.ndarray, code: int, id_bits: int) -> np.ndarray:
+    '''
+    Brightness (0 or 1) of the points of the marker plane in the units of the outer radius, the marker is in
+    the plane (x right, y down as in the image when it faces the camera). Nan outside of the paper.
+    '''
+    r = np.hypot(x, y)
+    value = np.where(r <= 1.0, 0.0, 1.0)
+    value[r <= TEETH_RADII[0]] = 1.0
+    teeth = (r > TEETH_RADII[0]) & (r <= TEETH_RADII[1])
+    # the detector reads the halves of the bits with the decreasing angle of the image
+    half = np.floor(np.mod(-np.arctan2(y[teeth], x[teeth]), 2 * np.pi) / (np.pi / id_bits)).astype(int)
+    half = np.minimum(half, 2 * id_bits - 1)
+    bits = (code >> (id_bits - 1 - half // 2)) & 1
+    value[teeth] = np.where(half % 2 == 0, bits, 1 - bits)
+    value[(np.abs(x) > PAPER_RADIUS) | (np.abs(y) > PAPER_RADIUS)] = np.nan
+    return value
+
+
+def render_marker(
+    image: np.ndarray, intrinsic: np.ndarray, rot: np.ndarray, position: np.ndarray, diameter: float,
+    code: int, id_bits: int, supersample: int = 3
+):
+    '''
+    Draws the marker (float image, 0..1, shape=(H,W)) by casting the rays of the subpixels to its plane.
+    position is the center in the camera coordinates of OpenCV (x right, y down, z forward) [m].
+    '''
+    radius = diameter / 2
+    height, width = image.shape
+    # bounding box of the projected paper
+    corners = np.array([[sx, sy, 0] for sx in (-1, 1) for sy in (-1, 1)]) * PAPER_RADIUS * radius
+    points = (rot @ corners.T).T + position
+    uv = (intrinsic @ points.T).T
+    uv = uv[:, :2] / uv[:, 2:]
+    u0, v0 = np.maximum(np.floor(uv.min(axis=0)).astype(int) - 1, 0)
+    u1, v1 = np.minimum(np.ceil(uv.max(axis=0)).astype(int) + 2, (width, height))
+    if u0 >= u1 or v0 >= v1:
+        return
+    offsets = (np.arange(supersample) + 0.5) / supersample - 0.5
+    us = (np.arange(u0, u1)[:, None] + offsets[None, :]).ravel()
+    vs = (np.arange(v0, v1)[:, None] + offsets[None, :]).ravel()
+    uu, vv = np.meshgrid(us, vs)
+    rays = np.linalg.inv(intrinsic) @ np.stack([uu.ravel(), vv.ravel(), np.ones(uu.size)])
+    normal = rot[:, 2]
+    scale = (normal @ position) / (normal @ rays)
+    local = rot.T @ (rays * scale - position[:, None]) / radius
+    value = pattern(local[0], local[1], code, id_bits).reshape(uu.shape)
+    # mean of the subpixels, the pixels at the edge of the paper keep a part of the background
+    shape = (v1 - v0, supersample, u1 - u0, supersample)
+    covered = ~np.isnan(value)
+    weight = covered.reshape(shape).mean(axis=(1, 3))
+    paper = np.where(covered, value, 0.0).reshape(shape).mean(axis=(1, 3))
+    region = image[v0:v1, u0:u1]
+    region[...] = region * (1 - weight) + paper
+
+
+class SyntheticScene:
+    """
+    Generator of the frames of a camera without distortion (focal length by the horizontal field of view)
+    looking at num_markers moving markers. Everything is given by the seed.
+    size_px is the range of the outer diameters of the markers [px] (the depth is computed from it
+    and from the diameter [m]), speed_px is the max move of a marker per frame [px], max_tilt [deg].
+    blur is sigma of the Gaussian blur [px] (0 = off), noise is sigma of the Gaussian noise (0..255).
+    """
+    def __init__(
+        self, width: int = 640, height: int = 480, num_markers: int = 4, diameter: float = 0.15,
+        id_bits: int = 7, hamming_dist: int = 2, size_px: Tuple[float, float] = (40, 80),
+        speed_px: float = 2.0, max_tilt: float = 30.0, blur: float = 0.7, noise: float = 3.0,
+        fov: float = 60.0, fps: float = 30.0, supersample: int = 3, seed: int = 0
+    ):
+        self.width, self.height = width, height
+        self.diameter = diameter
+        self.id_bits = id_bits
+        self.blur, self.noise = blur, noise
+        self.fps = fps
+        self.supersample = supersample
+        self.seed = seed
+        focal = width / 2 / np.tan(np.radians(fov) / 2)
+        self.intrinsic = np.array([[focal, 0, (width - 1) / 2], [0, focal, (height - 1) / 2], [0, 0, 1]])
+
+        rng = np.random.default_rng(seed)
+        codes = whycon.id_codes(id_bits, hamming_dist)
+        ids = np.flatnonzero(codes >= 0)
+        if len(ids) < num_markers:
+            raise ValueError(f'Only {len(ids)} IDs exist for id_bits={id_bits} and hamming_dist={hamming_dist}.')
+        ids = rng.choice(ids, num_markers, replace=False)
+        self.codes = codes[ids]
+        self.ids = ids + 1
+
+        # each marker moves in its own cell of the grid
+        cols = int(np.ceil(np.sqrt(num_markers * width / height)))
+        rows = int(np.ceil(num_markers / cols))
+        self.cells = [
+            (width * (i % cols) / cols, height * (i // cols) / rows, width / cols, height / rows)
+            for i in range(num_markers)
+        ]
+        cell = min(width / cols, height / rows)
+        max_size = min(size_px[1], cell / (PAPER_RADIUS * 1.5))
+        self.size_px = rng.uniform(min(size_px[0], max_size), max_size, num_markers)
+        self.start = np.array([
+            (x + rng.uniform(0.3, 0.7) * w, y + rng.uniform(0.3, 0.7) * h) for x, y, w, h in self.cells
+        ])
+        self.velocity = rng.uniform(-1, 1, (num_markers, 2)) * speed_px
+        self.yaw = rng.uniform(-np.pi, np.pi, num_markers)
+        self.yaw_speed = rng.uniform(-0.02, 0.02, num_markers)
+        self.tilt = np.radians(rng.uniform(-max_tilt, max_tilt, (num_markers, 2)))
+        self.tilt_phase = rng.uniform(0, 2 * np.pi, num_markers)
+        # smooth background (it is not white as the paper of the markers)
+        yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+        fx, fy, phase = rng.uniform(1, 3), rng.uniform(1, 3), rng.uniform(0, 2 * np.pi)
+        self.background = 0.45 + 0.15 * np.sin(2 * np.pi * (fx * xx / width + fy * yy / height) + phase)
+
+    @property
+    def num_markers(self) -> int:
+        return len(self.ids)
+
+    def _center(self, i: int, index: int) -> np.ndarray:
+        ''' Center of the marker i in the frame [px], it bounces from the edges of its cell. '''
+        x, y, w, h = self.cells[i]
+        margin = self.size_px[i] * PAPER_RADIUS / 2
+        low = np.array([x + margin, y + margin])
+        size = np.maximum(np.array([w, h]) - 2 * margin, 1e-3)
+        position = np.mod(self.start[i] - low + self.velocity[i] * index, 2 * size)
+        return low + np.where(position > size, 2 * size - position, position)
+
+    def truth(self, index: int) -> np.ndarray:
+        ''' Ground truth of the frame. '''
+        records = np.zeros(self.num_markers, dtype=TRUTH_DTYPE)
+        focal = self.intrinsic[0, 0]
+        for i in range(self.num_markers):
+            u, v = self._center(i, index)
+            depth = focal * self.diameter / self.size_px[i]
+            cam = np.array([(u - self.intrinsic[0, 2]) / focal * depth, (v - self.intrinsic[1, 2]) / focal * depth, depth])
+            angle = np.mod(self.yaw[i] + self.yaw_speed[i] * index + np.pi, 2 * np.pi) - np.pi
+            records[i] = (self.ids[i], u, v, cam[2], -cam[0], -cam[1], self.size_px[i], angle)
+        return records
+
+    def _pose(self, i: int, index: int, record) -> Tuple[np.ndarray, np.ndarray]:
+        wobble = np.sin(self.tilt_phase[i] + 0.01 * index)
+        rot = rotation(float(record['angle']), self.tilt[i, 0] * wobble, self.tilt[i, 1] * wobble)
+        position = np.array([-record['y'], -record['z'], record['x']], dtype=float)
+        return rot, position
+
+    @staticmethod
+    def _to_view(view: View, rot: np.ndarray, position: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        ''' Pose of the marker (OpenCV coords of the scene camera) seen by the camera of the view. '''
+        rotation_, center = view
+        m = AXES @ rotation_.T @ AXES.T
+        return m @ rot, m @ position - AXES @ rotation_.T @ center
+
+    def frame(self, index: int, view: Optional[View] = None) -> SyntheticFrame:
+        truth = self.truth(index)
+        image = self.background.copy()
+        for i in range(self.num_markers):
+            rot, position = self._pose(i, index, truth[i])
+            if view is not None:
+                rot, position = self._to_view(view, rot, position)
+            render_marker(
+                image, self.intrinsic, rot, position, self.diameter, int(self.codes[i]), self.id_bits, self.supersample
+            )
+        if self.blur > 0:
+            image = cv2.GaussianBlur(image, (0, 0), self.blur)
+        image *= 255
+        if self.noise > 0:
+            # the noise of each frame is given by the seed and the index
+            rng = np.random.default_rng((self.seed, index))
+            image += rng.normal(0, self.noise, image.shape).astype(np.float32)
+        gray = np.clip(np.rint(image), 0, 255).astype(np.uint8)
+        return SyntheticFrame(index, index / self.fps, cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR), truth)
+
+    def frames(self, num_frames: int, start: int = 0) -> Iterator[SyntheticFrame]:
+        for index in range(start, start + num_frames):
+            yield self.frame(index)
+
+    def write_calibration(self, path: str) -> str:
+        ''' Camera calibration file of the scene (the format of config/camera_calibration.example.yml). '''
+        intrinsic = ', '.join(f'{value:.8f}' for value in self.intrinsic.ravel())
+        with open(path, 'w') as file:
+            file.write(
+                '%YAML:1.0\n---\n'
+                f'camera_id:  "synthetic {self.width}x{self.height}"\n'
+                'intrinsic: !!opencv-matrix\n   rows: 3\n   cols: 3\n   dt: d\n'
+                f'   data: [{intrinsic}]\n'
+                'distortion: !!opencv-matrix\n   rows: 5\n   cols: 1\n   dt: d\n'
+                '   data: [0.0, 0.0, 0.0, 0.0, 0.0]\n'
+            )
+        return path
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Writes synthetic frames with whycon markers and their ground truth.')
+    parser.add_argument('output', help='directory for the images (frame_000000.png, ...), truth.npz and camera.yml')
+    parser.add_argument('--frames', type=int, default=10, help='num of frames')
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--num-markers', type=int, default=4)
+    parser.add_argument('--circle-diam', type=float, default=0.15, help='black circle diameter [m]')
+    parser.add_argument('--id-bits', type=int, default=7, help='num of ID bits')
+    parser.add_argument('--hamming-dist', type=int, default=2, help='hamming distance of ID code')
+    parser.add_argument('--size', type=float, nargs=2, default=(40, 80), help='min and max marker diameter [px]')
+    parser.add_argument('--speed', type=float, default=2.0, help='max move per frame [px]')
+    parser.add_argument('--tilt', type=float, default=30.0, help='max tilt of the markers [deg]')
+    parser.add_argument('--blur', type=float, default=0.7, help='sigma of the blur [px]')
+    parser.add_argument('--noise', type=float, default=3.0, help='sigma of the noise')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    scene = SyntheticScene(
+        args.width, args.height, args.num_markers, args.circle_diam, args.id_bits, args.hamming_dist, args.size,
+        args.speed, args.tilt, args.blur, args.noise, seed=args.seed
+    )
+    os.makedirs(args.output, exist_ok=True)
+    scene.write_calibration(os.path.join(args.output, 'camera.yml'))
+    truth = []
+    for frame in scene.frames(args.frames):
+        cv2.imwrite(os.path.join(args.output, f'frame_{frame.index:06d}.png'), frame.image)
+        truth.append(frame.truth)
+    np.savez_compressed(os.path.join(args.output, 'truth.npz'), truth=np.stack(truth))
+    print(f'{args.frames} frames with IDs {scene.ids.tolist()} written to {args.output}')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,9 +6,15 @@ __description__ = '''
     Camera image source.
     
     Searches for a connected camera (that is not shaded).
+
+    ThreadedWebCamera grabs the frames on its own thread, so the capture does not wait for the detection
+    and the detection gets the newest frame (not a stale one from the driver buffer).
 '''
 import sys
 import os
+import threading
+from time import monotonic
+from typing import Iterator, NamedTuple, Optional
 import cv2
 import numpy as np
 
@@ -66,7 +72,144 @@ class WebCamera:
         self._is_adjusted = self._img_is_ok(img_array)
 
         if self._is_adjusted:
-            timestamp_ms=1000 * img_microseconds
+            timestamp_ms = img_microseconds // 1000
             return img_array, timestamp_ms
         else:
             return img_array, -1
+
+
+class CapturedFrame(NamedTuple):
+    image: np.ndarray       # buffer of the ring, valid until the next latest() (copy it to keep it)
+    timestamp: float        # [s] time.monotonic() when the frame was grabbed
+    index: int              # num of the frame from the start of the capture (gaps are the dropped frames)
+
+
+class ThreadedWebCamera(WebCamera):
+    """
+    Camera input captured on a background thread into a preallocated ring of buffers.
+    latest() returns the newest frame and drops the older ones that were not read (see dropped).
+    The buffer of the returned frame is not overwritten until the next call of latest() (read(), frames()).
+    """
+    def __init__(self, range_of_camera_ids: range = range(10), ring_size: int = 3):
+        super().__init__(range_of_camera_ids)
+        # one buffer for the reader, one being written, the rest are ready frames
+        self._ring_size = max(3, ring_size)
+        self._ring = []
+        self._timestamps = [0.0] * self._ring_size
+        self._indexes = [-1] * self._ring_size
+        self._newest = -1       # slot of the newest ready frame
+        self._reading = -1      # slot owned by the reader
+        self._captured = 0
+        self._delivered = 0
+        self._last_index = -1   # index of the last delivered frame
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def __del__(self):
+        self.stop()
+        super().__del__()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def captured(self) -> int:
+        ''' num of grabbed frames '''
+        return self._captured
+
+    @property
+    def dropped(self) -> int:
+        ''' num of grabbed frames that were replaced by newer ones before they were read '''
+        with self._cond:
+            return self._last_index + 1 - self._delivered
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self) -> bool:
+        ''' Searches the camera (on the calling thread) and starts the capture. Returns False if no camera is found. '''
+        if self._running:
+            return True
+        img, _ = self._adjust_and_return_img()
+        self._is_adjusted = self._img_is_ok(img)
+        if not self._is_adjusted:
+            return False
+        self._ring = [np.empty_like(img) for _ in range(self._ring_size)]
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name='ThreadedWebCamera', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        thread = self._thread
+        if thread is None:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
+
+    def _capture_loop(self):
+        slot = 0
+        while self._running:
+            ok = self._capture.grab()
+            timestamp = monotonic()
+            if ok:
+                buffer = self._ring[slot]
+                ok, img = self._capture.retrieve(buffer)
+                if ok and img is not buffer:
+                    # the driver changed the format, the buffer is replaced (the reader keeps the old one)
+                    self._ring[slot] = img
+            if not ok:
+                break
+            with self._cond:
+                self._timestamps[slot] = timestamp
+                self._indexes[slot] = self._captured
+                self._captured += 1
+                self._newest = slot
+                self._cond.notify_all()
+                # the next buffer is neither the newest frame nor the frame of the reader
+                slot = next(s for s in range(self._ring_size) if s != self._newest and s != self._reading)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def latest(self, timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+        '''
+        Waits for a frame newer than the last returned one and returns the newest frame.
+        Returns None after the timeout [s] or when the capture is stopped.
+        '''
+        if not self._running and self._thread is None and not self.start():
+            return None
+        with self._cond:
+            def is_new():
+                return self._newest >= 0 and self._indexes[self._newest] > self._last_index
+            if not self._cond.wait_for(lambda: is_new() or not self._running, timeout) or not is_new():
+                return None
+            self._reading = self._newest
+            self._last_index = self._indexes[self._reading]
+            self._delivered += 1
+            return CapturedFrame(self._ring[self._reading], self._timestamps[self._reading], self._last_index)
+
+    def frames(self, timeout: Optional[float] = None) -> Iterator[CapturedFrame]:
+        ''' Generator of the newest frames until the capture stops (or no frame comes for the timeout [s]). '''
+        while True:
+            frame = self.latest(timeout)
+            if frame is None:
+                return
+            yield frame
+
+    def read(self) -> (np.ndarray, int):
+        ''' The same interface as WebCamera.read(), the timestamp is time.monotonic() in [ms]. '''
+        frame = self.latest()
+        if frame is None:
+            return None, -1
+        return frame.image, int(1000 * frame.timestamp)
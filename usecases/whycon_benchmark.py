@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+__author__ = "Ivo Marvan"
+__email__ = "ivo@marvan.cz"
+__description__ = '''
+    Reproducible benchmark of WhyCodeDetector on synthetic frames (synthetic_markers.py), no camera is needed.
+
+    Each case (resolution x num of markers x (id_bits, id_samples) x full scan / tracking) renders its frames
+    first (by the seed, the rendering is not measured), then detect_array is timed frame by frame after the warm-up.
+    The results (latency mean/p50/p99/max [ms], throughput [frames/s] and the accuracy against the ground truth:
+    detected markers, correct IDs, false detections, errors of the image and space coordinates) are written as JSON.
+
+        ./whycon_benchmark.py --output bench.json
+        ./whycon_benchmark.py --quick --compare bench.json --tolerance 0.2     # exit code 1 on a regression
+'''
+import os
+import sys
+import json
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Tuple
+import numpy as np
+
+# root of project repository
+THE_FILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.abspath(os.path.join(THE_FILE_DIR, '..'))
+sys.path.append(PROJECT_ROOT)
+
+try:
+    import whycon
+except ModuleNotFoundError:
+    PACKAGE_DIR = os.path.abspath(os.path.join(PROJECT_ROOT, 'bin'))
+    sys.path.append(PACKAGE_DIR)
+    import whycon
+
+from synthetic_markers import SyntheticScene
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+NUM_MARKERS = [1, 4, 16]
+ID_SETTINGS = [(5, 360), (7, 720)]          # (id_bits, id_samples)
+MODES = ['full', 'tracked']
+QUICK = {'resolutions': [(640, 480)], 'num_markers': [4], 'id_settings': [(7, 720)], 'frames': 50, 'warmup': 5}
+
+
+class Case(NamedTuple):
+    width: int
+    height: int
+    num_markers: int
+    id_bits: int
+    id_samples: int
+    mode: str
+
+    @property
+    def name(self) -> str:
+        return f'{self.width}x{self.height}/{self.num_markers}m/{self.id_bits}b{self.id_samples}s/{self.mode}'
+
+
+def cases(resolutions, num_markers, id_settings, modes) -> List[Case]:
+    return [
+        Case(width, height, n, id_bits, id_samples, mode)
+        for width, height in resolutions for n in num_markers for id_bits, id_samples in id_settings for mode in modes
+    ]
+
+
+def match(truth: np.ndarray, records: np.ndarray) -> List[Tuple[int, int]]:
+    ''' Pairs (truth, record) of the nearest centers in the image, closer than the half of the marker diameter. '''
+    records = records[records['valid'] != 0]
+    if len(truth) == 0 or len(records) == 0:
+        return []
+    du = truth['u'][:, None] - records['u'][None, :]
+    dv = truth['v'][:, None] - records['v'][None, :]
+    distance = np.hypot(du, dv)
+    pairs = []
+    for flat in np.argsort(distance, axis=None):
+        i, j = np.unravel_index(flat, distance.shape)
+        if distance[i, j] > truth['diameter'][i] / 2:
+            break
+        if all(i != p[0] and j != p[1] for p in pairs):
+            pairs.append((int(i), int(j)))
+    return pairs
+
+
+class Accuracy:
+    ''' Accumulated accuracy of the detections against the ground truth. '''
+    def __init__(self):
+        self.markers = 0
+        self.detected = 0
+        self.id_correct = 0
+        self.false = 0
+        self.pixel_errors = []
+        self.space_errors = []
+
+    def add(self, truth: np.ndarray, records: np.ndarray):
+        valid = records[records['valid'] != 0]
+        pairs = match(truth, valid)
+        self.markers += len(truth)
+        self.detected += len(pairs)
+        self.false += len(valid) - len(pairs)
+        for i, j in pairs:
+            self.id_correct += int(valid['ID'][j] == truth['ID'][i])
+            self.pixel_errors.append(np.hypot(valid['u'][j] - truth['u'][i], valid['v'][j] - truth['v'][i]))
+            self.space_errors.append(np.sqrt(sum((valid[c][j] - truth[c][i]) ** 2 for c in 'xyz')))
+
+    def result(self) -> Dict[str, float]:
+        def stats(errors, scale=1.0):
+            if not errors:
+                return None, None
+            errors = np.asarray(errors) * scale
+            return float(np.mean(errors)), float(np.percentile(errors, 95))
+        pixel_mean, pixel_p95 = stats(self.pixel_errors)
+        space_mean, space_p95 = stats(self.space_errors, 1000)
+        return {
+            'markers': self.markers,
+            'detection_rate': self.detected / self.markers if self.markers else 0.0,
+            'id_accuracy': self.id_correct / self.detected if self.detected else 0.0,
+            'false_detections': self.false,
+            'pixel_error_mean': pixel_mean,
+            'pixel_error_p95': pixel_p95,
+            'space_error_mean_mm': space_mean,
+            'space_error_p95_mm': space_p95,
+        }
+
+
+def create_detector(case: Case, args: argparse.Namespace, calibration_path: str):
+    detector = whycon.WhyCodeDetector(
+        calibration_path,
+        os.path.join(PROJECT_ROOT, 'config', 'space_calibration.example.yml'),
+        args.circle_diam,
+        case.num_markers,
+        whycon.SpaceTransofmType.T_NONE,
+        case.id_bits,
+        case.id_samples,
+        args.hamming_dist,
+        True,       # identify
+        False,      # draw-free detection
+        False,
+        False
+    )
+    if args.id_table:
+        detector.set_id_table(True)
+    detector.set_tracking(case.mode == 'tracked')
+    if args.max_latency_ms > 0:
+        detector.set_latency_budget(args.max_latency_ms)
+    return detector
+
+
+def run_case(case: Case, args: argparse.Namespace, directory: str) -> dict:
+    scene = SyntheticScene(
+        case.width, case.height, case.num_markers, args.circle_diam, case.id_bits, args.hamming_dist,
+        speed_px=args.speed, blur=args.blur, noise=args.noise, seed=args.seed
+    )
+    calibration_path = scene.write_calibration(os.path.join(directory, f'camera_{case.width}x{case.height}.yml'))
+    frames = list(scene.frames(args.warmup + args.frames))
+    detector = create_detector(case, args, calibration_path)
+    accuracy = Accuracy()
+    latencies = np.zeros(args.frames)
+    for frame in frames[:args.warmup]:
+        detector.detect_array(frame.image)
+    for k, frame in enumerate(frames[args.warmup:]):
+        start = perf_counter()
+        records = detector.detect_array(frame.image)
+        latencies[k] = perf_counter() - start
+        accuracy.add(frame.truth, records)
+    latencies *= 1000
+    result = {
+        'name': case.name,
+        'case': case._asdict(),
+        'frames': args.frames,
+        'latency_ms': {
+            'mean': float(latencies.mean()),
+            'p50': float(np.percentile(latencies, 50)),
+            'p99': float(np.percentile(latencies, 99)),
+            'max': float(latencies.max()),
+        },
+        'throughput_fps': float(1000 * args.frames / latencies.sum()),
+        'accuracy': accuracy.result(),
+    }
+    if args.max_latency_ms > 0:
+        result['latency_budget'] = detector.latency_report()
+    return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float, accuracy_tolerance: float) -> List[str]:
+    ''' Regressions of the results against the baseline (only the cases of both are compared). '''
+    regressions = []
+    previous = {case['name']: case for case in baseline['cases']}
+    for case in results['cases']:
+        base = previous.get(case['name'])
+        if base is None:
+            continue
+        name = case['name']
+        for key in ('p50', 'p99'):
+            if case['latency_ms'][key] > base['latency_ms'][key] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: latency {key} {case["latency_ms"][key]:.3f} ms > {base["latency_ms"][key]:.3f} ms'
+                )
+        for key in ('detection_rate', 'id_accuracy'):
+            if case['accuracy'][key] < base['accuracy'][key] - accuracy_tolerance:
+                regressions.append(f'{name}: {key} {case["accuracy"][key]:.3f} < {base["accuracy"][key]:.3f}')
+    return regressions
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark of the whycon detector on synthetic frames.')
+    parser.add_argument('--output', help='JSON file with the results (default: stdout)')
+    parser.add_argument('--quick', action='store_true', help='one small case (a smoke test)')
+    parser.add_argument('--resolutions', nargs='+', help='WIDTHxHEIGHT ...')
+    parser.add_argument('--num-markers', type=int, nargs='+', help='num of markers in the frames')
+    parser.add_argument('--id-settings', nargs='+', help='ID_BITS:ID_SAMPLES ...')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES, help='full scan and/or tracking')
+    parser.add_argument('--frames', type=int, default=200, help='num of measured frames of each case')
+    parser.add_argument('--warmup', type=int, default=10, help='num of detected frames before the measurement')
+    parser.add_argument('--circle-diam', type=float, default=0.15, help='black circle diameter [m]')
+    parser.add_argument('--hamming-dist', type=int, default=2, help='hamming distance of ID code')
+    parser.add_argument('--id-table', action='store_true', help='decode IDs with the cached table (set_id_table)')
+    parser.add_argument('--max-latency-ms', type=float, default=0.0, help='latency budget (set_latency_budget)')
+    parser.add_argument('--speed', type=float, default=2.0, help='max move of a marker per frame [px]')
+    parser.add_argument('--blur', type=float, default=0.7, help='sigma of the blur [px]')
+    parser.add_argument('--noise', type=float, default=3.0, help='sigma of the noise')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', help='baseline JSON, exit code 1 when a case is slower or less accurate')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative increase of the latency')
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.02, help='allowed decrease of the rates')
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.resolutions = args.resolutions or [f'{w}x{h}' for w, h in QUICK['resolutions']]
+        args.num_markers = args.num_markers or QUICK['num_markers']
+        args.id_settings = args.id_settings or [f'{b}:{s}' for b, s in QUICK['id_settings']]
+        args.frames, args.warmup = min(args.frames, QUICK['frames']), min(args.warmup, QUICK['warmup'])
+    args.resolutions = (
+        [tuple(int(v) for v in r.lower().split('x')) for r in args.resolutions] if args.resolutions else RESOLUTIONS
+    )
+    args.num_markers = args.num_markers or NUM_MARKERS
+    args.id_settings = (
+        [tuple(int(v) for v in s.split(':')) for s in args.id_settings] if args.id_settings else ID_SETTINGS
+    )
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'whycon': os.path.realpath(whycon.__file__),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'args': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        },
+        'cases': [],
+    }
+    with tempfile.TemporaryDirectory(prefix='whycon_benchmark_') as directory:
+        for case in cases(args.resolutions, args.num_markers, args.id_settings, args.modes):
+            result = run_case(case, args, directory)
+            results['cases'].append(result)
+            latency, accuracy = result['latency_ms'], result['accuracy']
+            print(
+                f'{case.name:40s} p50 {latency["p50"]:8.3f} ms  p99 {latency["p99"]:8.3f} ms  '
+                f'{result["throughput_fps"]:8.1f} fps  detected {accuracy["detection_rate"]:.3f}  '
+                f'IDs {accuracy["id_accuracy"]:.3f}  false {accuracy["false_detections"]}',
+                file=sys.stderr
+            )
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance, args.accuracy_tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
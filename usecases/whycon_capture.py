@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+__author__ = "Ivo Marvan"
+__email__ = "ivo@marvan.cz"
+__description__ = '''
+    Record / replay of raw frames for deterministic re-runs of the detection at the speed of the detector.
+
+    The capture file is a header (HEADER_SIZE bytes) and the records of a fixed size (stride), each record is
+    the capture timestamp, the index of the frame and the raw image (aligned to 64 bytes):
+
+        header:  magic 'WCAP' (u4), version (u4), height, width, channels (u4), image dtype (S8),
+                 stride (u8), count (u8)          - little endian, the rest of the header is zeros
+        records: timestamp [s] (f8), index (i8), padding, image (height x width x channels)    - count times
+
+    CaptureRecorder appends the records and updates count in the header (a cut file keeps its complete records),
+    ReplaySource maps the file (np.memmap) and gives the images as views of the mapping, nothing is decoded,
+    copied or read in advance, so the sessions of any size can be replayed:
+
+        with CaptureRecorder('session.wcap') as recorder:
+            for frame in camera.frames():
+                recorder.append(frame.image, frame.timestamp)
+
+        replay = ReplaySource('session.wcap')
+        for frame in replay.frames(loop=True):          # web_camera.CapturedFrame, whycon_stream source too
+            detector.detect(frame.image)
+
+        ./whycon_capture.py record recording.mp4 session.wcap     # video file, image directory or camera (0, 1, ...)
+        ./whycon_capture.py info session.wcap
+'''
+import os
+import sys
+import argparse
+from time import monotonic
+from typing import Iterator, Optional
+import numpy as np
+
+from web_camera import CapturedFrame
+
+MAGIC = 0x50414357      # 'WCAP'
+VERSION = 1
+HEADER_SIZE = 4096      # the records start at the page boundary
+IMAGE_OFFSET = 64       # of the image in the record
+
+HEADER_DTYPE = np.dtype([
+    ('magic', '<u4'), ('version', '<u4'), ('height', '<u4'), ('width', '<u4'), ('channels', '<u4'),
+    ('dtype', 'S8'), ('stride', '<u8'), ('count', '<u8')
+])
+
+
+def record_dtype(height: int, width: int, channels: int, dtype='u1') -> np.dtype:
+    ''' dtype of one record, the stride is a multiple of 64 bytes. '''
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    image = np.dtype((np.dtype(dtype), shape))
+    stride = -(-(IMAGE_OFFSET + image.itemsize) // 64) * 64
+    return np.dtype({
+        'names': ['timestamp', 'index', 'image'],
+        'formats': ['<f8', '<i8', image],
+        'offsets': [0, 8, IMAGE_OFFSET],
+        'itemsize': stride
+    })
+
+
+def read_header(path: str) -> np.ndarray:
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) == 0 or header[0]['magic'] != MAGIC or header[0]['version'] != VERSION:
+        raise RuntimeError(f'"{path}" is not a whycon capture file (version {VERSION}).')
+    return header[0]
+
+
+class CaptureRecorder:
+    """
+    Appends the frames (all of the same shape and dtype, given by the first one) to a new capture file.
+    The count in the header is updated every flush_every frames and by close().
+    """
+    def __init__(self, path: str, flush_every: int = 30):
+        self.path = path
+        self.count = 0
+        self._flush_every = max(1, flush_every)
+        self._file = open(path, 'wb')
+        self._dtype = None
+        self._record = None
+
+    def _write_header(self):
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        if self._dtype is not None:
+            shape = self._dtype['image'].shape
+            header[0] = (
+                MAGIC, VERSION, shape[0], shape[1], shape[2] if len(shape) > 2 else 1,
+                self._dtype['image'].base.str.encode(), self._dtype.itemsize, self.count
+            )
+        else:
+            header['magic'], header['version'] = MAGIC, VERSION
+        position = self._file.tell()
+        self._file.seek(0)
+        self._file.write(header.tobytes().ljust(HEADER_SIZE, b'\0'))
+        self._file.seek(max(position, HEADER_SIZE))
+
+    def append(self, image: np.ndarray, timestamp: Optional[float] = None, index: Optional[int] = None) -> int:
+        ''' Appends the frame (timestamp [s] default time.monotonic(), index default its num), returns its num. '''
+        if self._dtype is None:
+            height, width = image.shape[:2]
+            self._dtype = record_dtype(height, width, image.shape[2] if image.ndim > 2 else 1, image.dtype)
+            self._record = np.zeros(1, dtype=self._dtype)
+            self._write_header()
+        elif image.shape != self._dtype['image'].shape or image.dtype != self._dtype['image'].base:
+            raise ValueError(f'All frames should have shape {self._dtype["image"].shape} and dtype {self._dtype["image"].base}.')
+        record = self._record[0]
+        record['timestamp'] = monotonic() if timestamp is None else timestamp
+        record['index'] = self.count if index is None else index
+        record['image'] = image
+        self._file.write(self._record.data)
+        self.count += 1
+        if self.count % self._flush_every == 0:
+            self.flush()
+        return self.count - 1
+
+    def flush(self):
+        self._write_header()
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._write_header()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ReplaySource:
+    """
+    Frames of a capture file as views of its read-only mapping, the file is never changed. The images can be given
+    to a draw-free detector (draw_coords and draw_segments off), the drawing needs a copy (frame.image.copy()).
+    The records written after the opening are not seen (open it again).
+    """
+    def __init__(self, path: str):
+        self.path = path
+        header = read_header(path)
+        self.height, self.width, self.channels = int(header['height']), int(header['width']), int(header['channels'])
+        self.dtype = record_dtype(self.height, self.width, self.channels, header['dtype'].decode())
+        if self.dtype.itemsize != int(header['stride']):
+            raise RuntimeError(f'Stride of "{path}" is {int(header["stride"])}, expected {self.dtype.itemsize}.')
+        # the records of a cut file behind its last complete record are dropped
+        count = min(int(header['count']), (os.path.getsize(path) - HEADER_SIZE) // self.dtype.itemsize)
+        if count > 0:
+            self._records = np.memmap(path, dtype=self.dtype, mode='r', offset=HEADER_SIZE, shape=(count,))
+        else:
+            self._records = np.zeros(0, dtype=self.dtype)
+        self.images = self._records['image']          # shape=(count, height, width[, channels]), a view
+        self.timestamps = self._records['timestamp']
+        self.indexes = self._records['index']
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, i: int) -> CapturedFrame:
+        return CapturedFrame(self.images[i], float(self.timestamps[i]), int(self.indexes[i]))
+
+    def frames(self, start: int = 0, stop: Optional[int] = None, loop: bool = False) -> Iterator[CapturedFrame]:
+        ''' Generator of the frames start <= i < stop (None = to the end), loop repeats them for ever. '''
+        stop = len(self) if stop is None else min(stop, len(self))
+        while True:
+            for i in range(start, stop):
+                yield self[i]
+            if not loop or start >= stop:
+                return
+
+    def __iter__(self):
+        return self.frames()
+
+    def close(self):
+        self.images = self.timestamps = self.indexes = None
+        self._records = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def record(source: str, path: str, max_frames: int = 0, gray: bool = False) -> int:
+    ''' Records a video file, a directory of images or a camera (its number) to the capture file. '''
+    import cv2
+    from whycon_process import FrameSource
+    if source.isdigit():
+        def frames():
+            capture = cv2.VideoCapture(int(source))
+            try:
+                index = 0
+                while capture.isOpened():
+                    ok, image = capture.read()
+                    if not ok:
+                        return
+                    yield index, monotonic(), image
+                    index += 1
+            finally:
+                capture.release()
+        items = frames()
+    else:
+        items = FrameSource(source).frames(0)
+    with CaptureRecorder(path) as recorder:
+        for index, timestamp, image in items:
+            if gray:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            recorder.append(image, timestamp, index)
+            if recorder.count == max_frames:
+                break
+        return recorder.count
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Record / replay of raw frames for the whycon detector.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help='records frames to a capture file')
+    record_parser.add_argument('source', help='video file, directory of images or camera number')
+    record_parser.add_argument('output', help='capture file')
+    record_parser.add_argument('--max-frames', type=int, default=0, help='0 = all (camera: until Ctrl+C)')
+    record_parser.add_argument('--gray', action='store_true', help='records the luminance only')
+    info_parser = commands.add_parser('info', help='prints the properties of a capture file')
+    info_parser.add_argument('input', help='capture file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        try:
+            count = record(args.source, args.output, args.max_frames, args.gray)
+        except KeyboardInterrupt:
+            count = len(ReplaySource(args.output))
+        print(f'{count} frames written to {args.output}', file=sys.stderr)
+        return 0
+    with ReplaySource(args.input) as replay:
+        print(f'{args.input}: {len(replay)} frames {replay.width}x{replay.height}x{replay.channels} '
+              f'{replay.dtype["image"].base}, stride {replay.dtype.itemsize} B')
+        if len(replay):
+            duration = float(replay.timestamps[-1] - replay.timestamps[0])
+            print(f'timestamps {replay.timestamps[0]:.3f} .. {replay.timestamps[-1]:.3f} s ({duration:.3f} s)')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+__author__ = "Ivo Marvan"
+__email__ = "ivo@marvan.cz"
+__description__ = '''
+    whycon-process: offline detection of markers in a video file or in a directory of images.
+
+    The frames are split into chunks and each chunk is detected in its own worker process (one detector
+    per process, a pickled copy of the detector built from the calibration files). Each chunk starts with
+    a warm-up (the frames before the chunk), so the tracker and the thresholds of the core are settled at its first frame.
+    The poses of the found markers are written to a columnar file, one row per marker:
+    frame, timestamp and the fields of whycon.marker_dtype (.npz, .csv or .parquet with pyarrow).
+
+        ./whycon_process.py recording.mp4 poses.npz --camera-calib camera.yml --workers 8
+'''
+import os
+import sys
+import csv
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+import cv2
+import numpy as np
+
+# root of project repository
+THE_FILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.abspath(os.path.join(THE_FILE_DIR, '..'))
+sys.path.append(PROJECT_ROOT)
+
+try:
+    import whycon
+except ModuleNotFoundError:
+    PACKAGE_DIR = os.path.abspath(os.path.join(PROJECT_ROOT, 'bin'))
+    sys.path.append(PACKAGE_DIR)
+    import whycon
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.pgm', '.ppm')
+TRANS_TYPES = {'none': 'T_NONE', '2d': 'T_2D', '3d': 'T_3D', '4d': 'T_4D', 'inv': 'T_INV'}
+
+
+class FrameSource:
+    """
+    Frames of a video file or of the images of a directory (sorted by name) in the given range.
+    Timestamps [s] are the positions in the video (or index / fps for the images).
+    """
+    def __init__(self, path: str, fps: float = 0.0):
+        self.path = path
+        if os.path.isdir(path):
+            self.images = sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            self.fps = fps or 1.0
+            self.num_frames = len(self.images)
+        else:
+            self.images = None
+            capture = cv2.VideoCapture(path)
+            if not capture.isOpened():
+                raise RuntimeError(f'Can not open video "{path}".')
+            self.fps = fps or capture.get(cv2.CAP_PROP_FPS) or 1.0
+            # the count is only an estimate for some containers, the last chunk reads to the end
+            self.num_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            capture.release()
+
+    def frames(self, start: int, stop: int = None):
+        ''' Generator of (index, timestamp, image) for start <= index < stop (None = to the end). '''
+        if self.images is not None:
+            for index in range(start, len(self.images) if stop is None else min(stop, len(self.images))):
+                image = cv2.imread(self.images[index], cv2.IMREAD_COLOR)
+                if image is None:
+                    raise RuntimeError(f'Can not read image "{self.images[index]}".')
+                yield index, index / self.fps, image
+            return
+        capture = cv2.VideoCapture(self.path)
+        try:
+            if start > 0:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+            index = start
+            while stop is None or index < stop:
+                ok, image = capture.read()
+                if not ok:
+                    return
+                position_ms = capture.get(cv2.CAP_PROP_POS_MSEC)
+                yield index, position_ms / 1000 if position_ms > 0 else index / self.fps, image
+                index += 1
+        finally:
+            capture.release()
+
+
+def chunk_ranges(num_frames: int, chunk_frames: int, workers: int):
+    ''' (start, stop) of the chunks, there are at least as many chunks as workers; the last one has stop = None. '''
+    if num_frames <= 0:
+        return [(0, None)]
+    chunk_frames = max(1, min(chunk_frames, -(-num_frames // workers)))
+    starts = list(range(0, num_frames, chunk_frames))
+    return [(start, start + chunk_frames) for start in starts[:-1]] + [(starts[-1], None)]
+
+
+# --- worker process ---------------------------------------------------------------------------------------------------
+_detector = None
+
+
+def _init_worker(detector):
+    global _detector
+    _detector = detector    # unpickled copy, the calibration files are not read again
+
+
+def create_detector(args: argparse.Namespace):
+    detector = whycon.WhyCodeDetector(
+        args.camera_calib,
+        args.space_calib,
+        args.circle_diam,
+        args.num_markers,
+        getattr(whycon.SpaceTransofmType, TRANS_TYPES[args.trans_type]),
+        args.id_bits,
+        args.id_samples,
+        args.hamming_dist,
+        not args.no_identify,
+        False,      # draw-free detection
+        False,
+        False,
+        args.pyramid_levels
+    )
+    if args.id_table:
+        detector.set_id_table(True)
+    return detector
+
+
+def output_dtype() -> np.dtype:
+    return np.dtype([('frame', '<i8'), ('timestamp', '<f8')] + whycon.marker_dtype.descr)
+
+
+def process_chunk(args: argparse.Namespace, start: int, stop: int) -> np.ndarray:
+    ''' Detects the markers in the frames start <= index < stop (after the warm-up), returns the output rows. '''
+    detector = _detector
+    # the tracks of the previous chunk of this process are forgotten, the warm-up finds them again
+    detector.set_tracking(args.tracking)
+    source = FrameSource(args.input, args.fps)
+    rows = []
+    for index, timestamp, image in source.frames(max(0, start - args.warmup), stop):
+        if args.gray:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        records = detector.detect_array(image)
+        if index < start or len(records) == 0:
+            continue
+        chunk = np.zeros(len(records), dtype=output_dtype())
+        chunk['frame'] = index
+        chunk['timestamp'] = timestamp
+        for name in whycon.marker_dtype.names:
+            chunk[name] = records[name]
+        rows.append(chunk)
+    return np.concatenate(rows) if rows else np.zeros(0, dtype=output_dtype())
+
+
+# --- output -----------------------------------------------------------------------------------------------------------
+class CsvWriter:
+    def __init__(self, path: str):
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(output_dtype().names)
+
+    def write(self, rows: np.ndarray):
+        self._writer.writerows(rows.tolist())
+
+    def close(self):
+        self._file.close()
+
+
+class ColumnsWriter:
+    ''' npz or parquet, the columns are written at the end '''
+    def __init__(self, path: str):
+        self._path = path
+        self._chunks = []
+        if path.endswith('.parquet'):
+            import pyarrow  # fails early, before the detection
+
+    def write(self, rows: np.ndarray):
+        self._chunks.append(rows)
+
+    def close(self):
+        rows = np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=output_dtype())
+        columns = {name: rows[name] for name in rows.dtype.names}
+        if self._path.endswith('.parquet'):
+            import pyarrow
+            import pyarrow.parquet
+            pyarrow.parquet.write_table(pyarrow.table(columns), self._path)
+        else:
+            np.savez_compressed(self._path, **columns)
+
+
+def create_writer(path: str):
+    if path.endswith('.csv'):
+        return CsvWriter(path)
+    if path.endswith('.npz') or path.endswith('.parquet'):
+        return ColumnsWriter(path)
+    raise ValueError(f'Unknown output format of "{path}", use .npz, .csv or .parquet.')
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='whycon-process', description='Offline detection of whycon markers in a video or in a directory of images.'
+    )
+    parser.add_argument('input', help='video file or directory of images')
+    parser.add_argument('output', help='output file (.npz, .csv or .parquet), one row per found marker')
+    parser.add_argument(
+        '--camera-calib', default=os.path.join(PROJECT_ROOT, 'config', 'camera_calibration.example.yml'),
+        help='camera calibration file'
+    )
+    parser.add_argument(
+        '--space-calib', default=os.path.join(PROJECT_ROOT, 'config', 'space_calibration.example.yml'),
+        help='space calibration file'
+    )
+    parser.add_argument('--circle-diam', type=float, default=0.15, help='black circle diameter [m]')
+    parser.add_argument('--num-markers', type=int, default=4, help='num of markers to track')
+    parser.add_argument('--trans-type', choices=sorted(TRANS_TYPES), default='none', help='space transformation')
+    parser.add_argument('--id-bits', type=int, default=7, help='num of ID bits')
+    parser.add_argument('--id-samples', type=int, default=720, help='num of samples to identify ID')
+    parser.add_argument('--hamming-dist', type=int, default=2, help='hamming distance of ID code')
+    parser.add_argument('--no-identify', action='store_true', help='do not identify IDs')
+    parser.add_argument('--id-table', action='store_true', help='decode IDs with the cached table (set_id_table)')
+    parser.add_argument('--pyramid-levels', type=int, default=0, help='coarse to fine search (0 = off)')
+    parser.add_argument('--tracking', action='store_true', help='search tracked markers in windows (set_tracking)')
+    parser.add_argument('--gray', action='store_true', help='detect in the luminance (faster copies)')
+    parser.add_argument('--fps', type=float, default=0.0, help='frame rate for timestamps (0 = from the video, 1 for images)')
+    parser.add_argument('--workers', type=int, default=cpu_count(), help='num of worker processes')
+    parser.add_argument('--chunk-seconds', type=float, default=60.0, help='length of a chunk [s]')
+    parser.add_argument('--warmup', type=int, default=30, help='num of frames detected before each chunk and dropped')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    args.input = os.path.abspath(args.input)
+    source = FrameSource(args.input, args.fps)
+    args.fps = source.fps
+    workers = max(1, args.workers)
+    chunks = chunk_ranges(source.num_frames, int(args.chunk_seconds * source.fps), workers)
+    print(f'{source.num_frames} frames in {len(chunks)} chunks on {workers} processes', file=sys.stderr)
+
+    detector = create_detector(args)    # the calibration files are checked before the workers start
+    writer = create_writer(args.output)
+    num_rows = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(detector,)) as executor:
+            futures = [executor.submit(process_chunk, args, start, stop) for start, stop in chunks]
+            # the chunks are written in order
+            for i, future in enumerate(futures):
+                rows = future.result()
+                writer.write(rows)
+                num_rows += len(rows)
+                print(f'chunk {i + 1}/{len(chunks)}: {len(rows)} markers', file=sys.stderr)
+    finally:
+        writer.close()
+    print(f'{num_rows} markers written to {args.output}', file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+__author__ = "Ivo Marvan"
+__email__ = "ivo@marvan.cz"
+__description__ = '''
+    Ring of detection results in shared memory (multiprocessing.shared_memory) for consumers in other processes.
+
+    The detector process writes the records of the found markers (whycon.marker_dtype) with the frame metadata
+    into a fixed number of slots, the readers poll it without locks and get NumPy views of the slots:
+
+        ring = ResultRing.create('whycon_results', slots=64, max_markers=8)     # detector process
+        ring.detect(detector, img_array, frame=i, timestamp=t)                  # detect_into the slot, no copy
+
+        ring = ResultRing.attach('whycon_results')                              # other process
+        for result in ring.next(10):
+            print(result.seq, result.timestamp, result.markers['ID'])
+
+    Each slot is guarded by its sequence number (seqlock): it is 0 while the slot is written and the sequence
+    number of the frame when it is complete. A reader checks it before and after reading, a view (copy=False)
+    stays valid until the writer goes round the ring (see ResultRing.is_valid).
+'''
+import os
+import sys
+from time import monotonic, sleep
+from typing import List, NamedTuple, Optional
+import numpy as np
+from multiprocessing import shared_memory
+
+# root of project repository
+THE_FILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_ROOT = os.path.abspath(os.path.join(THE_FILE_DIR, '..'))
+sys.path.append(PROJECT_ROOT)
+
+try:
+    import whycon
+except ModuleNotFoundError:
+    PACKAGE_DIR = os.path.abspath(os.path.join(PROJECT_ROOT, 'bin'))
+    sys.path.append(PACKAGE_DIR)
+    import whycon
+
+MAGIC = 0x57484352      # 'WHCR'
+VERSION = 1
+
+HEADER_DTYPE = np.dtype([
+    ('magic', '<u4'), ('version', '<u4'), ('slots', '<u4'), ('max_markers', '<u4'), ('record_size', '<u4'),
+    ('reserved', '<u4'), ('write_seq', '<u8')   # sequence number of the last complete frame (0 = none)
+])
+FRAME_DTYPE = np.dtype([
+    ('seq', '<u8'),         # 0 = being written
+    ('frame', '<i8'),       # frame id given by the writer
+    ('timestamp', '<f8'),   # [s] capture timestamp given by the writer
+    ('num_markers', '<u4'),
+    ('reserved', '<u4')
+])
+
+
+_created = set()        # names of the rings created by this process
+
+
+class RingFrame(NamedTuple):
+    seq: int                # sequence number in the ring (1, 2, ...)
+    frame: int
+    timestamp: float
+    markers: np.ndarray     # records with dtype whycon.marker_dtype
+
+
+class ResultRing:
+    """
+    Shared memory: header, frame metadata of all slots and then the marker records of all slots.
+    create() makes the writer (the owner, close(unlink=True) removes the memory), attach() a reader.
+    """
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        if self.header['magic'] != MAGIC or self.header['version'] != VERSION:
+            raise RuntimeError(f'Shared memory "{shm.name}" is not a ring of whycon results (version {VERSION}).')
+        if self.header['record_size'] != whycon.marker_dtype.itemsize:
+            raise RuntimeError('The ring was created with other whycon.marker_dtype.')
+        self.slots = int(self.header['slots'])
+        self.max_markers = int(self.header['max_markers'])
+        offset = HEADER_DTYPE.itemsize
+        self._frames = np.ndarray((self.slots,), dtype=FRAME_DTYPE, buffer=shm.buf, offset=offset)
+        offset += self._frames.nbytes
+        self._records = np.ndarray(
+            (self.slots, self.max_markers), dtype=whycon.marker_dtype, buffer=shm.buf, offset=offset
+        )
+        self._read_seq = 0      # the last frame returned by next()
+        self.lost = 0           # frames overwritten before next() read them
+
+    @classmethod
+    def create(cls, name: Optional[str] = None, slots: int = 64, max_markers: int = 16) -> 'ResultRing':
+        size = HEADER_DTYPE.itemsize + slots * (FRAME_DTYPE.itemsize + max_markers * whycon.marker_dtype.itemsize)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=shm.buf)
+        header[()] = (MAGIC, VERSION, slots, max_markers, whycon.marker_dtype.itemsize, 0, 0)
+        del header
+        _created.add(shm._name)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'ResultRing':
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # before python 3.13 the resource tracker of the reader would remove the memory at its exit
+            from multiprocessing import resource_tracker
+            shm = shared_memory.SharedMemory(name=name)
+            if shm._name not in _created:
+                resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def write_seq(self) -> int:
+        return int(self.header['write_seq'])
+
+    def close(self, unlink: Optional[bool] = None):
+        ''' Releases the memory of this process, the owner also removes it (unlink=None). '''
+        self.header = self._frames = self._records = None
+        self._shm.close()
+        if self._owner if unlink is None else unlink:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # --- writer -------------------------------------------------------------------------------------------------------
+    def begin(self, frame: int = 0, timestamp: float = 0.0) -> np.ndarray:
+        ''' Starts writing the next slot, returns its records to be filled (by detector.detect_into). '''
+        seq = self.write_seq + 1
+        meta = self._frames[(seq - 1) % self.slots]
+        meta['seq'] = 0
+        meta['frame'] = frame
+        meta['timestamp'] = timestamp
+        return self._records[(seq - 1) % self.slots]
+
+    def commit(self, num_markers: int) -> int:
+        ''' Publishes the slot started by begin(), returns its sequence number. '''
+        seq = self.write_seq + 1
+        meta = self._frames[(seq - 1) % self.slots]
+        meta['num_markers'] = min(num_markers, self.max_markers)
+        meta['seq'] = seq
+        self.header['write_seq'] = seq
+        return seq
+
+    def write(self, records: np.ndarray, frame: int = 0, timestamp: float = 0.0) -> int:
+        ''' Writes the records (whycon.marker_dtype, from detector.detect_array), returns the sequence number. '''
+        slot = self.begin(frame, timestamp)
+        num_markers = min(len(records), self.max_markers)
+        slot[:num_markers] = records[:num_markers]
+        return self.commit(num_markers)
+
+    def detect(self, detector, image: np.ndarray, frame: int = 0, timestamp: Optional[float] = None) -> int:
+        ''' Detects the markers directly into the next slot, returns the sequence number. '''
+        slot = self.begin(frame, monotonic() if timestamp is None else timestamp)
+        return self.commit(detector.detect_into(image, slot))
+
+    # --- reader -------------------------------------------------------------------------------------------------------
+    def is_valid(self, result: RingFrame) -> bool:
+        ''' Is the view of the result (copy=False) still not overwritten? '''
+        return int(self._frames[(result.seq - 1) % self.slots]['seq']) == result.seq
+
+    def _read(self, seq: int, copy: bool) -> Optional[RingFrame]:
+        meta = self._frames[(seq - 1) % self.slots]
+        if int(meta['seq']) != seq:
+            return None
+        frame, timestamp, num_markers = int(meta['frame']), float(meta['timestamp']), int(meta['num_markers'])
+        markers = self._records[(seq - 1) % self.slots][:num_markers]
+        if copy:
+            markers = markers.copy()
+        if int(meta['seq']) != seq:     # overwritten while it was read
+            return None
+        return RingFrame(seq, frame, timestamp, markers)
+
+    def latest(self, copy: bool = True) -> Optional[RingFrame]:
+        ''' The last complete frame (None if nothing was written yet). '''
+        while True:
+            seq = self.write_seq
+            if seq == 0:
+                return None
+            result = self._read(seq, copy)
+            if result is not None:
+                return result
+
+    def next(self, max_frames: int = 1, copy: bool = True) -> List[RingFrame]:
+        '''
+        Up to max_frames frames written after the frames returned by the last call (in order, without waiting).
+        Frames overwritten before they were read are counted in lost.
+        '''
+        results = []
+        while len(results) < max_frames:
+            write_seq = self.write_seq
+            if self._read_seq >= write_seq:
+                break
+            # the oldest frame still in the ring (the writer may be writing the one after write_seq)
+            oldest = max(1, write_seq - self.slots + 2)
+            if self._read_seq + 1 < oldest:
+                self.lost += oldest - self._read_seq - 1
+                self._read_seq = oldest - 1
+            result = self._read(self._read_seq + 1, copy)
+            if result is None:
+                continue    # overwritten meanwhile, the oldest is moved
+            results.append(result)
+            self._read_seq = result.seq
+        return results
+
+    def poll(self, timeout: Optional[float] = None, interval: float = 0.0005, copy: bool = True) -> Optional[RingFrame]:
+        ''' Waits (by polling) for the next frame, None after the timeout [s]. '''
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            results = self.next(1, copy)
+            if results:
+                return results[0]
+            if deadline is not None and monotonic() >= deadline:
+                return None
+            sleep(interval)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+__author__ = "Ivo Marvan"
+__email__ = "ivo@marvan.cz"
+__description__ = '''
+    asyncio pipeline: source -> detect -> consumer.
+
+        async for result in stream(camera.frames(), detector):
+            print(result.timestamp, result.markers)
+
+    Frames are read from the source (sync or async iterable) and detected on worker threads
+    (the detector releases the GIL), so the event loop is never blocked. At most max_in_flight frames
+    are read and not yet delivered. When the detection is slower than the source, the policy decides:
+    DROP_OLDEST drops the oldest waiting frame (the newest pose is delivered), BLOCK stops reading the source.
+    The results are delivered in the order of the frames with their capture timestamps.
+'''
+import asyncio
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from typing import Any, NamedTuple, Optional
+import numpy as np
+
+DROP_OLDEST = 'drop_oldest'
+BLOCK = 'block'
+
+
+class StreamResult(NamedTuple):
+    index: int              # num of the frame read from the source (gaps are the dropped frames)
+    timestamp: float        # [s] capture timestamp given by the source (time.monotonic() when it is not given)
+    image: np.ndarray
+    markers: Any            # result of the detector
+
+
+class DetectionStream:
+    """
+    Async iterator of the results of the detection of the frames of the source.
+    The source gives images (np.ndarray), (image, timestamp) pairs or objects with image and timestamp attributes
+    (web_camera.CapturedFrame). The detector is an object with the detect(image) method (WhyCodeDetector)
+    or a callable. The frames of one detector are detected one by one (tracking continues from frame to frame).
+    copy_frames copies each image when it is read, the sources reusing their buffers need it
+    (ThreadedWebCamera keeps only the last returned buffer).
+    """
+    def __init__(
+        self, source, detector, max_in_flight: int = 2, policy: str = DROP_OLDEST, copy_frames: bool = True,
+        executor: Optional[ThreadPoolExecutor] = None
+    ):
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f'Unknown policy "{policy}", use "{DROP_OLDEST}" or "{BLOCK}".')
+        self._source = source
+        self._detect = detector.detect if hasattr(detector, 'detect') else detector
+        self._max_in_flight = max(1, max_in_flight)
+        self._policy = policy
+        self._copy_frames = copy_frames
+        self._executor = executor
+        self.read = 0           # num of frames read from the source
+        self.delivered = 0
+        self.dropped = 0
+
+    def __aiter__(self):
+        return self._run()
+
+    def _frame(self, item) -> Optional[tuple]:
+        if hasattr(item, 'image') and hasattr(item, 'timestamp'):
+            image, timestamp = item.image, item.timestamp
+        elif isinstance(item, tuple):
+            image, timestamp = item[0], item[1]
+        else:
+            image, timestamp = item, monotonic()
+        if image is None:
+            return None
+        if self._copy_frames:
+            image = np.array(image, copy=True)
+        return image, timestamp
+
+    async def _items(self, loop):
+        if hasattr(self._source, '__aiter__'):
+            async for item in self._source:
+                yield item
+            return
+        # the sync source (camera) blocks, it is read on its own thread
+        iterator = iter(self._source)
+        end = object()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='whycon_source') as reader:
+            while True:
+                item = await loop.run_in_executor(reader, next, iterator, end)
+                if item is end:
+                    return
+                yield item
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        waiting = collections.deque()   # read frames waiting for the detection
+        detecting = 0                   # 1 while a frame is being detected
+        finished = False
+        changed = asyncio.Condition()
+
+        async def read_source():
+            nonlocal finished
+            try:
+                async for item in self._items(loop):
+                    frame = self._frame(item)
+                    if frame is None:
+                        continue
+                    async with changed:
+                        if self._policy == BLOCK:
+                            await changed.wait_for(lambda: len(waiting) + detecting < self._max_in_flight)
+                        elif len(waiting) + detecting >= self._max_in_flight:
+                            # the frame being detected is never dropped
+                            if waiting:
+                                waiting.popleft()
+                            else:
+                                self.read += 1
+                                self.dropped += 1
+                                continue
+                            self.dropped += 1
+                        waiting.append((self.read,) + frame)
+                        self.read += 1
+                        changed.notify_all()
+            finally:
+                async with changed:
+                    finished = True
+                    changed.notify_all()
+
+        executor = self._executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='whycon_detect')
+        reader = asyncio.ensure_future(read_source())
+        try:
+            while True:
+                async with changed:
+                    await changed.wait_for(lambda: waiting or finished)
+                    if not waiting:
+                        break
+                    index, image, timestamp = waiting.popleft()
+                    detecting = 1
+                try:
+                    markers = await loop.run_in_executor(executor, self._detect, image)
+                finally:
+                    async with changed:
+                        detecting = 0
+                        changed.notify_all()
+                self.delivered += 1
+                yield StreamResult(index, timestamp, image, markers)
+            if reader.done() and reader.exception() is not None:
+                raise reader.exception()
+        finally:
+            reader.cancel()
+            if self._executor is None:
+                executor.shutdown(wait=False)
+
+
+def stream(
+    source, detector, max_in_flight: int = 2, policy: str = DROP_OLDEST, copy_frames: bool = True,
+    executor: Optional[ThreadPoolExecutor] = None
+) -> DetectionStream:
+    ''' Async iterator of StreamResult for the frames of the source, see DetectionStream. '''
+    return DetectionStream(source, detector, max_in_flight, policy, copy_frames, executor)